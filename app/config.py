@@ -72,6 +72,18 @@ class Settings(BaseSettings):
     ENABLE_JOBS: bool = True
     UPDATE_MATCHES_INTERVAL_SECONDS: int = 300  # 5 minutes
     RECALC_RANKINGS_INTERVAL_SECONDS: int = 3600  # 1 hour
+    RANKING_MODE: str = "python"  # python, sql (scoring runs inside the database), stream (bounded memory)
+    RANKING_STREAM_BATCH_SIZE: int = 5000  # predictions per server-side cursor batch in stream mode
+    RANKING_WORKERS: int = 1  # max worker processes for group rankings (1 = no process pool)
+    SIMULATION_RUNS: int = 10000  # Monte Carlo tournaments per odds computation
+    RECOMPUTE_DEBOUNCE_SECONDS: float = 2.0  # quiet period before a queued recompute runs
+    RESCORE_CHUNK_SIZE: int = 2000  # predictions per committed chunk of a rescoring job
+    RESCORE_STALE_SECONDS: int = 300  # a running rescoring job without a heartbeat this long is resumed
+    STANDINGS_STREAM_POLL_SECONDS: float = 1.0  # how often a streamed scope checks for a new standings version (per process)
+    STANDINGS_STREAM_BACKLOG: int = 20  # recent diffs kept per streamed scope for clients that fell behind
+    STANDINGS_STREAM_KEEPALIVE_SECONDS: float = 15.0  # comment line sent on idle standings streams
+    HEAD_TO_HEAD_MAX_PLAYERS: int = 500  # groups with more ranked players skip the pairwise head-to-head table
+    KNOCKOUT_SCORE_AFTER_EXTRA_TIME: bool = True  # knockout picks judged on the score after extra time (else 90 min)
     
     # Timezone
     DEFAULT_TIMEZONE: str = "UTC"
@@ -0,0 +1,185 @@
+from app.config import settings
+from app.db import SessionLocal
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Set
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JobStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class RecomputeJob:
+    """One queued recompute; repeated submissions for its key merge into it while pending"""
+    
+    def __init__(self, key: str, task: Callable, payload: Set, due_at: float, lane: str = "rankings"):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.lane = lane
+        self.task = task
+        self.payload = set(payload)
+        self.due_at = due_at
+        self.deadline = due_at
+        self.status = JobStatus.PENDING
+        self.submissions = 1
+        self.submitted_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job has run; returns False on timeout"""
+        return self._done.wait(timeout)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "key": self.key,
+            "lane": self.lane,
+            "status": self.status,
+            "submissions": self.submissions,
+            "payload": sorted(self.payload),
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+class RecomputeQueue:
+    """
+    Deduplicating, debounced work queue for ranking recomputes.
+    
+    submit() returns immediately. A job runs once its key has been quiet
+    for debounce_seconds; submissions for a key that is still pending
+    collapse into that job (payloads are merged and the timer restarts),
+    so a burst of results becomes one run. A steady stream of submissions
+    still runs at least every MAX_DELAY_FACTOR x debounce_seconds. Jobs
+    run one at a time per lane, each lane on its own background thread and
+    each job with its own DB session - so long jobs (rescoring) on their
+    own lane never hold up result-driven recomputes. A task that returns
+    False (services catch their own errors) is marked failed, like one
+    that raises.
+    
+    The queue and its job history live in this process's memory: job ids
+    are only known to the process that queued them, and pending jobs are
+    lost on restart (the dirty marks cover that). Run the app as a single
+    worker process.
+    """
+    
+    # Finished jobs kept for status lookups
+    HISTORY_SIZE = 500
+    
+    # Debouncing never postpones a job beyond this many quiet periods
+    MAX_DELAY_FACTOR = 5
+    
+    def __init__(self, session_factory: Callable = SessionLocal, debounce_seconds: Optional[float] = None):
+        self.session_factory = session_factory
+        self.debounce_seconds = settings.RECOMPUTE_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        self._lock = threading.Condition()
+        self._pending: Dict[str, RecomputeJob] = {}
+        self._jobs: Dict[str, RecomputeJob] = {}
+        self._workers: Dict[str, threading.Thread] = {}
+    
+    def submit(self, key: str, task: Callable, payload=(), lane: str = "rankings") -> RecomputeJob:
+        """
+        Queue task(db, payload) under key on a lane.
+        
+        If a job for key has not started yet it absorbs this submission
+        and is returned instead of a new one.
+        """
+        with self._lock:
+            due_at = time.monotonic() + self.debounce_seconds
+            job = self._pending.get(key)
+            if job:
+                job.payload.update(payload)
+                job.task = task
+                job.due_at = min(due_at, job.deadline)
+                job.submissions += 1
+            else:
+                job = RecomputeJob(key, task, payload, due_at, lane)
+                job.deadline = time.monotonic() + self.debounce_seconds * self.MAX_DELAY_FACTOR
+                self._pending[key] = job
+                self._jobs[job.id] = job
+                self._trim_history()
+            
+            self._ensure_worker(job.lane)
+            self._lock.notify_all()
+            return job
+    
+    def get(self, job_id: str) -> Optional[RecomputeJob]:
+        """Look up a job by id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def _ensure_worker(self, lane: str):
+        worker = self._workers.get(lane)
+        if worker is None or not worker.is_alive():
+            worker = threading.Thread(target=self._run, args=(lane,), name=f"recompute-queue-{lane}", daemon=True)
+            self._workers[lane] = worker
+            worker.start()
+    
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in (JobStatus.DONE, JobStatus.FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.HISTORY_SIZE)]:
+            del self._jobs[job_id]
+    
+    def _next_due(self, lane: str) -> RecomputeJob:
+        """Wait for the lane's pending job with the earliest due time to become due and claim it"""
+        with self._lock:
+            while True:
+                pending = [j for j in self._pending.values() if j.lane == lane]
+                if not pending:
+                    self._lock.wait()
+                    continue
+                
+                job = min(pending, key=lambda j: j.due_at)
+                delay = job.due_at - time.monotonic()
+                if delay > 0:
+                    self._lock.wait(delay)
+                    continue
+                
+                del self._pending[job.key]
+                job.status = JobStatus.RUNNING
+                job.started_at = datetime.now(timezone.utc)
+                return job
+    
+    def _run(self, lane: str):
+        while True:
+            job = self._next_due(lane)
+            
+            db = self.session_factory()
+            try:
+                if job.task(db, job.payload) is False:
+                    job.status = JobStatus.FAILED
+                    job.error = "Task reported failure (see logs)"
+                else:
+                    job.status = JobStatus.DONE
+            except Exception as e:
+                logger.error(f"Error in recompute job {job.key}: {e}")
+                db.rollback()
+                job.status = JobStatus.FAILED
+                job.error = str(e)
+            finally:
+                db.close()
+                job.finished_at = datetime.now(timezone.utc)
+                job._done.set()
+            
+            logger.info(f"Recompute job {job.key} {job.status} ({job.submissions} submissions coalesced)")
+
+_queue: Optional[RecomputeQueue] = None
+
+def get_recompute_queue() -> RecomputeQueue:
+    """Get the process-wide recompute queue"""
+    global _queue
+    
+    if _queue is None:
+        _queue = RecomputeQueue()
+    
+    return _queue
@@ -2,6 +2,7 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from app.config import settings
 from app.db import SessionLocal
 from app.services.ranking import RankingService
+from app.services.simulation import SimulationService
 from app.providers.data import FixtureImporter, APIProvider, ManualProvider
 from datetime import datetime, timezone
 import logging
@@ -43,21 +44,32 @@ def recalculate_rankings_job():
         
         db = SessionLocal()
         
-        # Global ranking
-        RankingService.recalculate_global_ranking(db)
+        # Only scopes marked dirty (result, membership or scoring changes) since the last run
+        scopes = RankingService.recalculate_dirty_rankings(db)
         
-        # Group rankings
-        from app.models import Group
-        groups = db.query(Group).filter(Group.is_active == True).all()
-        for group in groups:
-            RankingService.recalculate_group_ranking(db, group.id)
+        # Win/top-N odds - scopes whose results or standings changed are re-simulated
+        SimulationService.refresh_all(db, stale_scopes=scopes)
         
-        logger.info(f"Ranking recalculation job completed. {len(groups)} groups updated.")
+        logger.info(f"Ranking recalculation job completed. {len(scopes)} scopes updated.")
         
         db.close()
     except Exception as e:
         logger.error(f"Error in ranking recalculation job: {e}")
 
+def resume_rescoring_job():
+    """Job to resume rescoring jobs left pending or stalled by a crash or deploy"""
+    try:
+        db = SessionLocal()
+        
+        from app.services.rescoring import RescoringService
+        job_ids = RescoringService.resume_stalled(db)
+        if job_ids:
+            logger.info(f"Rescoring jobs resumed: {job_ids}")
+        
+        db.close()
+    except Exception as e:
+        logger.error(f"Error in rescoring resume job: {e}")
+
 def cleanup_expired_sessions_job():
     """Job to cleanup expired sessions and tokens"""
     try:
@@ -99,6 +111,16 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Pick up rescoring jobs interrupted by a restart
+    scheduler.add_job(
+        resume_rescoring_job,
+        'interval',
+        seconds=settings.RESCORE_STALE_SECONDS,
+        id='resume_rescoring',
+        name='Resume Rescoring Jobs',
+        replace_existing=True
+    )
+    
     # Cleanup every day at 3 AM UTC
     scheduler.add_job(
         cleanup_expired_sessions_job,
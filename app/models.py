@@ -91,6 +91,8 @@ class Group(Base):
     # Settings
     max_members = Column(Integer, nullable=True)  # null = unlimited
     scoring_system = Column(String(50), default="standard")  # standard, custom
+    scoring_rules = Column(JSON, nullable=True)  # custom: {"exact": 5, "result_balance": 3, "result": 2}
+    use_global_picks = Column(Boolean, default=False)  # members' global predictions count unless overridden in the group
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -207,6 +209,8 @@ class Prediction(Base):
     # Scoring
     points_awarded = Column(Integer, default=0)
     score_details = Column(JSON, nullable=True)  # {"exact": false, "result": true, "balance": true}
+    live_points = Column(Integer, default=0, nullable=False)  # provisional standard points, against the live score
+    live_details = Column(JSON, nullable=True)  # score_details against the live score (scored per group's rules)
     
     # Status
     is_locked = Column(Boolean, default=False)
@@ -223,6 +227,9 @@ class Prediction(Base):
     
     __table_args__ = (
         UniqueConstraint("user_id", "match_id", "group_id", name="uq_user_match_group_pred"),
+        # The constraint above treats NULL group_ids as distinct - one global pick per user and match
+        Index("uq_user_match_global_pred", "user_id", "match_id", unique=True,
+              postgresql_where=group_id.is_(None), sqlite_where=group_id.is_(None)),
         Index("idx_predictions_user", "user_id"),
         Index("idx_predictions_match", "match_id"),
         Index("idx_predictions_group", "group_id"),
@@ -237,8 +244,14 @@ class StandingsCache(Base):
     scope = Column(String(50), unique=True, nullable=False, index=True)
     group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)
     
-    # Cache data
-    standings_data = Column(JSON, nullable=False)  # [{"user_id": 1, "name": "", "points": 100, ...}]
+    # Legacy cache blob - rows now live in standings_entries
+    standings_data = Column(JSON, nullable=True)  # [{"user_id": 1, "name": "", "points": 100, ...}]
+    
+    # Published standings_entries version (0 = never computed) and the version allocator
+    version = Column(Integer, default=0, nullable=False)
+    next_version = Column(Integer, default=0, nullable=False)
+    # Bumped by every publish and every in-place live update - the position streaming clients follow
+    change_seq = Column(Integer, default=0, nullable=False)
     
     # Timestamps
     computed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -250,6 +263,171 @@ class StandingsCache(Base):
         Index("idx_standings_scope", "scope"),
     )
 
+class DirtyScope(Base):
+    __tablename__ = "ranking_dirty_scopes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Scope whose standings are out of date: GLOBAL or GROUP:123
+    scope = Column(String(50), unique=True, nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)
+    
+    # Latest change (the recompute job clears marks up to its watermark)
+    reason = Column(String(50), nullable=False)  # result, membership, scoring
+    marked_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class RescoreJob(Base):
+    __tablename__ = "rescore_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # pending, running, done, failed
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    match_ids = Column(JSON, nullable=True)  # null = every prediction
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    
+    # Checkpoint: predictions up to this id are rescored and committed
+    last_prediction_id = Column(Integer, default=0, nullable=False)
+    total = Column(Integer, default=0, nullable=False)
+    processed = Column(Integer, default=0, nullable=False)
+    changed = Column(Integer, default=0, nullable=False)
+    
+    # Current run (a resumed job starts a new one) - for the rate
+    run_started_at = Column(DateTime(timezone=True), nullable=True)
+    run_start_processed = Column(Integer, default=0, nullable=False)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # a running job that stops beating is resumed
+    
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class HeadToHead(Base):
+    __tablename__ = "head_to_head"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # One row per pair of players in a group (user_id < opponent_id)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    opponent_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Finished matches either of them predicted, by who scored more points on it
+    wins = Column(Integer, default=0, nullable=False)
+    losses = Column(Integer, default=0, nullable=False)
+    draws = Column(Integer, default=0, nullable=False)
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        UniqueConstraint("group_id", "user_id", "opponent_id", name="uq_head_to_head_pair"),
+        Index("idx_head_to_head_group_opponent", "group_id", "opponent_id"),
+    )
+
+class StandingsEntry(Base):
+    __tablename__ = "standings_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Scope: GLOBAL or GROUP:123
+    scope = Column(String(50), nullable=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Build this row belongs to - readers only see StandingsCache.version
+    version = Column(Integer, nullable=False)
+    
+    # Position & tiebreak counters
+    rank = Column(Integer, nullable=False)
+    total_points = Column(Integer, default=0, nullable=False)
+    exact_matches = Column(Integer, default=0, nullable=False)
+    correct_results = Column(Integer, default=0, nullable=False)
+    goal_error = Column(Integer, default=0, nullable=False)  # sum of |pred - score| goals
+    first_prediction_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Full tiebreaker chain as one key (ascending = better, equal = shared rank)
+    sort_key = Column(String(40), nullable=False, default="")
+    
+    # Provisional layer: points from LIVE matches "if they ended now"
+    live_points = Column(Integer, default=0, nullable=False)
+    provisional_rank = Column(Integer, nullable=True)
+    live_seq = Column(Integer, default=0, nullable=False)  # change_seq of the last in-place live update
+    
+    # Points per tournament stage (the final round includes the third-place match)
+    points_group = Column(Integer, default=0, nullable=False)
+    points_r32 = Column(Integer, default=0, nullable=False)
+    points_r16 = Column(Integer, default=0, nullable=False)
+    points_qf = Column(Integer, default=0, nullable=False)
+    points_sf = Column(Integer, default=0, nullable=False)
+    points_final = Column(Integer, default=0, nullable=False)
+    
+    # Relations
+    user = relationship("User")
+    
+    __table_args__ = (
+        UniqueConstraint("scope", "version", "user_id", name="uq_standings_entry_scope_version_user"),
+        Index("idx_standings_entries_scope_rank", "scope", "version", "rank", "user_id"),
+        Index("idx_standings_entries_scope_sort_key", "scope", "version", "sort_key"),
+        Index("idx_standings_entries_scope_provisional", "scope", "version", "provisional_rank", "user_id"),
+    )
+
+class StandingsSnapshot(Base):
+    __tablename__ = "standings_snapshots"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Scope and point in the tournament (number of finished matches)
+    scope = Column(String(50), nullable=False)
+    as_of_match = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Position at that point
+    rank = Column(Integer, nullable=False)
+    total_points = Column(Integer, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("scope", "as_of_match", "user_id", name="uq_standings_snapshot"),
+        Index("idx_standings_snapshots_user", "scope", "user_id", "as_of_match"),
+        Index("idx_standings_snapshots_rank", "scope", "as_of_match", "rank"),
+    )
+
+class SimulationCache(Base):
+    __tablename__ = "simulation_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # Scope: GLOBAL or GROUP:123
+    scope = Column(String(50), unique=True, nullable=False, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=True)
+    
+    # Inputs the odds were computed from (recompute when they change)
+    fingerprint = Column(String(64), nullable=False)  # hash of finished/cancelled results
+    runs = Column(Integer, nullable=False)
+    remaining_matches = Column(Integer, nullable=False)
+    
+    # Timestamps
+    computed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class SimulationOdds(Base):
+    __tablename__ = "simulation_odds"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    
+    scope = Column(String(50), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # Share of simulated tournaments finishing at or above each position
+    win_probability = Column(Float, nullable=False)
+    top3_probability = Column(Float, nullable=False)
+    top10_probability = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("scope", "user_id", name="uq_simulation_odds_scope_user"),
+        Index("idx_simulation_odds_scope_win", "scope", "win_probability"),
+    )
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     
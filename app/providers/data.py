@@ -156,6 +156,7 @@ class FixtureImporter:
         
         updates = self.provider.get_results_updates()
         count = 0
+        live_changed = []
         
         for update in updates:
             try:
@@ -168,10 +169,30 @@ class FixtureImporter:
                 if not match:
                     continue
                 
-                # Update score
+                was_live = match.status == MatchStatus.LIVE
+                previous_score = (match.home_score, match.away_score)
+                previous_result = (
+                    match.status, match.home_score, match.away_score, match.home_score_et,
+                    match.away_score_et, match.home_score_pen, match.away_score_pen
+                )
+                
+                # Update score ('goals' includes extra time; keep the 90-minute score separately)
                 goals = update.get('goals', {})
-                match.home_score = goals.get('home')
-                match.away_score = goals.get('away')
+                score = update.get('score') or {}
+                extra_time = score.get('extratime') or {}
+                penalties = score.get('penalty') or {}
+                if extra_time.get('home') is not None:
+                    full_time = score.get('fulltime') or {}
+                    match.home_score = full_time.get('home')
+                    match.away_score = full_time.get('away')
+                    match.home_score_et = goals.get('home')
+                    match.away_score_et = goals.get('away')
+                else:
+                    match.home_score = goals.get('home')
+                    match.away_score = goals.get('away')
+                if penalties.get('home') is not None:
+                    match.home_score_pen = penalties.get('home')
+                    match.away_score_pen = penalties.get('away')
                 
                 # Update status
                 status = update.get('fixture', {}).get('status', {}).get('short', 'NS')
@@ -180,12 +201,32 @@ class FixtureImporter:
                 elif status == 'LIVE':
                     match.status = MatchStatus.LIVE
                 
+                # Goal scored, or the match left LIVE: provisional standings move
+                is_live = match.status == MatchStatus.LIVE
+                if (is_live and previous_score != (match.home_score, match.away_score)) or was_live != is_live:
+                    live_changed.append(match.id)
+                
+                # Result changed: rankings with picks on this match need a recompute
+                if previous_result != (
+                    match.status, match.home_score, match.away_score, match.home_score_et,
+                    match.away_score_et, match.home_score_pen, match.away_score_pen
+                ):
+                    from app.services.ranking import RankingService
+                    RankingService.mark_match_dirty(db, match.id)
+                
                 match.updated_at = datetime.now(timezone.utc)
                 count += 1
             except Exception as e:
                 logger.error(f"Error updating result: {e}")
         
         db.commit()
+        
+        if live_changed:
+            from app.services.ranking import RankingService
+            
+            for match_id in live_changed:
+                RankingService.apply_live_score(db, match_id)
+        
         logger.info(f"Updated {count} match results")
         return count
     
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File, Query
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models import User, Match, MatchStatus, Group
@@ -7,7 +7,8 @@ from app.routes.predictions import get_current_user
 from app.security.middleware import log_action
 from app.providers.data import FixtureImporter, ManualProvider, APIProvider
 from app.services.ranking import RankingService
-from typing import Optional
+from app.jobs.queue import get_recompute_queue
+from typing import List, Optional
 import json
 import logging
 
@@ -54,22 +55,15 @@ async def update_match_admin(
     
     from datetime import datetime, timezone
     match.updated_at = datetime.now(timezone.utc)
+    RankingService.mark_match_dirty(db, match_id)
     db.commit()
     db.refresh(match)
     
-    # Recalculate ranking
-    RankingService.recalculate_global_ranking(db)
-    
-    # Get affected groups and recalculate
-    from app.models import Prediction
-    affected_groups = db.query(Prediction.group_id).filter(
-        Prediction.match_id == match_id,
-        Prediction.group_id.isnot(None)
-    ).distinct().all()
-    
-    for (group_id,) in affected_groups:
-        if group_id:
-            RankingService.recalculate_group_ranking(db, group_id)
+    # Rescore this match and patch the affected rankings in the background
+    # (provisional standings follow the live score, official ones the final result).
+    # Updates entered in quick succession collapse into one run, which clears the
+    # dirty marks above once it succeeds - they only remain if the job fails or is lost.
+    job = get_recompute_queue().submit("match_results", RankingService.apply_match_results, {match_id})
     
     log_action(
         db=db,
@@ -86,8 +80,23 @@ async def update_match_admin(
         "match_id": match_id,
         "status": match.status.value,
         "score": f"{match.home_score}-{match.away_score}",
+        "job_id": job.id,
+        "job_status": job.status,
     }
 
+@router.get("/jobs/{job_id}")
+async def get_recompute_job(
+    job_id: str,
+    admin: Optional[User] = Depends(require_admin)
+):
+    """Admin: Get status of a queued ranking recompute"""
+    
+    job = get_recompute_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job.to_dict()
+
 @router.post("/fixtures/import-json")
 async def import_fixtures_json(
     file: UploadFile = File(...),
@@ -145,8 +154,11 @@ async def update_results_from_api(
         importer = FixtureImporter(provider)
         count = importer.update_results(db)
         
-        # Recalculate rankings
-        RankingService.recalculate_global_ranking(db)
+        # Recalculate rankings in the background (repeated syncs collapse into one run)
+        job = get_recompute_queue().submit(
+            "all_rankings",
+            lambda session, _: RankingService.recalculate_all_rankings(session) is not None
+        )
         
         log_action(
             db=db,
@@ -157,7 +169,8 @@ async def update_results_from_api(
         
         return {
             "message": f"Updated {count} results",
-            "count": count
+            "count": count,
+            "job_id": job.id,
         }
     
     except Exception as e:
@@ -165,35 +178,102 @@ async def update_results_from_api(
         raise HTTPException(status_code=400, detail=f"Update error: {str(e)}")
 
 @router.post("/recalculate-rankings")
-async def recalculate_all_rankings(
+def recalculate_all_rankings(
+    workers: Optional[int] = Query(None, ge=1),
     admin: Optional[User] = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Admin: Recalculate all rankings"""
+    """Admin: Recalculate all rankings (optionally with parallel group workers)"""
     
+    # Plain def: the recompute blocks, so it runs in the threadpool rather than on the event loop
     try:
-        # Global
-        RankingService.recalculate_global_ranking(db)
-        
-        # All groups
-        groups = db.query(Group).all()
-        for group in groups:
-            RankingService.recalculate_group_ranking(db, group.id)
-        
-        log_action(
-            db=db,
-            user_id=admin.id,
-            action="rankings_recalculated"
-        )
-        
-        return {
-            "message": "Rankings recalculated",
-            "groups_count": len(groups)
-        }
+        # Global and all groups (sharded across workers if requested)
+        groups_count = RankingService.recalculate_all_rankings(db, active_only=False, workers=workers)
     
     except Exception as e:
         logger.error(f"Error recalculating rankings: {e}")
         raise HTTPException(status_code=400, detail=f"Error: {str(e)}")
+    
+    if groups_count is None:
+        raise HTTPException(status_code=500, detail="Ranking recalculation failed for some scopes")
+    
+    log_action(
+        db=db,
+        user_id=admin.id,
+        action="rankings_recalculated"
+    )
+    
+    return {
+        "message": "Rankings recalculated",
+        "groups_count": groups_count
+    }
+
+@router.post("/rescore")
+async def start_rescoring(
+    match_ids: Optional[List[int]] = Query(None),
+    admin: Optional[User] = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Admin: Rewrite points of past predictions (some matches or all) in resumable chunks"""
+    from app.services.rescoring import RescoringService
+    
+    job = RescoringService.create_job(db, match_ids, requested_by=admin.id)
+    RescoringService.submit(job.id)
+    
+    log_action(
+        db=db,
+        user_id=admin.id,
+        action="rescore_started",
+        resource_type="rescore_job",
+        resource_id=job.id,
+        details={"match_ids": job.match_ids, "total": job.total}
+    )
+    
+    return RescoringService.get_progress(db, job.id)
+
+@router.get("/rescore")
+async def list_rescoring_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    admin: Optional[User] = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Admin: Recent rescoring jobs with progress"""
+    from app.services.rescoring import RescoringService
+    
+    return RescoringService.list_jobs(db, limit)
+
+@router.get("/rescore/{job_id}")
+async def get_rescoring_job(
+    job_id: int,
+    admin: Optional[User] = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Admin: Progress, rate and ETA of a rescoring job"""
+    from app.services.rescoring import RescoringService
+    
+    progress = RescoringService.get_progress(db, job_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return progress
+
+@router.post("/rescore/{job_id}/resume")
+async def resume_rescoring_job(
+    job_id: int,
+    admin: Optional[User] = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Admin: Resume a failed or stalled rescoring job from its checkpoint"""
+    from app.services.rescoring import RescoringService, RescoreStatus
+    
+    progress = RescoringService.get_progress(db, job_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if progress["status"] == RescoreStatus.DONE:
+        raise HTTPException(status_code=400, detail="Job already finished")
+    
+    RescoringService.submit(job_id)
+    return progress
 
 @router.get("/status")
 async def get_system_status(
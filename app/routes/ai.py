@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models import Match, User
-from app.schemas import AISuggestionResponse
+from app.schemas import AISuggestionResponse, OptimalPickRequest
 from app.services.ai import AIService
 from app.routes.predictions import get_current_user
 from app.security.middleware import log_action, get_client_ip
@@ -78,6 +78,56 @@ async def get_ai_suggestion(
         "alternatives": suggestion.get("alternatives", [])
     }
 
+@router.get("/optimal-picks")
+async def get_optimal_picks(
+    group_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=104),
+    db: Session = Depends(get_db)
+):
+    """Get the expected-points maximizing pick for upcoming matches (crowd probabilities, no AI quota)"""
+    from app.services.optimizer import PickOptimizer
+    
+    try:
+        picks = PickOptimizer.suggest_upcoming(db, group_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return {"group_id": group_id, "picks": picks}
+
+@router.post("/optimal-pick")
+async def get_optimal_pick(
+    pick_request: OptimalPickRequest,
+    db: Session = Depends(get_db)
+):
+    """Get the expected-points maximizing pick for a score probability matrix"""
+    from app.models import Group
+    from app.services.business import ScoringService, ScoringRules, STANDARD_RULES
+    from app.services.optimizer import PickOptimizer
+    
+    rules = STANDARD_RULES
+    if pick_request.group_id is not None:
+        group = db.query(Group).filter(Group.id == pick_request.group_id).first()
+        if not group:
+            raise HTTPException(status_code=404, detail="Group not found")
+        rules = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+    
+    match = None
+    if pick_request.match_id is not None:
+        match = db.query(Match).filter(Match.id == pick_request.match_id).first()
+        if not match:
+            raise HTTPException(status_code=404, detail="Match not found")
+    
+    knockout = match is not None and ScoringService.is_knockout(match)
+    try:
+        pick = PickOptimizer.best_pick(pick_request.probabilities, rules, knockout)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if match is not None and "advance" in pick:
+        pick["advance_team"] = match.home_team if pick.pop("advance") == "home" else match.away_team
+    
+    return {"match_id": pick_request.match_id, **pick}
+
 @router.get("/health")
 async def ai_service_health():
     """Check AI service health"""
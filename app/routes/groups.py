@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models import Group, GroupMember, User, Prediction, Match, GroupMemberRole
-from app.schemas import GroupCreate, GroupResponse, GroupDetailResponse, GroupUpdate
+from app.schemas import GroupCreate, GroupResponse, GroupDetailResponse, GroupUpdate, GroupScoringUpdate
 from app.services.business import GroupService, UserService
 from app.security.middleware import log_action
 from app.routes.predictions import get_current_user
@@ -149,6 +149,9 @@ async def leave_group(
         raise HTTPException(status_code=400, detail="Owner cannot leave group")
     
     db.delete(member)
+    
+    from app.services.ranking import RankingService
+    RankingService.mark_dirty(db, {f"GROUP:{group_id}": group_id}, "membership")
     db.commit()
     
     log_action(
@@ -162,22 +165,178 @@ async def leave_group(
     
     return {"message": "Left group"}
 
+@router.get("/{group_id}/scoring")
+async def get_group_scoring(
+    group_id: int,
+    db: Session = Depends(get_db)
+):
+    """Get the group's scoring system and point values"""
+    from app.services.business import ScoringRules
+    
+    group = GroupService.get_group(db, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    rules = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+    return {
+        "group_id": group_id,
+        "scoring_system": group.scoring_system or "standard",
+        "use_global_picks": bool(group.use_global_picks),
+        **rules.to_dict(),
+    }
+
+@router.put("/{group_id}/scoring")
+async def update_group_scoring(
+    group_id: int,
+    scoring: GroupScoringUpdate,
+    request: Request,
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Change the group's scoring system (owner/admin); standings are rescored in the background"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    group = GroupService.get_group(db, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    member = db.query(GroupMember).filter(
+        GroupMember.group_id == group_id,
+        GroupMember.user_id == user.id
+    ).first()
+    if not member or member.role not in (GroupMemberRole.OWNER, GroupMemberRole.ADMIN):
+        raise HTTPException(status_code=403, detail="Only group owners and admins can change scoring")
+    
+    try:
+        rules = GroupService.set_scoring_rules(db, group, scoring)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    from app.services.ranking import RankingService
+    from app.jobs.queue import get_recompute_queue
+    
+    job = get_recompute_queue().submit(
+        f"group_ranking:{group_id}",
+        lambda session, _: RankingService.recalculate_group_ranking(session, group_id)
+    )
+    
+    log_action(
+        db=db,
+        user_id=user.id,
+        action="group_scoring_updated",
+        resource_type="group",
+        resource_id=group_id,
+        request=request,
+        details={"scoring_system": group.scoring_system, "use_global_picks": group.use_global_picks, **rules.to_dict()}
+    )
+    
+    return {
+        "group_id": group_id,
+        "scoring_system": group.scoring_system,
+        "use_global_picks": group.use_global_picks,
+        **rules.to_dict(),
+        "job_id": job.id,
+    }
+
 @router.get("/{group_id}/standings")
 async def get_group_standings(
     group_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    provisional: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Get group standings/ranking"""
+    """Get group standings/ranking (paginated by rank; provisional=true ranks as if live matches ended now)"""
     from app.services.ranking import RankingService
     
-    standings = RankingService.get_group_standings(db, group_id)
+    standings = RankingService.get_group_standings(db, group_id, limit, cursor, provisional)
     if not standings:
         # Return empty standings if not computed yet
         standings = {
             "scope": f"GROUP:{group_id}",
+            "provisional": provisional,
             "standings": [],
             "computed_at": None,
             "match_count": 0,
+            "total_users": 0,
+            "next_cursor": None,
         }
     
     return standings
+
+@router.get("/{group_id}/standings/stream")
+async def stream_group_standings(
+    group_id: int,
+    request: Request,
+    last_seq: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Server-sent events: a group standings snapshot, then only the rows changed by each new version or live update"""
+    from app.services.standings_stream import standings_event_response
+    
+    group = db.query(Group.id).filter(Group.id == group_id).first()
+    # The stream polls with its own sessions - don't hold this one open for its lifetime
+    db.close()
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    return standings_event_response(request, f"GROUP:{group_id}", last_seq)
+
+@router.get("/{group_id}/standings/around-me")
+async def get_group_standings_around_me(
+    group_id: int,
+    window: int = Query(5, ge=0, le=50),
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get group standings rows around the current user"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    from app.services.ranking import RankingService
+    
+    standings = RankingService.get_standings_around_user(db, f"GROUP:{group_id}", user.id, window)
+    if not standings:
+        raise HTTPException(status_code=404, detail="Not ranked yet")
+    
+    return standings
+
+@router.get("/{group_id}/standings/odds")
+async def get_group_odds(
+    group_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Get simulated chances of winning the group"""
+    from app.services.simulation import SimulationService
+    
+    group = db.query(Group).filter(Group.id == group_id).first()
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    odds = SimulationService.get_odds_page(db, f"GROUP:{group_id}", limit)
+    if not odds:
+        raise HTTPException(status_code=503, detail="Odds not available")
+    
+    return odds
+
+@router.get("/{group_id}/head-to-head/{opponent_id}")
+async def get_head_to_head(
+    group_id: int,
+    opponent_id: int,
+    user_id: Optional[int] = None,
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Compare two group players (the current user by default): match wins and running points difference"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    from app.services.head_to_head import HeadToHeadService
+    
+    comparison = HeadToHeadService.get_head_to_head(db, group_id, user_id or user.id, opponent_id)
+    if not comparison:
+        raise HTTPException(status_code=404, detail="Group not found")
+    
+    return comparison
@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models import Match, MatchStatus, Prediction, User
-from app.schemas import MatchResponse, PredictionResponse, PredictionCreate, PredictionUpdate
+from app.schemas import MatchResponse, PredictionResponse, PredictionCreate, PredictionBulkCreate, PredictionUpdate
 from app.services.business import PredictionService, UserService
 from app.security.middleware import log_action, get_client_ip
 from datetime import datetime, timezone
@@ -119,6 +119,33 @@ async def create_prediction(
     
     return prediction
 
+@router.post("/predictions/bulk")
+async def create_predictions_bulk(
+    bulk_data: PredictionBulkCreate,
+    request: Request,
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create or update many predictions at once (e.g. a whole matchday); returns a result per pick"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    results = PredictionService.create_predictions_bulk(db, user.id, bulk_data.predictions)
+    if results is None:
+        raise HTTPException(status_code=500, detail="Could not save predictions")
+    
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("created", "updated", "rejected")}
+    log_action(
+        db=db,
+        user_id=user.id,
+        action="predictions_bulk_saved",
+        resource_type="prediction",
+        request=request,
+        details={**counts, "match_ids": sorted({r["match_id"] for r in results if r["status"] != "rejected"})}
+    )
+    
+    return {**counts, "results": results}
+
 @router.put("/predictions/{prediction_id}", response_model=PredictionResponse)
 async def update_prediction(
     prediction_id: int,
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app.models import User, Match, MatchStatus
@@ -113,18 +113,160 @@ async def check_ai_quota(
 
 @router.get("/rankings/global")
 async def get_global_standings(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    provisional: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Get global standings"""
+    """Get global standings (paginated by rank; provisional=true ranks as if live matches ended now)"""
     from app.services.ranking import RankingService
     
-    standings = RankingService.get_global_standings(db)
+    standings = RankingService.get_global_standings(db, limit, cursor, provisional)
     if not standings:
         standings = {
             "scope": "GLOBAL",
+            "provisional": provisional,
             "standings": [],
             "computed_at": None,
             "match_count": 0,
+            "total_users": 0,
+            "next_cursor": None,
         }
     
     return standings
+
+@router.get("/rankings/global/stream")
+async def stream_global_standings(
+    request: Request,
+    last_seq: Optional[int] = Query(None, ge=0)
+):
+    """Server-sent events: a standings snapshot, then only the rows changed by each new version or live update"""
+    from app.services.standings_stream import standings_event_response
+    
+    return standings_event_response(request, "GLOBAL", last_seq)
+
+@router.get("/rankings/global/around-me")
+async def get_global_standings_around_me(
+    window: int = Query(5, ge=0, le=50),
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get global standings rows around the current user"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    from app.services.ranking import RankingService
+    
+    standings = RankingService.get_standings_around_user(db, "GLOBAL", user.id, window)
+    if not standings:
+        raise HTTPException(status_code=404, detail="Not ranked yet")
+    
+    return standings
+
+@router.get("/rankings/global/odds")
+async def get_global_odds(
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Get simulated chances of winning the global ranking"""
+    from app.services.simulation import SimulationService
+    
+    odds = SimulationService.get_odds_page(db, "GLOBAL", limit)
+    if not odds:
+        raise HTTPException(status_code=503, detail="Odds not available")
+    
+    return odds
+
+@router.get("/rankings/odds")
+async def get_my_odds(
+    group_id: Optional[int] = None,
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get current user's simulated chance to finish 1st / top 3 / top 10 (global or in a group)"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    from app.services.simulation import SimulationService
+    
+    scope = f"GROUP:{group_id}" if group_id else "GLOBAL"
+    odds = SimulationService.get_user_odds(db, scope, user.id)
+    if not odds:
+        raise HTTPException(status_code=404, detail="Not ranked yet")
+    
+    return odds
+
+@router.get("/rankings/me")
+async def get_my_rank(
+    group_id: Optional[int] = None,
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get current user's rank (global or in a group)"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    from app.services.ranking import RankingService
+    
+    scope = f"GROUP:{group_id}" if group_id else "GLOBAL"
+    rank = RankingService.get_user_rank(db, scope, user.id)
+    if not rank:
+        raise HTTPException(status_code=404, detail="Not ranked yet")
+    
+    return rank
+
+@router.get("/rankings/stages/{board}")
+async def get_stage_board(
+    board: str,
+    group_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Get standings by points in some stages only (group, knockout, r32, r16, qf, sf, final)"""
+    from app.services.ranking import RankingService
+    
+    if board not in RankingService.STAGE_BOARDS:
+        raise HTTPException(status_code=400, detail=f"Unknown board; use one of {', '.join(RankingService.STAGE_BOARDS)}")
+    
+    scope = f"GROUP:{group_id}" if group_id else "GLOBAL"
+    standings = RankingService.get_stage_board(db, scope, board, limit)
+    if not standings:
+        raise HTTPException(status_code=404, detail="Not ranked yet")
+    
+    return standings
+
+@router.get("/rankings/history")
+async def get_my_rank_history(
+    group_id: Optional[int] = None,
+    user: Optional[User] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get current user's rank after each finished match (global or in a group)"""
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    from app.services.ranking import RankingService
+    
+    scope = f"GROUP:{group_id}" if group_id else "GLOBAL"
+    return {
+        "scope": scope,
+        "user_id": user.id,
+        "history": RankingService.get_rank_history(db, scope, user.id),
+    }
+
+@router.get("/rankings/as-of/{match_count}")
+async def get_standings_as_of(
+    match_count: int,
+    group_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Get standings as they were after a number of finished matches"""
+    from app.services.ranking import RankingService
+    
+    scope = f"GROUP:{group_id}" if group_id else "GLOBAL"
+    standings = RankingService.get_standings_as_of(db, scope, match_count, limit)
+    if not standings:
+        raise HTTPException(status_code=404, detail="No standings recorded yet")
+    
+    return standings
@@ -61,6 +61,7 @@ class GroupCreate(BaseModel):
     is_public: bool = False
     requires_approval: bool = False
     max_members: Optional[int] = None
+    use_global_picks: bool = False
 
 class GroupUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=2, max_length=255)
@@ -69,6 +70,15 @@ class GroupUpdate(BaseModel):
     requires_approval: Optional[bool] = None
     max_members: Optional[int] = None
 
+class GroupScoringUpdate(BaseModel):
+    # Omitted fields keep their current values
+    scoring_system: Optional[str] = Field(None, pattern="^(standard|custom)$")
+    exact: Optional[int] = Field(None, ge=0, le=100)
+    result_balance: Optional[int] = Field(None, ge=0, le=100)
+    result: Optional[int] = Field(None, ge=0, le=100)
+    advance: Optional[int] = Field(None, ge=0, le=100)
+    use_global_picks: Optional[bool] = None
+
 class GroupMemberResponse(BaseModel):
     user_id: int
     name: str
@@ -87,6 +97,7 @@ class GroupResponse(BaseModel):
     requires_approval: bool
     max_members: Optional[int]
     join_code: Optional[str]
+    use_global_picks: bool = False
     created_at: datetime
     
     class Config:
@@ -129,6 +140,9 @@ class PredictionCreate(BaseModel):
     advance_team: Optional[str] = None
     group_id: Optional[int] = None
 
+class PredictionBulkCreate(BaseModel):
+    predictions: List[PredictionCreate] = Field(..., min_length=1, max_length=500)
+
 class PredictionUpdate(BaseModel):
     home_pred: int = Field(..., ge=0, le=20)
     away_pred: int = Field(..., ge=0, le=20)
@@ -164,6 +178,11 @@ class AISuggestionResponse(BaseModel):
     warning: str = "Use this as reference only, not as guaranteed prediction"
     alternatives: Optional[List[dict]] = None
 
+class OptimalPickRequest(BaseModel):
+    probabilities: List[List[float]]  # [home goals][away goals], e.g. from an offline model
+    match_id: Optional[int] = None  # knockout matches add the advance bonus
+    group_id: Optional[int] = None  # score with the group's rules
+
 # Standings Schema
 class StandingsUserRow(BaseModel):
     user_id: int
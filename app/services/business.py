@@ -1,10 +1,15 @@
+from sqlalchemy import Integer, String, and_, cast, literal, select, union_all
 from sqlalchemy.orm import Session
-from app.models import User, Group, GroupMember, GroupMemberRole, Match, Prediction, MatchStatus
-from app.schemas import GroupCreate, GroupUpdate, PredictionCreate, PredictionUpdate
+from app.models import User, Group, GroupMember, GroupMemberRole, Match, Prediction, MatchStatus, MatchStage
+from app.config import settings
+from app.schemas import GroupCreate, GroupUpdate, GroupScoringUpdate, PredictionCreate, PredictionUpdate
 from app.security.crypto import hash_password, verify_password, generate_join_code, generate_session_token
 from datetime import datetime, timezone, timedelta
+from functools import lru_cache
 import logging
-from typing import Optional, List, Tuple
+import numpy as np
+import uuid
+from typing import Optional, List, Tuple, Dict
 
 logger = logging.getLogger(__name__)
 
@@ -79,6 +84,7 @@ class GroupService:
             is_public=create_data.is_public,
             requires_approval=create_data.requires_approval,
             max_members=create_data.max_members,
+            use_global_picks=create_data.use_global_picks,
             join_code=generate_join_code() if not create_data.is_public else None,
         )
         
@@ -130,10 +136,46 @@ class GroupService:
             pending_approval=pending,
         )
         db.add(member)
+        
+        from app.services.ranking import RankingService
+        RankingService.mark_dirty(db, {f"GROUP:{group_id}": group_id}, "membership")
         db.commit()
         db.refresh(member)
         return member
     
+    @staticmethod
+    def set_scoring_rules(db: Session, group: Group, update: GroupScoringUpdate) -> "ScoringRules":
+        """
+        Change a group's scoring system, point values and/or pick source.
+        
+        Only the fields sent change: point values apply over the group's
+        current custom values (standard ones when switching to custom).
+        Raises ValueError on invalid point values, or point values for a
+        group left on the standard system.
+        """
+        scoring_system = update.scoring_system or group.scoring_system or "standard"
+        values = {name: getattr(update, name) for name in ScoringRules.RULES if getattr(update, name) is not None}
+        
+        if scoring_system == "custom":
+            current = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+            rules = ScoringRules(**{**current.to_dict(), **values})
+            group.scoring_rules = rules.to_dict()
+        elif values and update.scoring_system is None:
+            raise ValueError("Point values only apply to custom scoring")
+        else:
+            rules = STANDARD_RULES
+            group.scoring_rules = None
+        
+        group.scoring_system = scoring_system
+        if update.use_global_picks is not None:
+            group.use_global_picks = update.use_global_picks
+        
+        from app.services.ranking import RankingService
+        RankingService.mark_dirty(db, {f"GROUP:{group.id}": group.id}, "scoring")
+        db.commit()
+        db.refresh(group)
+        return rules
+    
     @staticmethod
     def get_user_groups(db: Session, user_id: int, limit: int = 50, offset: int = 0) -> List[Group]:
         """Get groups user is member of"""
@@ -147,8 +189,119 @@ class PredictionService:
     """Service for prediction operations"""
     
     @staticmethod
-    def create_prediction(db: Session, user_id: int, create_data: PredictionCreate) -> Optional[Prediction]:
-        """Create new prediction"""
+    def create_prediction(db: Session, user_id: int, create_data: PredictionCreate, lock_minutes: int = 10) -> Optional[Prediction]:
+        """
+        Create or update a prediction in one statement.
+        
+        INSERT ... SELECT from the match row yields nothing unless the
+        match kicks off more than lock_minutes from now, and ON CONFLICT
+        (the per-group unique constraint, or the partial unique index for
+        global picks) updates the existing pick unless it is locked - so
+        the lock check and the upsert can't race. Returns None if the
+        match is missing or locked, the pick is locked or the user is not
+        a member of the pick's group.
+        """
+        if create_data.group_id is not None and not PredictionService._member_group_ids(db, user_id, {create_data.group_id}):
+            return None
+        
+        upsert = PredictionService._dialect_insert(db)
+        if upsert is None:
+            return PredictionService._create_prediction_orm(db, user_id, create_data)
+        
+        stmt = PredictionService._upsert_statement(
+            upsert, user_id, [create_data], [str(uuid.uuid4())], lock_minutes
+        ).returning(Prediction)
+        
+        try:
+            prediction = db.scalars(stmt, execution_options={"populate_existing": True}).first()
+            if prediction:
+                # Keep the returned row loaded instead of re-reading it after the commit
+                db.expunge(prediction)
+            db.commit()
+            return prediction
+        except Exception as e:
+            logger.error(f"Error saving prediction: {e}")
+            db.rollback()
+            return None
+    
+    @staticmethod
+    def _member_group_ids(db: Session, user_id: int, group_ids) -> set:
+        """The given groups the user is an active, approved member of"""
+        if not group_ids:
+            return set()
+        return {group_id for (group_id,) in db.query(GroupMember.group_id).filter(
+            GroupMember.user_id == user_id,
+            GroupMember.group_id.in_(list(group_ids)),
+            GroupMember.is_active == True,
+            GroupMember.pending_approval == False
+        )}
+    
+    @staticmethod
+    def _dialect_insert(db: Session):
+        """The dialect's insert() with ON CONFLICT support, or None"""
+        dialect = db.bind.dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        return insert
+    
+    @staticmethod
+    def _upsert_statement(upsert, user_id: int, items: List[PredictionCreate], uuids: List[str], lock_minutes: int = 10):
+        """
+        INSERT ... SELECT ... ON CONFLICT DO UPDATE saving a user's picks.
+        
+        Each pick is selected from its match row (UNION ALL for several),
+        which yields nothing within lock_minutes of kickoff; conflicting
+        picks are updated unless locked. All items must share a conflict
+        target - all global picks or all group picks. New rows take the
+        given uuids, so RETURNING tells inserts from updates.
+        """
+        now = datetime.now(timezone.utc)
+        selects = [
+            select(
+                literal(row_uuid),
+                literal(user_id),
+                Match.id,
+                # Explicit casts: an all-NULL UNION column is typed text on PostgreSQL
+                cast(literal(item.group_id), Integer),
+                literal(item.home_pred),
+                literal(item.away_pred),
+                cast(literal(item.advance_team), String(100)),
+                literal(0),
+                literal(0),
+                literal(False),
+                literal(now, Prediction.updated_at.type),
+            ).where(
+                Match.id == item.match_id,
+                Match.kickoff_at_utc > now + timedelta(minutes=lock_minutes)
+            )
+            for item, row_uuid in zip(items, uuids)
+        ]
+        columns = ["uuid", "user_id", "match_id", "group_id", "home_pred", "away_pred", "advance_team",
+                   "points_awarded", "live_points", "is_locked", "updated_at"]
+        stmt = upsert(Prediction).from_select(columns, selects[0] if len(selects) == 1 else union_all(*selects))
+        
+        if items[0].group_id is None:
+            target = {"index_elements": ["user_id", "match_id"], "index_where": Prediction.group_id.is_(None)}
+        else:
+            target = {"index_elements": ["user_id", "match_id", "group_id"]}
+        return stmt.on_conflict_do_update(
+            **target,
+            set_={
+                "home_pred": stmt.excluded.home_pred,
+                "away_pred": stmt.excluded.away_pred,
+                "advance_team": stmt.excluded.advance_team,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=Prediction.is_locked.isnot(True)
+        )
+    
+    @staticmethod
+    def _create_prediction_orm(db: Session, user_id: int, create_data: PredictionCreate) -> Optional[Prediction]:
+        """create_prediction for databases without INSERT ... ON CONFLICT"""
         # Check if match exists and get it
         match = db.query(Match).filter(Match.id == create_data.match_id).first()
         if not match:
@@ -192,11 +345,171 @@ class PredictionService:
             db.refresh(prediction)
             return prediction
     
+    @staticmethod
+    def create_predictions_bulk(db: Session, user_id: int, items: List[PredictionCreate],
+                                lock_minutes: int = 10) -> Optional[List[Dict]]:
+        """
+        Create or update many of a user's predictions in one transaction.
+        
+        Picks are saved with the create_prediction upsert, many rows per
+        statement (one for global picks, one for group picks), so the
+        kickoff lock is checked in SQL and a concurrent save of the same
+        pick updates it instead of failing the batch. Returns one result
+        per item, in order, with status "created", "updated" or "rejected"
+        (plus the reason). None if the transaction failed.
+        """
+        upsert = PredictionService._dialect_insert(db)
+        if upsert is None:
+            return PredictionService._create_predictions_bulk_orm(db, user_id, items)
+        
+        member_of = PredictionService._member_group_ids(db, user_id, {i.group_id for i in items if i.group_id is not None})
+        
+        results, accepted, seen = [], [], set()
+        for index, item in enumerate(items):
+            key = (item.match_id, item.group_id)
+            result = {"index": index, "match_id": item.match_id, "group_id": item.group_id,
+                      "status": "rejected", "error": None, "prediction_id": None}
+            if key in seen:
+                result["error"] = "Duplicate pick in request"
+            elif item.group_id is not None and item.group_id not in member_of:
+                result["error"] = "Not a member of this group"
+            else:
+                accepted.append(item)
+            seen.add(key)
+            results.append(result)
+        
+        try:
+            saved = {}
+            for batch in ([i for i in accepted if i.group_id is None], [i for i in accepted if i.group_id is not None]):
+                if not batch:
+                    continue
+                uuids = [str(uuid.uuid4()) for _ in batch]
+                stmt = PredictionService._upsert_statement(upsert, user_id, batch, uuids, lock_minutes).returning(
+                    Prediction.id, Prediction.uuid, Prediction.match_id, Prediction.group_id
+                )
+                new_uuids = set(uuids)
+                for row in db.execute(stmt):
+                    saved[(row.match_id, row.group_id)] = (row.id, "created" if row.uuid in new_uuids else "updated")
+            
+            # Picks the upsert skipped: missing or locked match, or locked pick - one lookup tells which
+            skipped = {r["match_id"] for r in results if not r["error"] and (r["match_id"], r["group_id"]) not in saved}
+            found, locked = set(), set()
+            if skipped:
+                for match_id, prediction_id, group_id in db.query(Match.id, Prediction.id, Prediction.group_id).outerjoin(
+                    Prediction, and_(
+                        Prediction.match_id == Match.id,
+                        Prediction.user_id == user_id,
+                        Prediction.is_locked == True
+                    )
+                ).filter(Match.id.in_(skipped)):
+                    found.add(match_id)
+                    if prediction_id is not None:
+                        locked.add((match_id, group_id))
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error saving predictions in bulk: {e}")
+            db.rollback()
+            return None
+        
+        for result in results:
+            if result["error"]:
+                continue
+            if (result["match_id"], result["group_id"]) in saved:
+                result["prediction_id"], result["status"] = saved[(result["match_id"], result["group_id"])]
+            elif (result["match_id"], result["group_id"]) in locked:
+                result["error"] = "Prediction locked"
+            else:
+                result["error"] = "Match locked" if result["match_id"] in found else "Match not found"
+        
+        return results
+    
+    @staticmethod
+    def _create_predictions_bulk_orm(db: Session, user_id: int, items: List[PredictionCreate]) -> Optional[List[Dict]]:
+        """
+        create_predictions_bulk for databases without INSERT ... ON CONFLICT.
+        
+        The referenced matches and the user's existing picks are loaded in
+        one query each and checked in memory; accepted picks are
+        inserted/updated in one flush and commit.
+        """
+        match_ids = {item.match_id for item in items}
+        matches = {m.id: m for m in db.query(Match).filter(Match.id.in_(match_ids))}
+        existing = {
+            (p.match_id, p.group_id): p
+            for p in db.query(Prediction).filter(
+                Prediction.user_id == user_id,
+                Prediction.match_id.in_(match_ids)
+            )
+        }
+        
+        member_of = PredictionService._member_group_ids(db, user_id, {i.group_id for i in items if i.group_id is not None})
+        
+        now = datetime.now(timezone.utc)
+        results, saved, seen = [], [], set()
+        for index, item in enumerate(items):
+            key = (item.match_id, item.group_id)
+            result = {"index": index, "match_id": item.match_id, "group_id": item.group_id}
+            match = matches.get(item.match_id)
+            prediction = existing.get(key)
+            
+            if key in seen:
+                error = "Duplicate pick in request"
+            elif item.group_id is not None and item.group_id not in member_of:
+                error = "Not a member of this group"
+            elif not match:
+                error = "Match not found"
+            elif PredictionService.is_match_locked(match):
+                error = "Match locked"
+            elif prediction and prediction.is_locked:
+                error = "Prediction locked"
+            else:
+                error = None
+            seen.add(key)
+            
+            if error:
+                results.append({**result, "status": "rejected", "error": error, "prediction_id": None})
+                continue
+            
+            if prediction:
+                prediction.home_pred = item.home_pred
+                prediction.away_pred = item.away_pred
+                prediction.advance_team = item.advance_team
+                prediction.updated_at = now
+                result["status"] = "updated"
+            else:
+                prediction = Prediction(
+                    user_id=user_id,
+                    match_id=item.match_id,
+                    group_id=item.group_id,
+                    home_pred=item.home_pred,
+                    away_pred=item.away_pred,
+                    advance_team=item.advance_team,
+                )
+                db.add(prediction)
+                result["status"] = "created"
+            saved.append((result, prediction))
+            results.append(result)
+        
+        try:
+            db.flush()
+            for result, prediction in saved:
+                result["prediction_id"] = prediction.id
+                result["error"] = None
+            db.commit()
+        except Exception as e:
+            logger.error(f"Error saving predictions in bulk: {e}")
+            db.rollback()
+            return None
+        
+        return results
+    
     @staticmethod
     def is_match_locked(match: Match, lock_minutes: int = 10) -> bool:
         """Check if match prediction is locked"""
         now = datetime.now(timezone.utc)
         kickoff = match.kickoff_at_utc
+        if kickoff.tzinfo is None:
+            kickoff = kickoff.replace(tzinfo=timezone.utc)
         
         # Lock if within lock_minutes of kickoff or match has started
         lock_threshold = kickoff - timedelta(minutes=lock_minutes)
@@ -248,14 +561,18 @@ class ScoringService:
     POINTS_RESULT_ONLY = 2
     POINTS_ADVANCE = 2
     
+    # Knockout sides (who goes through)
+    ADVANCE_NONE = -1
+    ADVANCE_HOME = 0
+    ADVANCE_AWAY = 1
+    
     @staticmethod
     def calculate_points(prediction: Prediction, match: Match) -> Tuple[int, dict]:
-        """Calculate points for a prediction"""
+        """Calculate points for a prediction (plus the advance bonus in knockout matches)"""
         if match.status != MatchStatus.FINISHED or match.home_score is None:
             return 0, {}
         
-        home_score = match.home_score
-        away_score = match.away_score
+        home_score, away_score = ScoringService.counted_score(match)
         home_pred = prediction.home_pred
         away_pred = prediction.away_pred
         
@@ -263,13 +580,22 @@ class ScoringService:
             "exact": False,
             "result": False,
             "balance": False,
+            "advance": False,
         }
         
         points = 0
         
+        # Advancing team (knockout only)
+        actual_side = ScoringService.advancing_side(match)
+        if actual_side != ScoringService.ADVANCE_NONE and actual_side == ScoringService.predicted_side(
+            match, prediction.advance_team, home_pred, away_pred
+        ):
+            points = ScoringService.POINTS_ADVANCE
+            details["advance"] = True
+        
         # Exact score
         if home_pred == home_score and away_pred == away_score:
-            points = ScoringService.POINTS_EXACT
+            points += ScoringService.POINTS_EXACT
             details["exact"] = True
             return points, details
         
@@ -285,25 +611,294 @@ class ScoringService:
             actual_balance = home_score - away_score
             
             if pred_balance == actual_balance:
-                points = ScoringService.POINTS_RESULT_BALANCE
+                points += ScoringService.POINTS_RESULT_BALANCE
                 details["balance"] = True
             else:
-                points = ScoringService.POINTS_RESULT_ONLY
+                points += ScoringService.POINTS_RESULT_ONLY
         
         return points, details
     
     @staticmethod
-    def get_tiebreaker_order(users_with_points: List[Tuple[int, int]]) -> List[int]:
+    def is_knockout(match: Match) -> bool:
+        """Knockout matches are decided on the day (extra time, penalties)"""
+        return match.stage is not None and match.stage != MatchStage.GROUP
+    
+    @staticmethod
+    def counted_score(match: Match) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Score predictions are judged on.
+        
+        home_score/away_score hold the score after 90 minutes and
+        *_score_et the score after extra time (including the first 90).
+        Knockout matches that went to extra time count the latter unless
+        KNOCKOUT_SCORE_AFTER_EXTRA_TIME is off.
+        """
+        if (
+            settings.KNOCKOUT_SCORE_AFTER_EXTRA_TIME
+            and ScoringService.is_knockout(match)
+            and match.home_score_et is not None
+            and match.away_score_et is not None
+        ):
+            return match.home_score_et, match.away_score_et
+        return match.home_score, match.away_score
+    
+    @staticmethod
+    def advancing_side(match: Match) -> int:
+        """Side that went through a knockout match (ADVANCE_NONE for group matches or no decision yet)"""
+        if not ScoringService.is_knockout(match) or match.home_score is None:
+            return ScoringService.ADVANCE_NONE
+        
+        # Winner after extra time, else the shootout
+        home, away = (
+            (match.home_score_et, match.away_score_et)
+            if match.home_score_et is not None and match.away_score_et is not None
+            else (match.home_score, match.away_score)
+        )
+        if home == away:
+            home, away = match.home_score_pen, match.away_score_pen
+            if home is None or away is None:
+                return ScoringService.ADVANCE_NONE
+        
+        if home > away:
+            return ScoringService.ADVANCE_HOME
+        if home < away:
+            return ScoringService.ADVANCE_AWAY
+        return ScoringService.ADVANCE_NONE
+    
+    @staticmethod
+    def predicted_side(match: Match, advance_team: Optional[str], home_pred: int, away_pred: int) -> int:
+        """Side a prediction sends through: its advance_team (name or code), else the winner of its pick"""
+        if advance_team:
+            if advance_team in (match.home_team, match.home_team_code):
+                return ScoringService.ADVANCE_HOME
+            if advance_team in (match.away_team, match.away_team_code):
+                return ScoringService.ADVANCE_AWAY
+            return ScoringService.ADVANCE_NONE
+        
+        if home_pred > away_pred:
+            return ScoringService.ADVANCE_HOME
+        if home_pred < away_pred:
+            return ScoringService.ADVANCE_AWAY
+        return ScoringService.ADVANCE_NONE
+    
+    @staticmethod
+    def predicted_sides(match: Match, home_pred, away_pred, advance_teams=None) -> np.ndarray:
+        """Vectorized predicted_side for all picks on one match"""
+        home_pred = np.asarray(home_pred, dtype=np.int64)
+        away_pred = np.asarray(away_pred, dtype=np.int64)
+        sides = np.where(
+            home_pred > away_pred, ScoringService.ADVANCE_HOME,
+            np.where(home_pred < away_pred, ScoringService.ADVANCE_AWAY, ScoringService.ADVANCE_NONE)
+        )
+        
+        if advance_teams is not None:
+            named = [idx for idx, team in enumerate(advance_teams) if team]
+            if named:
+                sides[named] = [
+                    ScoringService.predicted_side(match, advance_teams[idx], 0, 0) for idx in named
+                ]
+        return sides
+    
+    @staticmethod
+    def score_match_batch(match: Match, home_pred, away_pred, advance_teams=None) -> Tuple[np.ndarray, ...]:
+        """
+        Score all predictions of one match together, knockout rules included.
+        
+        Picks are judged on counted_score and, when the match decided who
+        advances, those sending the right side through earn POINTS_ADVANCE.
+        Returns (points, exact, result, balance, advance, goal_error) arrays;
+        points match calculate_points exactly.
+        """
+        home_score, away_score = ScoringService.counted_score(match)
+        points, exact, result, balance = ScoringService.calculate_points_batch(
+            home_pred, away_pred, home_score, away_score
+        )
+        error = ScoringService.goal_error(home_pred, away_pred, home_score, away_score)
+        
+        actual_side = ScoringService.advancing_side(match)
+        if actual_side == ScoringService.ADVANCE_NONE:
+            advance = np.zeros(points.shape, dtype=bool)
+        else:
+            advance = ScoringService.predicted_sides(match, home_pred, away_pred, advance_teams) == actual_side
+            points = points + advance * ScoringService.POINTS_ADVANCE
+        
+        return points, exact, result, balance, advance, error
+    
+    @staticmethod
+    def calculate_points_batch(home_pred, away_pred, home_score, away_score) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized calculate_points for many predictions at once.
+        
+        Inputs are integer arrays (or scalars) that broadcast together, e.g.
+        arrays of picks against the scalar final score of one match.
+        Returns (points, exact, result, balance) arrays with exactly the
+        same values as calculate_points; as there, an exact hit does not
+        also set the result/balance flags.
+        """
+        home_pred = np.asarray(home_pred, dtype=np.int64)
+        away_pred = np.asarray(away_pred, dtype=np.int64)
+        home_score = np.asarray(home_score, dtype=np.int64)
+        away_score = np.asarray(away_score, dtype=np.int64)
+        
+        pred_balance = home_pred - away_pred
+        actual_balance = home_score - away_score
+        
+        exact = (home_pred == home_score) & (away_pred == away_score)
+        result = ~exact & (np.sign(pred_balance) == np.sign(actual_balance))
+        balance = result & (pred_balance == actual_balance)
+        
+        points = np.where(
+            exact, ScoringService.POINTS_EXACT,
+            np.where(
+                balance, ScoringService.POINTS_RESULT_BALANCE,
+                np.where(result, ScoringService.POINTS_RESULT_ONLY, 0)
+            )
+        )
+        
+        return points, exact, result, balance
+    
+    @staticmethod
+    def goal_error(home_pred, away_pred, home_score, away_score):
+        """Absolute goal error of a prediction (scalars or broadcastable arrays)"""
+        return np.abs(np.asarray(home_pred) - home_score) + np.abs(np.asarray(away_pred) - away_score)
+    
+    @staticmethod
+    def tiebreaker_sort_key(total_points: int, exact_matches: int, correct_results: int,
+                            goal_error: int = 0, first_prediction_at: Optional[datetime] = None) -> str:
+        """
+        Encode the full tiebreaker chain as one fixed-width string key.
+        
+        Keys sort ascending best-first: more points, more exact scores,
+        more correct results, lower absolute goal error sum, then the
+        earliest first prediction. Equal keys mean a genuine tie.
+        """
+        if first_prediction_at is None:
+            submitted = 9_999_999_999
+        else:
+            if first_prediction_at.tzinfo is None:
+                first_prediction_at = first_prediction_at.replace(tzinfo=timezone.utc)
+            submitted = int(first_prediction_at.timestamp())
+        
+        return (
+            f"{999_999 - total_points:06d}"
+            f"{999_999 - exact_matches:06d}"
+            f"{999_999 - correct_results:06d}"
+            f"{min(goal_error, 999_999_999):09d}"
+            f"{submitted:010d}"
+        )
+    
+    @staticmethod
+    def get_tiebreaker_order(entries: List[dict]) -> List[int]:
         """
         Sort users by tiebreaker rules.
-        Input: [(user_id, total_points), ...]
+        Input: [{"user_id", "total_points", "exact_matches", "correct_results",
+                 "goal_error", "first_prediction_at"}, ...] (last two optional)
         Returns: sorted list of user_ids
         """
-        # TODO: Implement full tiebreaker logic
-        # 1. Exact matches count
-        # 2. Result accuracy count
-        # 3. Absolute error sum
-        # 4. First to predict
-        
-        # For now, just return by points
-        return [uid for uid, _ in sorted(users_with_points, key=lambda x: x[1], reverse=True)]
+        keyed = [
+            (ScoringService.tiebreaker_sort_key(
+                e["total_points"], e["exact_matches"], e["correct_results"],
+                e.get("goal_error", 0), e.get("first_prediction_at")
+            ), e["user_id"])
+            for e in entries
+        ]
+        return [user_id for _, user_id in sorted(keyed)]
+
+class ScoringRules:
+    """
+    Point values of a scoring system, compiled to a lookup table.
+    
+    table[home_pred, away_pred, home_score, away_score] holds the points
+    for every scoreline up to MAX_GOALS goals per team, so scoring a batch
+    of predictions is one indexing operation instead of per-row branches.
+    Scorelines beyond the table fall back to the batch kernel.
+    """
+    
+    SYSTEMS = ("standard", "custom")
+    RULES = ("exact", "result_balance", "result", "advance")
+    MAX_GOALS = 20  # same bound as predicted goals
+    MAX_POINTS = 100
+    
+    def __init__(self, exact: int = ScoringService.POINTS_EXACT,
+                 result_balance: int = ScoringService.POINTS_RESULT_BALANCE,
+                 result: int = ScoringService.POINTS_RESULT_ONLY,
+                 advance: int = ScoringService.POINTS_ADVANCE):
+        for name, value in zip(self.RULES, (exact, result_balance, result, advance)):
+            if not isinstance(value, int) or not 0 <= value <= self.MAX_POINTS:
+                raise ValueError(f"{name} must be an integer between 0 and {self.MAX_POINTS}")
+        
+        self.exact = exact
+        self.result_balance = result_balance
+        self.result = result
+        self.advance = advance  # knockout bonus for sending the right side through
+        # Points per outcome kind: miss, result only, result + balance, exact
+        self.values = np.array([0, result, result_balance, exact], dtype=np.int64)
+        self.table = _compile_points_table(exact, result_balance, result)
+    
+    @classmethod
+    def from_group_settings(cls, scoring_system: Optional[str], scoring_rules: Optional[Dict]) -> "ScoringRules":
+        """Rules of a group: the standard system, or custom values over the standard ones"""
+        if scoring_system != "custom" or not scoring_rules:
+            return STANDARD_RULES
+        return cls(**{name: scoring_rules[name] for name in cls.RULES if name in scoring_rules})
+    
+    @property
+    def is_standard(self) -> bool:
+        return self.to_dict() == STANDARD_RULES.to_dict()
+    
+    def to_dict(self) -> Dict[str, int]:
+        return {"exact": self.exact, "result_balance": self.result_balance, "result": self.result, "advance": self.advance}
+    
+    def points(self, home_pred, away_pred, home_score, away_score) -> np.ndarray:
+        """Points for broadcastable arrays of picks and scores, by table lookup"""
+        home_pred, away_pred, home_score, away_score = np.broadcast_arrays(
+            *(np.asarray(v, dtype=np.int64) for v in (home_pred, away_pred, home_score, away_score))
+        )
+        
+        in_table = (
+            (np.minimum(np.minimum(home_pred, away_pred), np.minimum(home_score, away_score)) >= 0)
+            & (np.maximum(np.maximum(home_pred, away_pred), np.maximum(home_score, away_score)) <= self.MAX_GOALS)
+        )
+        if in_table.all():
+            return self.table[home_pred, away_pred, home_score, away_score].astype(np.int64)
+        
+        points = np.zeros(home_pred.shape, dtype=np.int64)
+        points[in_table] = self.table[home_pred[in_table], away_pred[in_table], home_score[in_table], away_score[in_table]]
+        outside = ~in_table
+        points[outside] = self.values[_outcome_kind(home_pred[outside], away_pred[outside], home_score[outside], away_score[outside])]
+        return points
+    
+    def points_for_details(self, details: Optional[Dict]) -> int:
+        """Points for a stored score_details dict ({} = not scored), advance bonus included"""
+        if not details:
+            return 0
+        bonus = self.advance if details.get("advance") else 0
+        if details.get("exact"):
+            return self.exact + bonus
+        if details.get("balance"):
+            return self.result_balance + bonus
+        if details.get("result"):
+            return self.result + bonus
+        return bonus
+
+def _outcome_kind(home_pred, away_pred, home_score, away_score) -> np.ndarray:
+    """0 = miss, 1 = result only, 2 = result and goal difference, 3 = exact"""
+    _, exact, result, balance = ScoringService.calculate_points_batch(home_pred, away_pred, home_score, away_score)
+    return np.where(exact, 3, np.where(balance, 2, np.where(result, 1, 0)))
+
+@lru_cache(maxsize=1)
+def _outcome_table() -> np.ndarray:
+    """Outcome kind for every (home_pred, away_pred, home_score, away_score) up to MAX_GOALS"""
+    goals = np.arange(ScoringRules.MAX_GOALS + 1)
+    grid = np.meshgrid(goals, goals, goals, goals, indexing="ij")
+    return _outcome_kind(*grid).astype(np.int8)
+
+@lru_cache(maxsize=64)
+def _compile_points_table(exact: int, result_balance: int, result: int) -> np.ndarray:
+    """Points table for one set of point values (shared between groups using the same values)"""
+    values = np.array([0, result, result_balance, exact], dtype=np.int16)
+    table = values[_outcome_table()]
+    table.flags.writeable = False
+    return table
+
+STANDARD_RULES = ScoringRules()
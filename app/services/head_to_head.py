@@ -0,0 +1,212 @@
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Group, HeadToHead, Match, MatchStatus, Prediction
+from app.services.business import ScoringRules
+import logging
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class HeadToHeadService:
+    """Pairwise head-to-head records between the players of a group"""
+    
+    @staticmethod
+    def rebuild_group(db: Session, group_id: int, user_ids: np.ndarray, match_ids: np.ndarray, points: np.ndarray):
+        """
+        Bring a group's head-to-head table in line with its scored predictions.
+        
+        user_ids/match_ids/points are parallel arrays of the group's
+        predictions on finished matches (points under the group's rules).
+        They form one players x matches points grid that is compared match
+        by match as players x players matrices. Only pairs whose record
+        differs from the stored one are written, so a recompute after a
+        result that apply_match already counted writes nothing. Runs in the
+        caller's transaction; groups above HEAD_TO_HEAD_MAX_PLAYERS are
+        skipped (and lose their records).
+        """
+        existing = {
+            (row.user_id, row.opponent_id): row
+            for row in db.query(
+                HeadToHead.id, HeadToHead.user_id, HeadToHead.opponent_id,
+                HeadToHead.wins, HeadToHead.losses, HeadToHead.draws
+            ).filter(HeadToHead.group_id == group_id)
+        }
+        
+        records = {}
+        users, user_idx = np.unique(np.asarray(user_ids, dtype=np.int64), return_inverse=True)
+        if 2 <= len(users) <= settings.HEAD_TO_HEAD_MAX_PLAYERS:
+            matches, match_idx = np.unique(np.asarray(match_ids, dtype=np.int64), return_inverse=True)
+            
+            grid = np.zeros((len(users), len(matches)), dtype=np.int64)
+            picked = np.zeros((len(users), len(matches)), dtype=bool)
+            grid[user_idx, match_idx] = points
+            picked[user_idx, match_idx] = True
+            
+            wins = np.zeros((len(users), len(users)), dtype=np.int64)
+            draws = np.zeros((len(users), len(users)), dtype=np.int64)
+            for column in range(len(matches)):
+                match_wins, match_draws = HeadToHeadService._match_outcomes(grid[:, column], picked[:, column])
+                wins += match_wins
+                draws += match_draws
+            
+            first, second = np.triu_indices(len(users), 1)
+            records = {
+                (user_id, opponent_id): (won, lost, drawn)
+                for user_id, opponent_id, won, lost, drawn in zip(
+                    users[first].tolist(), users[second].tolist(),
+                    wins[first, second].tolist(), wins[second, first].tolist(), draws[first, second].tolist()
+                )
+            }
+        
+        updates, inserts = [], []
+        for (user_id, opponent_id), (won, lost, drawn) in records.items():
+            row = existing.get((user_id, opponent_id))
+            if not row:
+                inserts.append({"group_id": group_id, "user_id": user_id, "opponent_id": opponent_id,
+                                "wins": won, "losses": lost, "draws": drawn})
+            elif (row.wins, row.losses, row.draws) != (won, lost, drawn):
+                updates.append({"id": row.id, "wins": won, "losses": lost, "draws": drawn})
+        stale = [row.id for pair, row in existing.items() if pair not in records]
+        
+        if stale:
+            db.query(HeadToHead).filter(HeadToHead.id.in_(stale)).delete(synchronize_session=False)
+        if updates:
+            db.execute(update(HeadToHead), updates)
+        if inserts:
+            db.execute(insert(HeadToHead), inserts)
+    
+    @staticmethod
+    def apply_match(db: Session, group_id: int, before: Dict[int, int], after: Dict[int, int]) -> bool:
+        """
+        Move a group's head-to-head records by one match's change.
+        
+        before/after map the players who had a scored prediction on the
+        match (before and after the change) to their points. Only this
+        match's players x players outcomes are recomputed; pairs whose
+        outcome changed are updated in bulk. Returns False when the group
+        has no records yet (the next full recalculation builds them).
+        """
+        rows = db.query(
+            HeadToHead.id, HeadToHead.user_id, HeadToHead.opponent_id,
+            HeadToHead.wins, HeadToHead.losses, HeadToHead.draws
+        ).filter(HeadToHead.group_id == group_id).all()
+        if not rows:
+            return False
+        
+        known = {row.user_id for row in rows} | {row.opponent_id for row in rows}
+        users = np.array(sorted(known | set(before) | set(after)), dtype=np.int64)
+        if len(users) > settings.HEAD_TO_HEAD_MAX_PLAYERS:
+            return False
+        
+        def outcomes(scores: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+            points = np.zeros(len(users), dtype=np.int64)
+            picked = np.zeros(len(users), dtype=bool)
+            if scores:
+                idx = np.searchsorted(users, list(scores))
+                points[idx] = list(scores.values())
+                picked[idx] = True
+            return HeadToHeadService._match_outcomes(points, picked)
+        
+        new_wins, new_draws = outcomes(after)
+        old_wins, old_draws = outcomes(before)
+        win_delta = new_wins.astype(np.int64) - old_wins
+        draw_delta = new_draws.astype(np.int64) - old_draws
+        
+        by_pair = {(row.user_id, row.opponent_id): row for row in rows}
+        updates, inserts = [], []
+        changed = np.triu((win_delta != 0) | (win_delta.T != 0) | (draw_delta != 0), 1)
+        for first, second in zip(*np.nonzero(changed)):
+            pair = (int(users[first]), int(users[second]))
+            won, lost, drawn = int(win_delta[first, second]), int(win_delta[second, first]), int(draw_delta[first, second])
+            row = by_pair.get(pair)
+            if row:
+                updates.append({"id": row.id, "wins": row.wins + won, "losses": row.losses + lost, "draws": row.draws + drawn})
+            else:
+                inserts.append({"group_id": group_id, "user_id": pair[0], "opponent_id": pair[1],
+                                "wins": won, "losses": lost, "draws": drawn})
+        
+        if updates:
+            db.execute(update(HeadToHead), updates)
+        if inserts:
+            db.execute(insert(HeadToHead), inserts)
+        return True
+    
+    @staticmethod
+    def _match_outcomes(points: np.ndarray, picked: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (wins, draws) players x players for one match.
+        
+        wins[a, b] is set when a scored more than b, draws[a, b] when
+        they scored the same; pairs where neither predicted don't count.
+        """
+        involved = picked[:, None] | picked[None, :]
+        wins = (points[:, None] > points[None, :]) & involved
+        draws = (points[:, None] == points[None, :]) & involved
+        return wins, draws
+    
+    @staticmethod
+    def get_head_to_head(db: Session, group_id: int, user_id: int, opponent_id: int) -> Optional[Dict]:
+        """
+        Compare two players of a group.
+        
+        Wins/losses/draws come from the precomputed pair record; the
+        per-match points and running difference only read the two
+        players' predictions.
+        """
+        from app.services.ranking import RankingService
+        
+        group = db.query(Group).filter(Group.id == group_id).first()
+        if not group or user_id == opponent_id:
+            return None
+        
+        first, second = sorted((user_id, opponent_id))
+        record = db.query(HeadToHead).filter(
+            HeadToHead.group_id == group_id,
+            HeadToHead.user_id == first,
+            HeadToHead.opponent_id == second
+        ).first()
+        wins, losses, draws = (record.wins, record.losses, record.draws) if record else (0, 0, 0)
+        if record and user_id != first:
+            wins, losses = losses, wins
+        
+        rules = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+        picks = db.query(
+            Prediction.user_id, Prediction.score_details, Match.id, Match.home_team, Match.away_team, Match.kickoff_at_utc
+        ).join(
+            Match, Match.id == Prediction.match_id
+        ).filter(
+            RankingService._group_picks_filter(group_id, group.use_global_picks),
+            Prediction.user_id.in_([user_id, opponent_id]),
+            Match.status == MatchStatus.FINISHED
+        ).order_by(Match.kickoff_at_utc, Match.id).all()
+        
+        by_match: Dict[int, Dict] = {}
+        for pick_user_id, details, match_id, home_team, away_team, kickoff_at_utc in picks:
+            row = by_match.setdefault(match_id, {
+                "match_id": match_id,
+                "home_team": home_team,
+                "away_team": away_team,
+                "kickoff_at_utc": kickoff_at_utc,
+                "points": 0,
+                "opponent_points": 0,
+            })
+            row["points" if pick_user_id == user_id else "opponent_points"] = rules.points_for_details(details)
+        
+        difference = 0
+        for row in by_match.values():
+            difference += row["points"] - row["opponent_points"]
+            row["difference"] = difference
+        
+        return {
+            "group_id": group_id,
+            "user_id": user_id,
+            "opponent_id": opponent_id,
+            "wins": wins,
+            "losses": losses,
+            "draws": draws,
+            "points": sum(row["points"] for row in by_match.values()),
+            "opponent_points": sum(row["opponent_points"] for row in by_match.values()),
+            "matches": list(by_match.values()),
+        }
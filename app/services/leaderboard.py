@@ -0,0 +1,241 @@
+from abc import ABC, abstractmethod
+from app.config import settings
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Users are ordered by their standings sort key (ScoringService.tiebreaker_sort_key):
+# a fixed-width string holding the whole tiebreaker chain, down to the first
+# prediction time, ascending best-first. No float score can hold that chain
+# exactly, so keys are compared as strings - equal keys share a rank, exactly
+# like standings_entries.rank.
+SORT_KEY_POINTS_DIGITS = 6
+
+def leaderboard_key(entry: Dict) -> str:
+    """The leaderboard key of a standings entry (its full tiebreaker sort key)"""
+    return entry["sort_key"]
+
+def points_from_key(key: str) -> int:
+    """Recover total points from a leaderboard key (points lead the key as 999999 - points)"""
+    return 999_999 - int(key[:SORT_KEY_POINTS_DIGITS])
+
+class LeaderboardBackend(ABC):
+    """
+    Abstract leaderboard keyed by scope ("GLOBAL", "GROUP:<id>").
+    
+    Ranks are 1-based with the smallest sort key first; equal keys share
+    a rank (competition ranking, "1, 2, 2, 4"). Each scope also records
+    the standings version its keys were published from, so readers can
+    tell when the table has moved past the board.
+    """
+    
+    @abstractmethod
+    def replace(self, scope: str, keys: Dict[int, str], version: int = 0):
+        """Replace all sort keys of a scope, published from standings `version`"""
+        pass
+    
+    @abstractmethod
+    def set_version(self, scope: str, version: int):
+        """Record the standings version a scope's keys now reflect"""
+        pass
+    
+    @abstractmethod
+    def version(self, scope: str) -> int:
+        """The standings version a scope's keys were published from (0 if unknown)"""
+        pass
+    
+    @abstractmethod
+    def set_key(self, scope: str, user_id: int, key: str):
+        """Set one user's sort key"""
+        pass
+    
+    @abstractmethod
+    def remove(self, scope: str, user_id: int):
+        """Remove a user from a scope"""
+        pass
+    
+    @abstractmethod
+    def rank(self, scope: str, user_id: int) -> Optional[int]:
+        """Get a user's rank, or None if not ranked"""
+        pass
+    
+    @abstractmethod
+    def key(self, scope: str, user_id: int) -> Optional[str]:
+        """Get a user's sort key, or None if not ranked"""
+        pass
+    
+    @abstractmethod
+    def range(self, scope: str, offset: int = 0, limit: int = 10) -> List[Tuple[int, str]]:
+        """Get (user_id, sort key) pairs by rank, starting at offset"""
+        pass
+    
+    @abstractmethod
+    def count(self, scope: str) -> int:
+        """Number of ranked users in a scope"""
+        pass
+
+class InMemoryLeaderboard(LeaderboardBackend):
+    """In-process leaderboard for tests and single-node installs"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._user_keys: Dict[str, Dict[int, str]] = {}
+        # Sorted (key, user_id) pairs per scope - rank lookups are a bisect
+        self._sorted: Dict[str, List[Tuple[str, int]]] = {}
+        self._versions: Dict[str, int] = {}
+    
+    def replace(self, scope: str, keys: Dict[int, str], version: int = 0):
+        with self._lock:
+            self._user_keys[scope] = dict(keys)
+            self._sorted[scope] = sorted((key, user_id) for user_id, key in keys.items())
+            self._versions[scope] = version
+    
+    def set_version(self, scope: str, version: int):
+        with self._lock:
+            self._versions[scope] = version
+    
+    def version(self, scope: str) -> int:
+        with self._lock:
+            return self._versions.get(scope, 0)
+    
+    def set_key(self, scope: str, user_id: int, key: str):
+        with self._lock:
+            self._discard(scope, user_id)
+            self._user_keys.setdefault(scope, {})[user_id] = key
+            insort(self._sorted.setdefault(scope, []), (key, user_id))
+    
+    def remove(self, scope: str, user_id: int):
+        with self._lock:
+            self._discard(scope, user_id)
+    
+    def rank(self, scope: str, user_id: int) -> Optional[int]:
+        with self._lock:
+            key = self._user_keys.get(scope, {}).get(user_id)
+            if key is None:
+                return None
+            # (key,) sorts before every pair with that key
+            return bisect_left(self._sorted[scope], (key,)) + 1
+    
+    def key(self, scope: str, user_id: int) -> Optional[str]:
+        with self._lock:
+            return self._user_keys.get(scope, {}).get(user_id)
+    
+    def range(self, scope: str, offset: int = 0, limit: int = 10) -> List[Tuple[int, str]]:
+        with self._lock:
+            return [(user_id, key) for key, user_id in self._sorted.get(scope, [])[offset:offset + limit]]
+    
+    def count(self, scope: str) -> int:
+        with self._lock:
+            return len(self._user_keys.get(scope, {}))
+    
+    def _discard(self, scope: str, user_id: int):
+        old = self._user_keys.get(scope, {}).pop(user_id, None)
+        if old is not None:
+            pairs = self._sorted[scope]
+            del pairs[bisect_left(pairs, (old, user_id))]
+
+class RedisLeaderboard(LeaderboardBackend):
+    """
+    Leaderboard on Redis: one lexicographic ZSET per scope.
+    
+    Members are "<sort key>:<user id>" at score 0, so ZRANGE walks the
+    board in rank order and ZLEXCOUNT up to a key counts the users ahead
+    of it; a hash per scope maps users to their current key.
+    """
+    
+    KEY_PREFIX = "leaderboard:lex:"
+    
+    def __init__(self, redis_url: str):
+        import redis
+        
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.client.ping()
+    
+    def _key(self, scope: str) -> str:
+        return f"{self.KEY_PREFIX}{scope}"
+    
+    def _users_key(self, scope: str) -> str:
+        return f"{self.KEY_PREFIX}{scope}:users"
+    
+    def _version_key(self, scope: str) -> str:
+        return f"{self.KEY_PREFIX}{scope}:version"
+    
+    def replace(self, scope: str, keys: Dict[int, str], version: int = 0):
+        # Build aside and RENAME so readers never see a partial board
+        key, users_key = self._key(scope), self._users_key(scope)
+        tmp_key, tmp_users_key = f"{key}:building", f"{users_key}:building"
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(tmp_key, tmp_users_key)
+        if keys:
+            pipe.zadd(tmp_key, {f"{sort_key}:{user_id}": 0 for user_id, sort_key in keys.items()})
+            pipe.hset(tmp_users_key, mapping={str(user_id): sort_key for user_id, sort_key in keys.items()})
+            pipe.rename(tmp_key, key)
+            pipe.rename(tmp_users_key, users_key)
+        else:
+            pipe.delete(key, users_key)
+        pipe.set(self._version_key(scope), version)
+        pipe.execute()
+    
+    def set_version(self, scope: str, version: int):
+        self.client.set(self._version_key(scope), version)
+    
+    def version(self, scope: str) -> int:
+        return int(self.client.get(self._version_key(scope)) or 0)
+    
+    def set_key(self, scope: str, user_id: int, key: str):
+        old = self.client.hget(self._users_key(scope), str(user_id))
+        pipe = self.client.pipeline(transaction=True)
+        if old is not None:
+            pipe.zrem(self._key(scope), f"{old}:{user_id}")
+        pipe.zadd(self._key(scope), {f"{key}:{user_id}": 0})
+        pipe.hset(self._users_key(scope), str(user_id), key)
+        pipe.execute()
+    
+    def remove(self, scope: str, user_id: int):
+        old = self.client.hget(self._users_key(scope), str(user_id))
+        if old is None:
+            return
+        pipe = self.client.pipeline(transaction=True)
+        pipe.zrem(self._key(scope), f"{old}:{user_id}")
+        pipe.hdel(self._users_key(scope), str(user_id))
+        pipe.execute()
+    
+    def rank(self, scope: str, user_id: int) -> Optional[int]:
+        key = self.key(scope, user_id)
+        if key is None:
+            return None
+        # Members with a strictly smaller key (fixed width, so "<key>:..." never sorts below "<key>")
+        return self.client.zlexcount(self._key(scope), "-", f"({key}") + 1
+    
+    def key(self, scope: str, user_id: int) -> Optional[str]:
+        return self.client.hget(self._users_key(scope), str(user_id))
+    
+    def range(self, scope: str, offset: int = 0, limit: int = 10) -> List[Tuple[int, str]]:
+        if limit <= 0:
+            return []
+        members = self.client.zrange(self._key(scope), offset, offset + limit - 1)
+        return [(int(user_id), key) for key, user_id in (member.rsplit(":", 1) for member in members)]
+    
+    def count(self, scope: str) -> int:
+        return self.client.zcard(self._key(scope))
+
+_leaderboard: Optional[LeaderboardBackend] = None
+
+def get_leaderboard() -> LeaderboardBackend:
+    """Get the configured leaderboard backend (Redis if REDIS_URL is set)"""
+    global _leaderboard
+    
+    if _leaderboard is None:
+        if settings.REDIS_URL:
+            try:
+                _leaderboard = RedisLeaderboard(settings.REDIS_URL)
+            except Exception as e:
+                logger.warning(f"Redis leaderboard unavailable, using in-memory: {e}")
+                _leaderboard = InMemoryLeaderboard()
+        else:
+            _leaderboard = InMemoryLeaderboard()
+    
+    return _leaderboard
@@ -0,0 +1,190 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import Match, MatchStatus, Prediction, Group
+from app.services.business import ScoringService, ScoringRules, STANDARD_RULES
+from app.services.simulation import SimulationService
+import logging
+import numpy as np
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class PickOptimizer:
+    """Picks that maximize expected points under a score probability matrix"""
+    
+    # Scorelines considered per team in crowd matrices (larger scores fold into the last row/column)
+    MAX_GOALS = 10
+    
+    # Share of knockout draws (after extra time) the home side wins on penalties
+    PENALTY_HOME_SHARE = 0.5
+    
+    # Runner-up picks returned with each suggestion
+    ALTERNATIVES = 3
+    
+    @staticmethod
+    def expected_points(probabilities, rules: ScoringRules = STANDARD_RULES, knockout=False) -> np.ndarray:
+        """
+        Expected points of every candidate pick, for one or many matches.
+        
+        probabilities[..., i, j] is the chance the counted score ends i-j
+        (normalized here; at most MAX_GOALS + 1 of the rules' table per
+        side). The result has the same shape: entry [..., i, j] is the
+        expected points of picking i-j, from one tensordot against the
+        rules' points table. In knockouts (bool, or one per match) the
+        advance bonus is added for the side the pick sends through; a
+        drawn pick backs the likelier side.
+        """
+        probs = np.asarray(probabilities, dtype=np.float64)
+        if probs.ndim < 2 or probs.shape[-1] != probs.shape[-2]:
+            raise ValueError("probabilities must be a square home x away matrix")
+        size = probs.shape[-1]
+        if not 1 <= size <= ScoringRules.MAX_GOALS + 1:
+            raise ValueError(f"probabilities must cover 1 to {ScoringRules.MAX_GOALS + 1} scorelines per team")
+        if not np.isfinite(probs).all() or (probs < 0).any():
+            raise ValueError("probabilities must be finite and non-negative")
+        totals = probs.sum(axis=(-2, -1), keepdims=True)
+        if (totals <= 0).any():
+            raise ValueError("probabilities must not be all zero")
+        probs = probs / totals
+        
+        # payoff[i, j, k, l] = points of picking i-j when the score is k-l
+        payoff = rules.table[:size, :size, :size, :size]
+        expected = np.tensordot(probs, payoff, axes=([probs.ndim - 2, probs.ndim - 1], [2, 3]))
+        
+        knockout = np.asarray(knockout, dtype=bool)
+        if knockout.any():
+            home_advance, away_advance = PickOptimizer._advance_chances(probs)
+            goals = np.arange(size)
+            home_pick = goals[:, None] > goals[None, :]
+            away_pick = goals[:, None] < goals[None, :]
+            bonus = np.where(
+                home_pick, home_advance[..., None, None],
+                np.where(away_pick, away_advance[..., None, None],
+                         np.maximum(home_advance, away_advance)[..., None, None])
+            )
+            expected = expected + rules.advance * bonus * knockout[..., None, None]
+        
+        return expected
+    
+    @staticmethod
+    def best_pick(probabilities, rules: ScoringRules = STANDARD_RULES, knockout: bool = False) -> Dict:
+        """The expected-points maximizing pick for one match, with runner-up picks"""
+        probs = np.asarray(probabilities, dtype=np.float64)
+        expected = PickOptimizer.expected_points(probs, rules, knockout)
+        size = expected.shape[-1]
+        
+        order = np.argsort(-expected, axis=None, kind="stable")[:1 + PickOptimizer.ALTERNATIVES]
+        picks = [
+            {"home_pred": int(idx // size), "away_pred": int(idx % size), "expected_points": round(float(expected.flat[idx]), 3)}
+            for idx in order
+        ]
+        
+        best = picks[0]
+        if knockout:
+            home_advance, away_advance = PickOptimizer._advance_chances(probs / probs.sum())
+            if best["home_pred"] > best["away_pred"] or (best["home_pred"] == best["away_pred"] and home_advance >= away_advance):
+                best["advance"] = "home"
+            else:
+                best["advance"] = "away"
+        
+        return {**best, "alternatives": picks[1:]}
+    
+    @staticmethod
+    def crowd_probabilities(db: Session, match_ids: List[int]) -> Dict[int, np.ndarray]:
+        """
+        Score probability matrix per match from the crowd's predictions.
+        
+        Pick frequencies (scores above MAX_GOALS folded into the edge) are
+        blended with independent Poisson goals at SimulationService rates,
+        which weigh as much as PRIOR_WEIGHT picks - so a match without
+        predictions still gets a sensible matrix.
+        """
+        size = PickOptimizer.MAX_GOALS + 1
+        counts = {match_id: np.zeros((size, size)) for match_id in match_ids}
+        if not counts:
+            return {}
+        
+        rows = db.query(
+            Prediction.match_id, Prediction.home_pred, Prediction.away_pred, func.count(Prediction.id)
+        ).filter(
+            Prediction.match_id.in_(list(counts))
+        ).group_by(Prediction.match_id, Prediction.home_pred, Prediction.away_pred).all()
+        # Picked goal totals (before folding) give the Poisson rates - no second pass over the picks
+        goals = {match_id: [0, 0] for match_id in match_ids}
+        for match_id, home, away, count in rows:
+            counts[match_id][min(home, size - 1), min(away, size - 1)] += count
+            goals[match_id][0] += home * count
+            goals[match_id][1] += away * count
+        
+        weight = SimulationService.PRIOR_WEIGHT
+        probabilities = {}
+        for match_id, matrix in counts.items():
+            picks = int(matrix.sum())
+            home_rate, away_rate = (SimulationService.shrunk_rate(total, picks) for total in goals[match_id])
+            probabilities[match_id] = (
+                matrix + weight * np.outer(_poisson_pmf(home_rate, size), _poisson_pmf(away_rate, size))
+            ) / (picks + weight)
+        return probabilities
+    
+    @staticmethod
+    def suggest_upcoming(db: Session, group_id: Optional[int] = None, limit: int = 20) -> List[Dict]:
+        """
+        Best pick for each upcoming match from the crowd matrices.
+        
+        Points follow the group's scoring system (standard without a
+        group). All matches are scored in one batched expectation.
+        """
+        rules = STANDARD_RULES
+        if group_id is not None:
+            group = db.query(Group.scoring_system, Group.scoring_rules).filter(Group.id == group_id).first()
+            if not group:
+                raise ValueError("Group not found")
+            rules = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+        
+        matches = db.query(Match).filter(
+            Match.status == MatchStatus.SCHEDULED
+        ).order_by(Match.kickoff_at_utc, Match.id).limit(limit).all()
+        if not matches:
+            return []
+        
+        matrices = PickOptimizer.crowd_probabilities(db, [m.id for m in matches])
+        knockout = np.array([ScoringService.is_knockout(m) for m in matches])
+        expected = PickOptimizer.expected_points(np.stack([matrices[m.id] for m in matches]), rules, knockout)
+        
+        size = expected.shape[-1]
+        best = expected.reshape(len(matches), -1).argmax(axis=1)
+        suggestions = []
+        for match, idx, match_expected, is_knockout in zip(matches, best.tolist(), expected, knockout.tolist()):
+            home_pred, away_pred = divmod(idx, size)
+            suggestion = {
+                "match_id": match.id,
+                "home_team": match.home_team,
+                "away_team": match.away_team,
+                "kickoff_at_utc": match.kickoff_at_utc,
+                "home_pred": home_pred,
+                "away_pred": away_pred,
+                "expected_points": round(float(match_expected[home_pred, away_pred]), 3),
+            }
+            if is_knockout:
+                home_advance, away_advance = PickOptimizer._advance_chances(matrices[match.id])
+                home_through = home_pred > away_pred or (home_pred == away_pred and home_advance >= away_advance)
+                suggestion["advance_team"] = match.home_team if home_through else match.away_team
+            suggestions.append(suggestion)
+        
+        return suggestions
+    
+    @staticmethod
+    def _advance_chances(probs: np.ndarray):
+        """(home, away) chance of going through, from a normalized score matrix"""
+        home_win = np.tril(probs, -1).sum(axis=(-2, -1))
+        draw = np.trace(probs, axis1=-2, axis2=-1)
+        home_advance = np.asarray(home_win + PickOptimizer.PENALTY_HOME_SHARE * draw)
+        return home_advance, 1.0 - home_advance
+
+def _poisson_pmf(rate: float, size: int) -> np.ndarray:
+    """P(goals = 0..size-1) for a Poisson rate, with the tail folded into the last entry"""
+    goals = np.arange(size)
+    factorials = np.cumprod(np.r_[1.0, goals[1:]])
+    pmf = np.exp(-rate) * rate ** goals / factorials
+    pmf[-1] += max(0.0, 1.0 - pmf.sum())
+    return pmf
@@ -1,20 +1,101 @@
-from sqlalchemy.orm import Session
-from app.models import Prediction, Match, MatchStatus, Group, User, StandingsCache
-from app.services.business import ScoringService
+from sqlalchemy import create_engine, insert, update, delete, select, case, exists, and_, or_, func, literal
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, sessionmaker
+from sqlalchemy.pool import NullPool
+from app.config import settings
+from app.models import (
+    Prediction, Match, MatchStatus, MatchStage, Group, GroupMember, User, StandingsCache, StandingsEntry, StandingsSnapshot,
+    DirtyScope
+)
+from app.services.business import ScoringService, ScoringRules, STANDARD_RULES
+from app.services.head_to_head import HeadToHeadService
+from app.services.leaderboard import get_leaderboard, leaderboard_key, points_from_key
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timezone
 import json
 import logging
-from typing import List, Dict, Optional
+import multiprocessing
+import numpy as np
+from typing import List, Dict, NamedTuple, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 
+class ScoredPredictions(NamedTuple):
+    """Parallel per-prediction arrays from one scoring pass (scores are -1 when unscored)"""
+    user_ids: np.ndarray
+    points: np.ndarray
+    exact: np.ndarray
+    result: np.ndarray
+    error: np.ndarray
+    submitted: np.ndarray
+    home_pred: np.ndarray
+    away_pred: np.ndarray
+    home_score: np.ndarray
+    away_score: np.ndarray
+    advance: np.ndarray
+    stage: np.ndarray
+    
+    def slice(self, start: int, end: int) -> "ScoredPredictions":
+        return ScoredPredictions(*(column[start:end] for column in self))
+    
+    def take(self, rows: np.ndarray) -> "ScoredPredictions":
+        return ScoredPredictions(*(column[rows] for column in self))
+    
+    def points_under(self, rules: ScoringRules) -> np.ndarray:
+        """Points of every prediction under another rule set (table lookup plus its advance bonus)"""
+        if rules.is_standard:
+            return self.points
+        scored = self.home_score >= 0
+        points = self.advance * rules.advance
+        points[scored] += rules.points(
+            self.home_pred[scored], self.away_pred[scored], self.home_score[scored], self.away_score[scored]
+        )
+        return points
+
 class RankingService:
     """Service for calculating and caching rankings"""
     
+    # Per-stage subtotal columns of a standings row (the final round includes the third-place match)
+    STAGE_COLUMNS = ("points_group", "points_r32", "points_r16", "points_qf", "points_sf", "points_final")
+    STAGE_INDEX = {
+        MatchStage.GROUP: 0,
+        MatchStage.ROUND_32: 1,
+        MatchStage.ROUND_16: 2,
+        MatchStage.QUARTER_FINAL: 3,
+        MatchStage.SEMI_FINAL: 4,
+        MatchStage.THIRD_PLACE: 5,
+        MatchStage.FINAL: 5,
+    }
+    
+    # Per-user columns of a standings row (besides scope, group_id, user_id and version)
+    ENTRY_COLUMNS = (
+        "rank", "total_points", "exact_matches", "correct_results", "goal_error", "first_prediction_at",
+        "sort_key", "live_points", "provisional_rank",
+    ) + STAGE_COLUMNS
+    
+    # Stage boards: columns summed per board
+    STAGE_BOARDS = {
+        "group": ("points_group",),
+        "knockout": ("points_r32", "points_r16", "points_qf", "points_sf", "points_final"),
+        "r32": ("points_r32",),
+        "r16": ("points_r16",),
+        "qf": ("points_qf",),
+        "sf": ("points_sf",),
+        "final": ("points_final",),
+    }
+    
     @staticmethod
-    def recalculate_global_ranking(db: Session):
-        """Recalculate global ranking"""
+    def recalculate_global_ranking(db: Session) -> bool:
+        """Recalculate global ranking; returns False if it failed"""
+        if settings.RANKING_MODE == "sql":
+            return RankingService.recalculate_global_ranking_sql(db)
+        if settings.RANKING_MODE == "stream":
+            return RankingService._recalculate_scopes_stream(db, [], include_global=True)
+        
         try:
+            # Claim a version before reading, so newer reads publish over older ones
+            version = RankingService._allocate_versions(db, {"GLOBAL": None})["GLOBAL"]
+            
             # Get all finished matches
             finished_matches = db.query(Match).filter(
                 Match.status == MatchStatus.FINISHED
@@ -22,90 +103,54 @@ class RankingService:
             
             if not finished_matches:
                 logger.info("No finished matches to calculate ranking")
-                return
+                return True
             
             # Get all predictions
             all_predictions = db.query(Prediction).all()
             
-            # Calculate scores for each user
-            user_scores = {}
-            for pred in all_predictions:
-                if pred.user_id not in user_scores:
-                    user_scores[pred.user_id] = {
-                        "total_points": 0,
-                        "exact_matches": 0,
-                        "correct_results": 0,
-                    }
-                
-                # Find matching match
-                match = next((m for m in finished_matches if m.id == pred.match_id), None)
-                if match:
-                    points, details = ScoringService.calculate_points(pred, match)
-                    user_scores[pred.user_id]["total_points"] += points
-                    
-                    if details.get("exact"):
-                        user_scores[pred.user_id]["exact_matches"] += 1
-                    if details.get("result"):
-                        user_scores[pred.user_id]["correct_results"] += 1
-                    
-                    # Update prediction points
-                    pred.points_awarded = points
-                    pred.score_details = details
+            # Calculate scores for each user (and update prediction points)
+            user_scores = RankingService._score_predictions(
+                all_predictions,
+                {m.id: m for m in finished_matches},
+                write_back=True
+            )
             
             db.commit()
             
-            # Build standings
-            standings = []
-            for user_id, scores in user_scores.items():
-                user = db.query(User).filter(User.id == user_id).first()
-                if user:
-                    standings.append({
-                        "user_id": user_id,
-                        "name": user.name,
-                        "avatar_url": user.avatar_url,
-                        "exact_matches": scores["exact_matches"],
-                        "correct_results": scores["correct_results"],
-                        "total_points": scores["total_points"],
-                        "rank": 0,  # Will be assigned after sorting
-                    })
-            
-            # Sort by points (and apply tiebreakers)
-            standings.sort(
-                key=lambda x: (x["total_points"], x["exact_matches"], x["correct_results"]),
-                reverse=True
-            )
-            
-            # Assign ranks
-            for idx, s in enumerate(standings):
-                s["rank"] = idx + 1
-            
-            # Save to cache
-            cache = db.query(StandingsCache).filter(StandingsCache.scope == "GLOBAL").first()
-            if not cache:
-                cache = StandingsCache(scope="GLOBAL")
-                db.add(cache)
+            # Build standings (sorted, with tiebreakers)
+            profiles = RankingService._load_profiles(db, user_scores.keys())
+            standings = RankingService._build_standings(user_scores, profiles)
             
-            cache.standings_data = standings
-            cache.computed_at = datetime.now(timezone.utc)
-            db.commit()
+            # Save as a new version
+            RankingService._save_standings(db, "GLOBAL", None, standings, version)
             
             logger.info(f"Global ranking recalculated with {len(standings)} users")
+            return True
         
         except Exception as e:
             logger.error(f"Error calculating global ranking: {e}")
             db.rollback()
+            return False
     
     @staticmethod
-    def recalculate_group_ranking(db: Session, group_id: int):
-        """Recalculate ranking for a group"""
+    def recalculate_group_ranking(db: Session, group_id: int) -> bool:
+        """Recalculate ranking for a group; returns False if it failed"""
+        if settings.RANKING_MODE == "sql":
+            return RankingService.recalculate_group_ranking_sql(db, group_id)
+        if settings.RANKING_MODE == "stream":
+            return RankingService._recalculate_scopes_stream(db, [group_id], include_global=False)
+        
         try:
             group = db.query(Group).filter(Group.id == group_id).first()
             if not group:
-                return
+                return True
+            
+            scope = f"GROUP:{group_id}"
+            version = RankingService._allocate_versions(db, {scope: group_id})[scope]
             
-            # Get all predictions for this group
+            # Get all predictions counting in this group
             group_predictions = db.query(Prediction).filter(
-                Prediction.group_id == group_id
+                RankingService._group_picks_filter(group_id, group.use_global_picks)
             ).all()
             
             # Get finished matches
@@ -113,92 +158,1987 @@ class RankingService:
                 Match.status == MatchStatus.FINISHED
             ).all()
             
-            # Calculate scores
-            user_scores = {}
-            for pred in group_predictions:
-                if pred.user_id not in user_scores:
-                    user_scores[pred.user_id] = {
-                        "total_points": 0,
-                        "exact_matches": 0,
-                        "correct_results": 0,
-                    }
-                
-                # Find matching match
-                match = next((m for m in finished_matches if m.id == pred.match_id), None)
-                if match:
-                    points, details = ScoringService.calculate_points(pred, match)
-                    user_scores[pred.user_id]["total_points"] += points
-                    
-                    if details.get("exact"):
-                        user_scores[pred.user_id]["exact_matches"] += 1
-                    if details.get("result"):
-                        user_scores[pred.user_id]["correct_results"] += 1
+            # Calculate scores with the group's scoring system
+            scored = RankingService._score_prediction_arrays(group_predictions, {m.id: m for m in finished_matches})
+            points = scored.points_under(ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules))
+            user_scores = RankingService._aggregate_user_scores(scored, points)
+            
+            match_col = np.fromiter((p.match_id for p in group_predictions), dtype=np.int64, count=len(group_predictions))
+            RankingService._rebuild_head_to_head(db, group_id, scored, points, match_col)
             
             # Build standings
-            standings = []
-            for user_id, scores in user_scores.items():
-                user = db.query(User).filter(User.id == user_id).first()
-                if user:
-                    standings.append({
-                        "user_id": user_id,
-                        "name": user.name,
-                        "avatar_url": user.avatar_url,
-                        "exact_matches": scores["exact_matches"],
-                        "correct_results": scores["correct_results"],
-                        "total_points": scores["total_points"],
-                        "rank": 0,
-                    })
-            
-            # Sort
-            standings.sort(
-                key=lambda x: (x["total_points"], x["exact_matches"], x["correct_results"]),
-                reverse=True
-            )
-            
-            # Assign ranks
-            for idx, s in enumerate(standings):
-                s["rank"] = idx + 1
+            profiles = RankingService._load_profiles(db, user_scores.keys())
+            standings = RankingService._build_standings(user_scores, profiles)
             
             # Save to cache
+            RankingService._save_standings(db, scope, group_id, standings, version)
+            
+            logger.info(f"Group {group_id} ranking recalculated with {len(standings)} users")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error calculating group {group_id} ranking: {e}")
+            db.rollback()
+            return False
+    
+    @staticmethod
+    def recalculate_all_rankings(db: Session, active_only: bool = True, workers: Optional[int] = None) -> Optional[int]:
+        """
+        Recalculate global and all group rankings.
+        
+        With one worker everything happens in a single pass (see
+        _recalculate_scopes). With more, the global scope is computed here
+        and the groups are split into shards, each recalculated in its own
+        worker process with its own DB session. workers defaults to (and is
+        capped by) settings.RANKING_WORKERS. Returns the number of groups,
+        or None if any scope failed to recalculate.
+        """
+        groups_query = db.query(Group.id)
+        if active_only:
+            groups_query = groups_query.filter(Group.is_active == True)
+        group_ids = [group_id for (group_id,) in groups_query.all()]
+        
+        recalculated = RankingService._recalculate_sharded(db, group_ids, include_global=True, workers=workers)
+        if len(recalculated) < len(group_ids) + 1:
+            logger.warning(f"Ranking recalculation failed for {len(group_ids) + 1 - len(recalculated)} scopes")
+            return None
+        return len(group_ids)
+    
+    @staticmethod
+    def recalculate_dirty_rankings(db: Session, workers: Optional[int] = None) -> List[str]:
+        """
+        Recalculate only the scopes marked dirty (plus scopes never computed).
+        
+        Marks made up to the watermark (the start of this run) are cleared
+        afterwards for the scopes that were recalculated; marks arriving
+        while it runs, and those of scopes whose recompute failed, stay
+        for the next run. With nothing dirty this is a few small queries
+        and no prediction scan. Returns the scopes recalculated.
+        """
+        watermark = datetime.now(timezone.utc)
+        dirty = dict(db.query(DirtyScope.scope, DirtyScope.group_id).filter(DirtyScope.marked_at <= watermark).all())
+        
+        # Cold start: scopes without standings yet
+        computed = {scope for (scope,) in db.query(StandingsCache.scope).filter(StandingsCache.version > 0)}
+        if "GLOBAL" not in computed:
+            dirty["GLOBAL"] = None
+        for (group_id,) in db.query(Group.id).filter(Group.is_active == True):
+            if f"GROUP:{group_id}" not in computed:
+                dirty[f"GROUP:{group_id}"] = group_id
+        
+        if not dirty:
+            logger.info("No dirty ranking scopes")
+            return []
+        
+        active = {group_id for (group_id,) in db.query(Group.id).filter(
+            Group.id.in_([gid for gid in dirty.values() if gid is not None]),
+            Group.is_active == True
+        )}
+        group_ids = sorted(active)
+        recalculated = set()
+        if group_ids or "GLOBAL" in dirty:
+            recalculated = RankingService._recalculate_sharded(db, group_ids, include_global="GLOBAL" in dirty, workers=workers)
+        
+        # Inactive groups' marks need no recompute
+        cleared = recalculated | {scope for scope, group_id in dirty.items() if group_id is not None and group_id not in active}
+        db.query(DirtyScope).filter(
+            DirtyScope.scope.in_(list(cleared)),
+            DirtyScope.marked_at <= watermark
+        ).delete(synchronize_session=False)
+        db.commit()
+        
+        failed = set(dirty) - cleared
+        if failed:
+            logger.warning(f"Dirty rankings not recalculated, kept for the next run: {sorted(failed)}")
+        logger.info(f"Dirty rankings recalculated up to {watermark.isoformat()}: {len(recalculated)} scopes")
+        return sorted(recalculated)
+    
+    @staticmethod
+    def mark_dirty(db: Session, scopes: Dict[str, Optional[int]], reason: str):
+        """
+        Mark scopes ({scope: group_id}) for the next dirty recompute.
+        
+        A "result" mark may be cleared by the incremental result patch, so
+        re-marking never downgrades another reason to it. Runs in the
+        caller's transaction - the caller commits.
+        """
+        if not scopes:
+            return
+        
+        now = datetime.now(timezone.utc)
+        existing = {
+            mark.scope: mark
+            for mark in db.query(DirtyScope).filter(DirtyScope.scope.in_(list(scopes))).all()
+        }
+        for scope, group_id in scopes.items():
+            mark = existing.get(scope)
+            if mark:
+                if reason != "result":
+                    mark.reason = reason
+                mark.marked_at = now
+            else:
+                db.add(DirtyScope(scope=scope, group_id=group_id, reason=reason, marked_at=now))
+    
+    @staticmethod
+    def mark_match_dirty(db: Session, match_id: int, reason: str = "result"):
+        """Mark the global scope and every group a prediction on a match whose result changed counts in"""
+        RankingService.mark_dirty(db, RankingService._match_scopes(db, match_id), reason)
+    
+    @staticmethod
+    def _match_scopes(db: Session, match_id: int) -> Dict[str, Optional[int]]:
+        """The global scope and every group ({scope: group_id}) a prediction on a match counts in"""
+        group_ids = db.query(Prediction.group_id).filter(
+            Prediction.match_id == match_id,
+            Prediction.group_id.isnot(None)
+        ).distinct().all()
+        
+        # Groups ranking members' global picks on this match
+        global_pick_group_ids = db.query(GroupMember.group_id).join(
+            Group, Group.id == GroupMember.group_id
+        ).join(
+            Prediction, and_(Prediction.user_id == GroupMember.user_id, Prediction.group_id.is_(None))
+        ).filter(
+            Prediction.match_id == match_id,
+            Group.use_global_picks == True,
+            GroupMember.is_active == True,
+            GroupMember.pending_approval == False
+        ).distinct().all()
+        
+        scopes = {"GLOBAL": None}
+        scopes.update({f"GROUP:{group_id}": group_id for (group_id,) in group_ids + global_pick_group_ids})
+        return scopes
+    
+    @staticmethod
+    def _recalculate_sharded(db: Session, group_ids: List[int], include_global: bool = True,
+                             workers: Optional[int] = None) -> Set[str]:
+        """
+        Recalculate scopes in one pass, or the groups across worker processes.
+        
+        Returns the scopes that were recalculated - a failed pass or shard
+        leaves its scopes out.
+        """
+        scopes = [f"GROUP:{group_id}" for group_id in group_ids] + (["GLOBAL"] if include_global else [])
+        workers = min(workers or settings.RANKING_WORKERS, settings.RANKING_WORKERS, len(group_ids))
+        if workers <= 1:
+            if RankingService._recalculate_scopes(db, group_ids, include_global=include_global):
+                return set(scopes)
+            return set()
+        
+        recalculated = set()
+        if include_global and RankingService._recalculate_scopes(db, [], include_global=True):
+            recalculated.add("GLOBAL")
+        
+        shards = [group_ids[i::workers] for i in range(workers)]
+        database_url = db.get_bind().url.render_as_string(hide_password=False)
+        # Spawned, not forked: the parent runs scheduler and queue threads that may hold locks
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [pool.submit(_recalculate_group_shard, database_url, shard) for shard in shards]
+            for future in as_completed(futures):
+                try:
+                    recalculated.update(f"GROUP:{group_id}" for group_id in future.result())
+                except Exception as e:
+                    logger.error(f"Error in ranking worker: {e}")
+        
+        logger.info(f"Group rankings recalculated by {workers} workers: {len(group_ids)} groups")
+        return recalculated
+    
+    @staticmethod
+    def _recalculate_scopes(db: Session, group_ids: List[int], include_global: bool = True) -> bool:
+        """
+        Recalculate the given scopes in a single pass.
+        
+        Predictions are read once, ordered by group, and scored once with
+        one shared finished-match index. Global totals and every group's
+        totals are cut from the same score arrays and names come from one
+        profile lookup, so the cost no longer grows with groups x queries.
+        Groups on global picks also take their members' rows from the
+        global slice (minus matches overridden in the group), so a global
+        prediction is scored once however many groups it counts in.
+        Only the global pass writes points back to predictions.
+        """
+        if settings.RANKING_MODE == "sql":
+            ok = [RankingService.recalculate_global_ranking_sql(db)] if include_global else []
+            ok += [RankingService.recalculate_group_ranking_sql(db, group_id) for group_id in group_ids]
+            return all(ok)
+        if settings.RANKING_MODE == "stream":
+            return RankingService._recalculate_scopes_stream(db, group_ids, include_global)
+        
+        try:
+            wanted_scopes = {f"GROUP:{group_id}": group_id for group_id in group_ids}
+            if include_global:
+                wanted_scopes["GLOBAL"] = None
+            versions = RankingService._allocate_versions(db, wanted_scopes)
+            
+            finished_matches = db.query(Match).filter(
+                Match.status == MatchStatus.FINISHED
+            ).all()
+            
+            if not finished_matches:
+                logger.info("No finished matches to calculate ranking")
+                return True
+            
+            matches_by_id = {m.id: m for m in finished_matches}
+            global_pick_members = RankingService._global_pick_members(db, group_ids)
+            
+            # One scan, ordered by scope (global predictions first)
+            query = db.query(Prediction)
+            if not include_global:
+                query = query.filter(or_(
+                    Prediction.group_id.in_(group_ids),
+                    and_(Prediction.group_id.is_(None), Prediction.user_id.in_(
+                        select(GroupMember.user_id).where(GroupMember.group_id.in_(list(global_pick_members)))
+                    ))
+                ))
+            predictions = query.order_by(
+                Prediction.group_id.isnot(None), Prediction.group_id, Prediction.user_id
+            ).all()
+            
+            scored = RankingService._score_prediction_arrays(
+                predictions, matches_by_id, write_back=include_global
+            )
+            if include_global:
+                db.commit()
+            
+            scope_scores = {}
+            if include_global:
+                # Global - every prediction counts (standard rules)
+                scope_scores[("GLOBAL", None)] = RankingService._aggregate_user_scores(scored)
+            
+            group_rules = RankingService._group_rules(db, group_ids)
+            
+            # Groups - contiguous slices of the ordered scan
+            group_col = np.fromiter(
+                (p.group_id if p.group_id is not None else -1 for p in predictions),
+                dtype=np.int64, count=len(predictions)
+            )
+            match_col = np.fromiter((p.match_id for p in predictions), dtype=np.int64, count=len(predictions))
+            global_end = int(np.searchsorted(group_col, 0))
+            
+            wanted = set(group_ids)
+            group_slices = {}
+            boundaries = np.flatnonzero(np.diff(group_col)) + 1
+            for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(group_col)]):
+                if start == end:
+                    continue
+                group_id = int(group_col[start])
+                if group_id in wanted:
+                    group_slices[group_id] = (start, end)
+            
+            for group_id in group_ids:
+                start, end = group_slices.get(group_id, (0, 0))
+                rows = np.arange(start, end)
+                if group_id in global_pick_members:
+                    rows = np.concatenate([rows, RankingService._inherited_rows(
+                        scored.user_ids, match_col, global_end, global_pick_members[group_id], rows
+                    )])
+                group_scored = scored.take(rows)
+                group_points = group_scored.points_under(group_rules.get(group_id, STANDARD_RULES))
+                scope_scores[(f"GROUP:{group_id}", group_id)] = RankingService._aggregate_user_scores(
+                    group_scored, group_points
+                )
+                RankingService._rebuild_head_to_head(db, group_id, group_scored, group_points, match_col[rows])
+            
+            # Shared profile lookup for all scopes
+            profiles = RankingService._load_profiles(db, np.unique(scored.user_ids).tolist())
+            
+            for (scope, group_id), user_scores in scope_scores.items():
+                standings = RankingService._build_standings(user_scores, profiles)
+                RankingService._save_standings(
+                    db, scope, group_id, standings, versions[scope],
+                    commit=False, as_of_match=len(finished_matches)
+                )
+            
+            db.commit()
+            
+            logger.info(f"Rankings recalculated in one pass: {len(predictions)} predictions, {len(group_ids)} groups")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error calculating rankings: {e}")
+            db.rollback()
+            return False
+    
+    @staticmethod
+    def _recalculate_scopes_stream(db: Session, group_ids: List[int], include_global: bool = True) -> bool:
+        """
+        Recalculate the given scopes in bounded memory.
+        
+        Only the scoring columns are read, in RANKING_STREAM_BATCH_SIZE
+        batches from a server-side cursor ordered by group. Each batch is
+        scored with the same kernel as the in-memory pass and folded into
+        per-user running totals; a group's totals are saved and dropped as
+        soon as the scan moves past it. Changed points_awarded/score_details
+        are written back in one bulk UPDATE per batch. Peak memory is one
+        batch plus per-user totals for the global scope and one group.
+        Groups on global picks can't be cut from the ordered scan, so each
+        streams its own effective picks afterwards.
+        """
+        try:
+            wanted_scopes = {f"GROUP:{group_id}": group_id for group_id in group_ids}
+            if include_global:
+                wanted_scopes["GLOBAL"] = None
+            versions = RankingService._allocate_versions(db, wanted_scopes)
+            
+            finished_matches = RankingService._finished_match_rows(db)
+            if not finished_matches:
+                logger.info("No finished matches to calculate ranking")
+                return True
+            
+            matches_by_id = {m.id: m for m in finished_matches}
+            group_rules = RankingService._group_rules(db, group_ids)
+            global_pick_groups = set(RankingService._global_pick_members(db, group_ids))
+            wanted = set(group_ids) - global_pick_groups
+            
+            columns = select(
+                Prediction.id, Prediction.user_id, Prediction.group_id, Prediction.match_id,
+                Prediction.home_pred, Prediction.away_pred, Prediction.advance_team, Prediction.created_at,
+                Prediction.points_awarded, Prediction.score_details
+            )
+            stmt = columns.order_by(Prediction.group_id.isnot(None), Prediction.group_id, Prediction.id)
+            if not include_global:
+                stmt = stmt.where(Prediction.group_id.in_(sorted(wanted)))
+            
+            no_picks = (np.zeros(0, dtype=np.int64),) * 3
+            
+            def save(scope: str, group_id: Optional[int], user_scores: Dict[int, Dict], picks: List[Tuple] = (no_picks,)):
+                if group_id is not None:
+                    # picks: the group's finished-match (user ids, match ids, points), one triple per batch
+                    HeadToHeadService.rebuild_group(db, group_id, *(np.concatenate(column) for column in zip(*picks)))
+                profiles = RankingService._load_profiles(db, user_scores.keys())
+                standings = RankingService._build_standings(user_scores, profiles)
+                RankingService._save_standings(
+                    db, scope, group_id, standings, versions[scope],
+                    commit=False, as_of_match=len(finished_matches)
+                )
+            
+            global_scores: Dict[int, Dict] = {}
+            current_group, group_scores, group_picks = None, {}, [no_picks]
+            saved, count = set(), 0
+            
+            batch_size = settings.RANKING_STREAM_BATCH_SIZE
+            result = db.execute(stmt, execution_options={"yield_per": batch_size})
+            for batch in result.partitions(batch_size):
+                count += len(batch)
+                scored = RankingService._score_prediction_arrays(batch, matches_by_id)
+                
+                if include_global:
+                    RankingService._merge_user_scores(global_scores, RankingService._aggregate_user_scores(scored))
+                    RankingService._write_back_batch(db, batch, scored)
+                
+                # Contiguous runs of one group within the batch
+                group_col = np.fromiter(
+                    (row.group_id if row.group_id is not None else -1 for row in batch),
+                    dtype=np.int64, count=len(batch)
+                )
+                boundaries = np.flatnonzero(np.diff(group_col)) + 1
+                for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(group_col)]):
+                    group_id = int(group_col[start])
+                    if group_id not in wanted:
+                        continue
+                    if group_id != current_group:
+                        if current_group is not None:
+                            save(f"GROUP:{current_group}", current_group, group_scores, group_picks)
+                            saved.add(current_group)
+                        current_group, group_scores, group_picks = group_id, {}, [no_picks]
+                    
+                    group_scored = scored.slice(start, end)
+                    group_points = group_scored.points_under(group_rules.get(group_id, STANDARD_RULES))
+                    RankingService._merge_user_scores(
+                        group_scores, RankingService._aggregate_user_scores(group_scored, group_points)
+                    )
+                    group_picks.append(RankingService._finished_picks(
+                        group_scored, group_points, np.fromiter((row.match_id for row in batch[start:end]), dtype=np.int64)
+                    ))
+            
+            if current_group is not None:
+                save(f"GROUP:{current_group}", current_group, group_scores, group_picks)
+                saved.add(current_group)
+            
+            for group_id in sorted(global_pick_groups):
+                rules = group_rules.get(group_id, STANDARD_RULES)
+                group_stmt = columns.where(RankingService._group_picks_filter(group_id, True)).order_by(Prediction.id)
+                group_scores, group_picks = {}, [no_picks]
+                result = db.execute(group_stmt, execution_options={"yield_per": batch_size})
+                for batch in result.partitions(batch_size):
+                    count += len(batch)
+                    scored = RankingService._score_prediction_arrays(batch, matches_by_id)
+                    points = scored.points_under(rules)
+                    RankingService._merge_user_scores(group_scores, RankingService._aggregate_user_scores(scored, points))
+                    group_picks.append(RankingService._finished_picks(
+                        scored, points, np.fromiter((row.match_id for row in batch), dtype=np.int64)
+                    ))
+                save(f"GROUP:{group_id}", group_id, group_scores, group_picks)
+            
+            for group_id in wanted - saved:
+                save(f"GROUP:{group_id}", group_id, {})
+            if include_global:
+                save("GLOBAL", None, global_scores)
+            
+            db.commit()
+            
+            logger.info(f"Rankings recalculated by streaming {count} predictions, {len(group_ids)} groups")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error calculating rankings in stream mode: {e}")
+            db.rollback()
+            return False
+    
+    @staticmethod
+    def _finished_picks(scored: ScoredPredictions, points: np.ndarray, match_ids: np.ndarray) -> Tuple:
+        """(user ids, match ids, points) of the scored rows - the input of the head-to-head table"""
+        finished = scored.home_score >= 0
+        return scored.user_ids[finished], match_ids[finished], points[finished]
+    
+    @staticmethod
+    def _rebuild_head_to_head(db: Session, group_id: int, scored: ScoredPredictions, points: np.ndarray,
+                              match_ids: np.ndarray):
+        """Rebuild a group's head-to-head records from its scored arrays"""
+        HeadToHeadService.rebuild_group(db, group_id, *RankingService._finished_picks(scored, points, match_ids))
+    
+    @staticmethod
+    def _finished_match_rows(db: Session) -> List:
+        """Finished matches with just the columns scoring needs"""
+        return db.query(
+            Match.id, Match.stage, Match.home_team, Match.away_team, Match.home_team_code, Match.away_team_code,
+            Match.home_score, Match.away_score, Match.home_score_et, Match.away_score_et,
+            Match.home_score_pen, Match.away_score_pen
+        ).filter(Match.status == MatchStatus.FINISHED).all()
+    
+    @staticmethod
+    def _merge_user_scores(totals: Dict[int, Dict], batch_scores: Dict[int, Dict]):
+        """Fold one batch's per-user aggregates into running totals"""
+        for user_id, scores in batch_scores.items():
+            current = totals.get(user_id)
+            if current is None:
+                totals[user_id] = scores
+                continue
+            for key in ("total_points", "exact_matches", "correct_results", "goal_error", *RankingService.STAGE_COLUMNS):
+                current[key] += scores[key]
+            if current["first_prediction_at"] is None or (
+                scores["first_prediction_at"] is not None and scores["first_prediction_at"] < current["first_prediction_at"]
+            ):
+                current["first_prediction_at"] = scores["first_prediction_at"]
+    
+    @staticmethod
+    def _write_back_batch(db: Session, rows, scored: "ScoredPredictions", reset_unscored: bool = False) -> int:
+        """
+        Bulk-write points_awarded/score_details for the scored rows of a batch that changed.
+        
+        With reset_unscored, rows whose match has no result (any more)
+        but still carry points are cleared too. Returns the rows written.
+        """
+        balance = (scored.home_score >= 0) & scored.result & (
+            (scored.home_pred - scored.away_pred) == (scored.home_score - scored.away_score)
+        )
+        updates = []
+        for row, pts, ex, res, bal, adv, err, home_score in zip(
+            rows, scored.points.tolist(), scored.exact.tolist(), scored.result.tolist(), balance.tolist(),
+            scored.advance.tolist(), scored.error.tolist(), scored.home_score.tolist()
+        ):
+            if home_score < 0:
+                if reset_unscored and (row.points_awarded or row.score_details):
+                    updates.append({"id": row.id, "points_awarded": 0, "score_details": {}})
+                continue
+            details = {"exact": ex, "result": res, "balance": bal, "advance": adv, "error": err}
+            if row.points_awarded != pts or row.score_details != details:
+                updates.append({"id": row.id, "points_awarded": pts, "score_details": details})
+        
+        if updates:
+            db.execute(update(Prediction), updates)
+        return len(updates)
+    
+    @staticmethod
+    def recalculate_global_ranking_sql(db: Session) -> bool:
+        """
+        Recalculate global ranking with set-based scoring in the database.
+        
+        One UPDATE ... FROM matches rescores every prediction of a finished
+        match and one GROUP BY query produces the per-user totals, so no
+        prediction rows are loaded into Python.
+        """
+        try:
+            version = RankingService._allocate_versions(db, {"GLOBAL": None})["GLOBAL"]
+            
+            RankingService.score_predictions_sql(db)
+            db.commit()
+            
+            standings = RankingService._aggregate_standings_sql(db)
+            RankingService._rank_standings(standings)
+            RankingService._save_standings(db, "GLOBAL", None, standings, version)
+            
+            logger.info(f"Global ranking recalculated in SQL with {len(standings)} users")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error calculating global ranking in SQL: {e}")
+            db.rollback()
+            return False
+    
+    @staticmethod
+    def recalculate_group_ranking_sql(db: Session, group_id: int) -> bool:
+        """Recalculate ranking for a group with a single GROUP BY query"""
+        try:
+            group = db.query(Group).filter(Group.id == group_id).first()
+            if not group:
+                return True
+            
             scope = f"GROUP:{group_id}"
-            cache = db.query(StandingsCache).filter(StandingsCache.scope == scope).first()
-            if not cache:
-                cache = StandingsCache(scope=scope, group_id=group_id)
-                db.add(cache)
+            version = RankingService._allocate_versions(db, {scope: group_id})[scope]
+            
+            rules = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+            standings = RankingService._aggregate_standings_sql(db, group_id, rules, group.use_global_picks)
+            
+            # Head-to-head from the same scoring expressions, one row per finished-match pick
+            points, _, _, _, _ = RankingService._sql_scoring_exprs(rules)
+            picks = db.execute(
+                select(Prediction.user_id, Prediction.match_id, points).join(Match, Match.id == Prediction.match_id).where(
+                    RankingService._group_picks_filter(group_id, group.use_global_picks),
+                    Match.status == MatchStatus.FINISHED,
+                    Match.home_score.isnot(None)
+                )
+            ).all()
+            HeadToHeadService.rebuild_group(db, group_id, *(
+                np.array(column, dtype=np.int64) for column in (zip(*picks) if picks else ((), (), ()))
+            ))
+            RankingService._rank_standings(standings)
+            RankingService._save_standings(db, scope, group_id, standings, version)
+            
+            logger.info(f"Group {group_id} ranking recalculated in SQL with {len(standings)} users")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error calculating group {group_id} ranking in SQL: {e}")
+            db.rollback()
+            return False
+    
+    @staticmethod
+    def score_predictions_sql(db: Session) -> int:
+        """Set points_awarded/score_details for all predictions of finished matches in one UPDATE"""
+        points, exact, result, balance, advance = RankingService._sql_scoring_exprs()
+        error = RankingService._sql_goal_error_expr()
+        
+        if db.bind.dialect.name == "postgresql":
+            details = func.json_build_object(
+                "exact", exact, "result", result, "balance", balance, "advance", advance, "error", error
+            )
+        else:
+            # SQLite/MySQL have no boolean type - build JSON true/false explicitly
+            details = func.json_object(
+                "exact", func.json(case((exact, "true"), else_="false")),
+                "result", func.json(case((result, "true"), else_="false")),
+                "balance", func.json(case((balance, "true"), else_="false")),
+                "advance", func.json(case((advance, "true"), else_="false")),
+                "error", error,
+            )
+        
+        stmt = (
+            update(Prediction)
+            .where(
+                Prediction.match_id == Match.id,
+                Match.status == MatchStatus.FINISHED,
+                Match.home_score.isnot(None),
+            )
+            .values(points_awarded=points, score_details=details)
+            .execution_options(synchronize_session=False)
+        )
+        return db.execute(stmt).rowcount
+    
+    @staticmethod
+    def _sql_scoring_exprs(rules: ScoringRules = STANDARD_RULES):
+        """ScoringService.calculate_points rules (with the given point values) as SQL expressions over predictions/matches"""
+        home_score, away_score = RankingService._sql_counted_score()
+        is_exact = and_(
+            Prediction.home_pred == home_score,
+            Prediction.away_pred == away_score,
+        )
+        same_result = or_(
+            and_(Prediction.home_pred > Prediction.away_pred, home_score > away_score),
+            and_(Prediction.home_pred == Prediction.away_pred, home_score == away_score),
+            and_(Prediction.home_pred < Prediction.away_pred, home_score < away_score),
+        )
+        same_balance = (Prediction.home_pred - Prediction.away_pred) == (home_score - away_score)
+        advance = RankingService._sql_advance_expr()
+        
+        points = case(
+            (is_exact, rules.exact),
+            (and_(same_result, same_balance), rules.result_balance),
+            (same_result, rules.result),
+            else_=0,
+        ) + case((advance, rules.advance), else_=0)
+        result = and_(~is_exact, same_result)
+        balance = and_(result, same_balance)
+        
+        return points, is_exact, result, balance, advance
+    
+    @staticmethod
+    def _sql_counted_score():
+        """ScoringService.counted_score as SQL expressions"""
+        if not settings.KNOCKOUT_SCORE_AFTER_EXTRA_TIME:
+            return Match.home_score, Match.away_score
+        
+        after_extra_time = and_(
+            Match.stage != MatchStage.GROUP,
+            Match.home_score_et.isnot(None),
+            Match.away_score_et.isnot(None),
+        )
+        return (
+            case((after_extra_time, Match.home_score_et), else_=Match.home_score),
+            case((after_extra_time, Match.away_score_et), else_=Match.away_score),
+        )
+    
+    @staticmethod
+    def _sql_advance_expr():
+        """Whether a prediction sent the right side through a knockout match (ScoringService.advancing_side/predicted_side)"""
+        has_et = and_(Match.home_score_et.isnot(None), Match.away_score_et.isnot(None))
+        home = case((has_et, Match.home_score_et), else_=Match.home_score)
+        away = case((has_et, Match.away_score_et), else_=Match.away_score)
+        
+        actual_side = case(
+            (Match.stage == MatchStage.GROUP, ScoringService.ADVANCE_NONE),
+            (home > away, ScoringService.ADVANCE_HOME),
+            (home < away, ScoringService.ADVANCE_AWAY),
+            (Match.home_score_pen > Match.away_score_pen, ScoringService.ADVANCE_HOME),
+            (Match.home_score_pen < Match.away_score_pen, ScoringService.ADVANCE_AWAY),
+            else_=ScoringService.ADVANCE_NONE,
+        )
+        predicted_side = case(
+            (or_(Prediction.advance_team == Match.home_team, Prediction.advance_team == Match.home_team_code),
+             ScoringService.ADVANCE_HOME),
+            (or_(Prediction.advance_team == Match.away_team, Prediction.advance_team == Match.away_team_code),
+             ScoringService.ADVANCE_AWAY),
+            (and_(or_(Prediction.advance_team.is_(None), Prediction.advance_team == ""),
+                  Prediction.home_pred > Prediction.away_pred), ScoringService.ADVANCE_HOME),
+            (and_(or_(Prediction.advance_team.is_(None), Prediction.advance_team == ""),
+                  Prediction.home_pred < Prediction.away_pred), ScoringService.ADVANCE_AWAY),
+            else_=ScoringService.ADVANCE_NONE,
+        )
+        return and_(actual_side != ScoringService.ADVANCE_NONE, predicted_side == actual_side)
+    
+    @staticmethod
+    def _sql_goal_error_expr():
+        """ScoringService.goal_error as a SQL expression over predictions/matches"""
+        home_score, away_score = RankingService._sql_counted_score()
+        return (
+            func.abs(Prediction.home_pred - home_score)
+            + func.abs(Prediction.away_pred - away_score)
+        )
+    
+    @staticmethod
+    def _aggregate_standings_sql(db: Session, group_id: Optional[int] = None,
+                                 rules: ScoringRules = STANDARD_RULES, use_global_picks: bool = False) -> List[Dict]:
+        """Per-user totals (with profile) for a scope from one GROUP BY over predictions"""
+        points, exact, result, _, _ = RankingService._sql_scoring_exprs(rules)
+        error = RankingService._sql_goal_error_expr()
+        scored = Match.id.isnot(None)
+        
+        stmt = (
+            select(
+                User.id,
+                User.name,
+                User.avatar_url,
+                func.coalesce(func.sum(case((scored, points), else_=0)), 0),
+                func.coalesce(func.sum(case((and_(scored, exact), 1), else_=0)), 0),
+                func.coalesce(func.sum(case((and_(scored, result), 1), else_=0)), 0),
+                func.coalesce(func.sum(case((scored, error), else_=0)), 0),
+                func.min(Prediction.created_at),
+                *(
+                    func.coalesce(func.sum(case((and_(scored, Match.stage.in_(stages)), points), else_=0)), 0)
+                    for stages in RankingService._stages_by_column()
+                ),
+            )
+            .select_from(Prediction)
+            .join(User, User.id == Prediction.user_id)
+            .outerjoin(Match, and_(
+                Match.id == Prediction.match_id,
+                Match.status == MatchStatus.FINISHED,
+                Match.home_score.isnot(None),
+            ))
+            .group_by(User.id, User.name, User.avatar_url)
+        )
+        if group_id is not None:
+            stmt = stmt.where(RankingService._group_picks_filter(group_id, use_global_picks))
+        
+        return [
+            {
+                "user_id": user_id,
+                "name": name,
+                "avatar_url": avatar_url,
+                "exact_matches": int(exact_count),
+                "correct_results": int(result_count),
+                "total_points": int(total_points),
+                "goal_error": int(goal_error),
+                "first_prediction_at": first_prediction_at,
+                **{column: int(value) for column, value in zip(RankingService.STAGE_COLUMNS, stage_points)},
+                "rank": 0,
+            }
+            for user_id, name, avatar_url, total_points, exact_count, result_count, goal_error, first_prediction_at, *stage_points
+            in db.execute(stmt)
+        ]
+    
+    @staticmethod
+    def _stages_by_column() -> List[List[MatchStage]]:
+        """Match stages summed into each STAGE_COLUMNS entry"""
+        stages = [[] for _ in RankingService.STAGE_COLUMNS]
+        for stage, idx in RankingService.STAGE_INDEX.items():
+            stages[idx].append(stage)
+        return stages
+    
+    @staticmethod
+    def apply_match_result(db: Session, match_id: int) -> bool:
+        """
+        Incrementally apply one match result to cached rankings.
+        
+        Only the predictions of this match are rescored. The difference
+        between the new and the previously awarded points/flags is applied
+        to every cached scope the prediction counts in, so a result that is
+        entered, corrected or reverted never triggers a full rescan.
+        Scopes without a cache yet fall back to a full recalculation.
+        Returns False if applying it (or a fallback) failed.
+        
+        The patched standings are still published as a new version of the
+        whole scope: a result moves the points of everyone who picked the
+        match and the ranks of everyone in between, and readers and
+        stream diffs rely on each version being complete. Only the rows
+        that changed are written from here; the others are copied inside
+        the database.
+        """
+        try:
+            match = db.query(Match).filter(Match.id == match_id).first()
+            if not match:
+                return True
+            
+            predictions = db.query(Prediction).filter(
+                Prediction.match_id == match_id
+            ).all()
+            
+            # Collect per-scope, per-user deltas
+            scope_deltas: Dict[str, Dict[int, Dict[str, int]]] = {}
+            if match.status == MatchStatus.FINISHED and match.home_score is not None:
+                columns = ScoringService.score_match_batch(
+                    match,
+                    [p.home_pred for p in predictions],
+                    [p.away_pred for p in predictions],
+                    [p.advance_team for p in predictions]
+                )
+                scored = [
+                    (pts, {"exact": ex, "result": res, "balance": bal, "advance": adv, "error": err})
+                    for pts, ex, res, bal, adv, err in zip(*(column.tolist() for column in columns))
+                ]
+            else:
+                # Not (or no longer) finished - everything scores zero
+                scored = [(0, {}) for _ in predictions]
+            
+            # Global picks also count in the user's groups on global picks, unless overridden there
+            memberships = RankingService._global_pick_groups(db, {p.user_id for p in predictions if p.group_id is None})
+            overridden = {(p.user_id, p.group_id) for p in predictions if p.group_id}
+            group_rules = RankingService._group_rules(
+                db, {p.group_id for p in predictions if p.group_id} | {g for gids in memberships.values() for g in gids}
+            )
+            
+            stage_column = RankingService.STAGE_COLUMNS[RankingService.STAGE_INDEX.get(match.stage, 0)]
+            # Per group: {user_id: points} of scored picks on this match before and after
+            head_to_head: Dict[int, Tuple[Dict[int, int], Dict[int, int]]] = {}
+            
+            for pred, (points, details) in zip(predictions, scored):
+                old_details = pred.score_details or {}
+                
+                delta = {
+                    "total_points": points - (pred.points_awarded or 0),
+                    "exact_matches": int(bool(details.get("exact"))) - int(bool(old_details.get("exact"))),
+                    "correct_results": int(bool(details.get("result"))) - int(bool(old_details.get("result"))),
+                    "goal_error": details.get("error", 0) - old_details.get("error", 0),
+                }
+                delta[stage_column] = delta["total_points"]
+                
+                pred.points_awarded = points
+                pred.score_details = details
+                
+                scopes = [("GLOBAL", delta)]
+                if pred.group_id:
+                    group_ids = [pred.group_id]
+                else:
+                    group_ids = [g for g in memberships.get(pred.user_id, ()) if (pred.user_id, g) not in overridden]
+                for group_id in group_ids:
+                    # Group points follow the group's scoring system
+                    rules = group_rules.get(group_id, STANDARD_RULES)
+                    group_points = rules.points_for_details(details) - rules.points_for_details(old_details)
+                    group_delta = dict(delta, total_points=group_points, **{stage_column: group_points})
+                    scopes.append((f"GROUP:{group_id}", group_delta))
+                    
+                    before, after = head_to_head.setdefault(group_id, ({}, {}))
+                    if old_details:
+                        before[pred.user_id] = rules.points_for_details(old_details)
+                    if details:
+                        after[pred.user_id] = rules.points_for_details(details)
+                
+                for scope, delta in scopes:
+                    user_delta = scope_deltas.setdefault(scope, {}).setdefault(pred.user_id, dict.fromkeys(delta, 0))
+                    for key, value in delta.items():
+                        user_delta[key] += value
             
-            cache.standings_data = standings
-            cache.computed_at = datetime.now(timezone.utc)
             db.commit()
             
-            logger.info(f"Group {group_id} ranking recalculated with {len(standings)} users")
+            finished_count = db.query(Match).filter(Match.status == MatchStatus.FINISHED).count()
+            scope_deltas = {
+                scope: {user_id: delta for user_id, delta in user_deltas.items() if any(delta.values())}
+                for scope, user_deltas in scope_deltas.items()
+            }
+            # e.g. a live score update - nothing official changed
+            scope_deltas = {scope: user_deltas for scope, user_deltas in scope_deltas.items() if user_deltas}
+            
+            # Groups rebuilt from scratch below redo their head-to-head anyway
+            for group_id, (before, after) in head_to_head.items():
+                if before != after:
+                    HeadToHeadService.apply_match(db, group_id, before, after)
+            
+            caches = {
+                cache.scope: cache for cache in db.query(StandingsCache).filter(
+                    StandingsCache.scope.in_(list(scope_deltas)),
+                    StandingsCache.version > 0
+                )
+            }
+            versions = RankingService._allocate_versions(db, {scope: cache.group_id for scope, cache in caches.items()})
+            
+            ok = True
+            for scope, user_deltas in scope_deltas.items():
+                cache = caches.get(scope)
+                if not cache:
+                    # Nothing to patch yet - build the scope from scratch
+                    if scope == "GLOBAL":
+                        ok = RankingService.recalculate_global_ranking(db) and ok
+                    else:
+                        ok = RankingService.recalculate_group_ranking(db, int(scope.split(":")[1])) and ok
+                    continue
+                
+                # Patch the published version into a new one
+                standings = RankingService._load_entries(db, scope)
+                by_user = {s["user_id"]: s for s in standings}
+                
+                # Users predicting for the first time in this scope
+                missing = [uid for uid in user_deltas if uid not in by_user]
+                if missing:
+                    first_query = db.query(User.id, func.min(Prediction.created_at)).join(
+                        Prediction, Prediction.user_id == User.id
+                    ).filter(User.id.in_(missing))
+                    if cache.group_id is not None:
+                        use_global_picks = db.query(Group.use_global_picks).filter(Group.id == cache.group_id).scalar()
+                        first_query = first_query.filter(RankingService._group_picks_filter(cache.group_id, use_global_picks))
+                    for user_id, first_prediction_at in first_query.group_by(User.id).all():
+                        entry = {
+                            "user_id": user_id,
+                            "exact_matches": 0,
+                            "correct_results": 0,
+                            "total_points": 0,
+                            "goal_error": 0,
+                            "first_prediction_at": first_prediction_at,
+                            **dict.fromkeys(RankingService.STAGE_COLUMNS, 0),
+                            "rank": 0,
+                        }
+                        standings.append(entry)
+                        by_user[user_id] = entry
+                
+                for user_id, delta in user_deltas.items():
+                    entry = by_user.get(user_id)
+                    if not entry:
+                        continue
+                    for key, value in delta.items():
+                        entry[key] += value
+                
+                RankingService._rank_standings(standings)
+                
+                RankingService._save_standings(
+                    db, scope, cache.group_id, standings, versions[scope],
+                    commit=False, changed_user_ids=user_deltas.keys(), as_of_match=finished_count,
+                    base_version=cache.version
+                )
+            
+            db.commit()
+            
+            logger.info(f"Match {match_id} applied incrementally to {len(scope_deltas)} ranking scopes")
+            return ok
         
         except Exception as e:
-            logger.error(f"Error calculating group {group_id} ranking: {e}")
+            logger.error(f"Error applying match {match_id} to rankings: {e}")
             db.rollback()
+            return False
     
     @staticmethod
-    def get_global_standings(db: Session) -> Optional[Dict]:
-        """Get cached global standings"""
-        cache = db.query(StandingsCache).filter(StandingsCache.scope == "GLOBAL").first()
-        if cache:
-            return {
-                "scope": "GLOBAL",
-                "standings": cache.standings_data,
-                "computed_at": cache.computed_at,
-                "match_count": db.query(Match).filter(Match.status == MatchStatus.FINISHED).count(),
+    def apply_live_score(db: Session, match_id: int) -> bool:
+        """
+        Incrementally apply a match's live score to the provisional standings.
+        
+        Only this match's predictions are scored, against the current live
+        score as if the match ended now. Each user's provisional points
+        move by the difference to what was applied before and provisional
+        ranks are refreshed in place. Once the match is no longer LIVE its
+        provisional points are withdrawn (the official result takes over).
+        Returns False if it failed.
+        """
+        try:
+            match = db.query(Match).filter(Match.id == match_id).first()
+            if not match:
+                return True
+            
+            rows = db.query(
+                Prediction.id, Prediction.user_id, Prediction.group_id,
+                Prediction.home_pred, Prediction.away_pred, Prediction.live_points, Prediction.live_details
+            ).filter(Prediction.match_id == match_id).all()
+            if not rows:
+                return True
+            
+            if match.status == MatchStatus.LIVE and match.home_score is not None and match.away_score is not None:
+                _, exact, result, balance = ScoringService.calculate_points_batch(
+                    [row.home_pred for row in rows], [row.away_pred for row in rows], match.home_score, match.away_score
+                )
+                new_details = [
+                    {"exact": ex, "result": res, "balance": bal}
+                    for ex, res, bal in zip(exact.tolist(), result.tolist(), balance.tolist())
+                ]
+            else:
+                new_details = [{} for _ in rows]
+            
+            # Like official points: GLOBAL counts standard live points, each group its own rules
+            memberships = RankingService._global_pick_groups(db, {row.user_id for row in rows if row.group_id is None})
+            overridden = {(row.user_id, row.group_id) for row in rows if row.group_id}
+            group_rules = RankingService._group_rules(
+                db, {row.group_id for row in rows if row.group_id} | {g for gids in memberships.values() for g in gids}
+            )
+            
+            scope_deltas: Dict[str, Dict[int, int]] = {}
+            updates = []
+            for row, details in zip(rows, new_details):
+                old_details = row.live_details or {}
+                points = STANDARD_RULES.points_for_details(details)
+                if details == old_details and points == (row.live_points or 0):
+                    continue
+                updates.append({"id": row.id, "live_points": points, "live_details": details})
+                
+                scopes = [("GLOBAL", points - (row.live_points or 0))]
+                if row.group_id:
+                    group_ids = [row.group_id]
+                else:
+                    group_ids = [g for g in memberships.get(row.user_id, ()) if (row.user_id, g) not in overridden]
+                for group_id in group_ids:
+                    rules = group_rules.get(group_id, STANDARD_RULES)
+                    scopes.append((f"GROUP:{group_id}", rules.points_for_details(details) - rules.points_for_details(old_details)))
+                
+                for scope, delta in scopes:
+                    if delta:
+                        user_deltas = scope_deltas.setdefault(scope, {})
+                        user_deltas[row.user_id] = user_deltas.get(row.user_id, 0) + delta
+            
+            if not updates:
+                return True
+            db.execute(update(Prediction), updates)
+            
+            for scope, user_deltas in scope_deltas.items():
+                RankingService._apply_live_deltas(db, scope, user_deltas)
+            
+            db.commit()
+            
+            logger.info(f"Live score of match {match_id} applied to {len(scope_deltas)} provisional standings")
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error applying live score of match {match_id}: {e}")
+            db.rollback()
+            return False
+    
+    @staticmethod
+    def apply_match_results(db: Session, match_ids) -> bool:
+        """
+        Apply several updated matches (live scores and results) - recompute queue task; False if any failed.
+        
+        Once all of them are applied, the result marks made for these
+        matches before the run are cleared - the patched scopes need no
+        dirty recompute. After a failure the marks stay as the fallback.
+        """
+        watermark = datetime.now(timezone.utc)
+        ok = True
+        for match_id in sorted(match_ids):
+            ok = RankingService.apply_live_score(db, match_id) and ok
+            ok = RankingService.apply_match_result(db, match_id) and ok
+        if ok:
+            RankingService._clear_result_marks(db, match_ids, watermark)
+        return ok
+    
+    @staticmethod
+    def _clear_result_marks(db: Session, match_ids, watermark: datetime):
+        """Drop the result marks of the matches' scopes made up to the watermark"""
+        try:
+            scopes = {}
+            for match_id in match_ids:
+                scopes.update(RankingService._match_scopes(db, match_id))
+            db.query(DirtyScope).filter(
+                DirtyScope.scope.in_(list(scopes)),
+                DirtyScope.reason == "result",
+                DirtyScope.marked_at <= watermark
+            ).delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            # The marks only cost a redundant recompute
+            logger.error(f"Error clearing result marks of matches {sorted(match_ids)}: {e}")
+            db.rollback()
+    
+    @staticmethod
+    def _apply_live_deltas(db: Session, scope: str, user_deltas: Dict[int, int]):
+        """
+        Add provisional point deltas to a scope's rows and re-rank provisionally.
+        
+        Rows change in place on the published version, so the scope's
+        change_seq is bumped and stamped on them for streaming clients.
+        """
+        rows = db.query(
+            StandingsEntry.id, StandingsEntry.user_id, StandingsEntry.rank, StandingsEntry.total_points,
+            StandingsEntry.live_points, StandingsEntry.provisional_rank
+        ).filter(RankingService._published(scope)).all()
+        if not rows:
+            # No official standings yet - the next full recalculation includes live points
+            return
+        
+        live_points = np.array([row.live_points + user_deltas.get(row.user_id, 0) for row in rows], dtype=np.int64)
+        provisional_ranks = RankingService._provisional_ranks(
+            np.array([row.rank for row in rows], dtype=np.int64),
+            np.array([row.total_points for row in rows], dtype=np.int64) + live_points
+        )
+        
+        updates = [
+            {"id": row.id, "live_points": live, "provisional_rank": rank}
+            for row, live, rank in zip(rows, live_points.tolist(), provisional_ranks.tolist())
+            if live != row.live_points or rank != row.provisional_rank
+        ]
+        if updates:
+            db.execute(update(StandingsCache).where(StandingsCache.scope == scope).values(
+                change_seq=StandingsCache.change_seq + 1
+            ))
+            seq = db.query(StandingsCache.change_seq).filter(StandingsCache.scope == scope).scalar()
+            db.execute(update(StandingsEntry), [dict(row, live_seq=seq) for row in updates])
+    
+    @staticmethod
+    def _provisional_ranks(official_ranks: np.ndarray, provisional_points: np.ndarray) -> np.ndarray:
+        """
+        Competition ranks by provisional points.
+        
+        Ties on provisional points keep the official tiebreaker order
+        (official rank); users tied on both share a rank.
+        """
+        count = len(official_ranks)
+        if not count:
+            return np.zeros(0, dtype=np.int64)
+        
+        order = np.lexsort((official_ranks, -provisional_points))
+        points_sorted = provisional_points[order]
+        ranks_sorted = official_ranks[order]
+        starts = np.r_[True, (points_sorted[1:] != points_sorted[:-1]) | (ranks_sorted[1:] != ranks_sorted[:-1])]
+        
+        ranks = np.empty(count, dtype=np.int64)
+        ranks[order] = np.maximum.accumulate(np.where(starts, np.arange(1, count + 1), 0))
+        return ranks
+    
+    @staticmethod
+    def _live_points_by_user(db: Session, group_id: Optional[int]) -> Dict[int, int]:
+        """
+        Provisional points per user from LIVE matches (GLOBAL counts every prediction).
+        
+        GLOBAL sums the stored standard live points; a group re-derives
+        them from the stored live details under its own scoring rules.
+        """
+        if group_id is None:
+            query = db.query(Prediction.user_id, func.sum(Prediction.live_points)).join(
+                Match, Match.id == Prediction.match_id
+            ).filter(
+                Match.status == MatchStatus.LIVE,
+                Prediction.live_points != 0
+            )
+            return {user_id: int(points) for user_id, points in query.group_by(Prediction.user_id).all()}
+        
+        group = db.query(Group.scoring_system, Group.scoring_rules, Group.use_global_picks).filter(Group.id == group_id).first()
+        if not group:
+            return {}
+        rules = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+        
+        live = {}
+        for user_id, details in db.query(Prediction.user_id, Prediction.live_details).join(
+            Match, Match.id == Prediction.match_id
+        ).filter(
+            Match.status == MatchStatus.LIVE,
+            Prediction.live_details.isnot(None),
+            RankingService._group_picks_filter(group_id, group.use_global_picks)
+        ):
+            points = rules.points_for_details(details)
+            if points:
+                live[user_id] = live.get(user_id, 0) + points
+        return live
+    
+    @staticmethod
+    def _score_predictions(predictions: List[Prediction], matches_by_id: Dict[int, Match], write_back: bool = False,
+                           rules: ScoringRules = STANDARD_RULES) -> Dict[int, Dict[str, int]]:
+        """
+        Score predictions against finished matches with the batch kernel.
+        
+        Returns per-user aggregates for every user that appears in
+        predictions, with points under `rules`. With write_back=True,
+        points_awarded (standard rules) and score_details are also set
+        on each scored prediction.
+        """
+        scored = RankingService._score_prediction_arrays(predictions, matches_by_id, write_back)
+        return RankingService._aggregate_user_scores(scored, scored.points_under(rules))
+    
+    @staticmethod
+    def _score_prediction_arrays(predictions: List[Prediction], matches_by_id: Dict[int, Match],
+                                 write_back: bool = False) -> ScoredPredictions:
+        """
+        Score predictions (standard rules) into parallel arrays.
+        
+        submitted is each prediction's created_at as epoch seconds.
+        Predictions on matches that are not in matches_by_id (or have no
+        score) keep zeros, so every prediction has a row.
+        """
+        count = len(predictions)
+        user_ids = np.fromiter((p.user_id for p in predictions), dtype=np.int64, count=count)
+        points = np.zeros(count, dtype=np.int64)
+        exact = np.zeros(count, dtype=bool)
+        result = np.zeros(count, dtype=bool)
+        error = np.zeros(count, dtype=np.int64)
+        submitted = np.fromiter((_epoch(p.created_at) for p in predictions), dtype=np.float64, count=count)
+        all_home_pred = np.fromiter((p.home_pred for p in predictions), dtype=np.int64, count=count)
+        all_away_pred = np.fromiter((p.away_pred for p in predictions), dtype=np.int64, count=count)
+        all_home_score = np.full(count, -1, dtype=np.int64)
+        all_away_score = np.full(count, -1, dtype=np.int64)
+        advance = np.zeros(count, dtype=bool)
+        stage = np.zeros(count, dtype=np.int64)
+        scored_arrays = ScoredPredictions(
+            user_ids, points, exact, result, error, submitted,
+            all_home_pred, all_away_pred, all_home_score, all_away_score, advance, stage
+        )
+        
+        scored_idx = [
+            idx for idx, pred in enumerate(predictions)
+            if pred.match_id in matches_by_id and matches_by_id[pred.match_id].home_score is not None
+        ]
+        if not scored_idx:
+            return scored_arrays
+        
+        scored = [predictions[idx] for idx in scored_idx]
+        n = len(scored)
+        
+        # Counted score (after extra time in knockouts) and advancing side per match
+        outcomes = {
+            match_id: (*ScoringService.counted_score(match), ScoringService.advancing_side(match))
+            for match_id, match in matches_by_id.items()
+        }
+        home_pred = np.fromiter((p.home_pred for p in scored), dtype=np.int64, count=n)
+        away_pred = np.fromiter((p.away_pred for p in scored), dtype=np.int64, count=n)
+        home_score = np.fromiter((outcomes[p.match_id][0] for p in scored), dtype=np.int64, count=n)
+        away_score = np.fromiter((outcomes[p.match_id][1] for p in scored), dtype=np.int64, count=n)
+        s_points, s_exact, s_result, s_balance = ScoringService.calculate_points_batch(
+            home_pred, away_pred, home_score, away_score
+        )
+        s_error = ScoringService.goal_error(home_pred, away_pred, home_score, away_score)
+        
+        # Advance bonus - only predictions on decided knockout matches need a look
+        s_advance = np.zeros(n, dtype=bool)
+        knockout = [
+            idx for idx, p in enumerate(scored)
+            if outcomes[p.match_id][2] != ScoringService.ADVANCE_NONE
+        ]
+        if knockout:
+            s_advance[knockout] = [
+                ScoringService.predicted_side(
+                    matches_by_id[scored[idx].match_id], scored[idx].advance_team,
+                    scored[idx].home_pred, scored[idx].away_pred
+                ) == outcomes[scored[idx].match_id][2]
+                for idx in knockout
+            ]
+            s_points = s_points + s_advance * ScoringService.POINTS_ADVANCE
+        
+        points[scored_idx] = s_points
+        exact[scored_idx] = s_exact
+        result[scored_idx] = s_result
+        error[scored_idx] = s_error
+        advance[scored_idx] = s_advance
+        stage[scored_idx] = [RankingService.STAGE_INDEX.get(matches_by_id[p.match_id].stage, 0) for p in scored]
+        all_home_score[scored_idx] = home_score
+        all_away_score[scored_idx] = away_score
+        
+        if write_back:
+            for pred, pts, ex, res, bal, adv, err in zip(
+                scored, s_points.tolist(), s_exact.tolist(), s_result.tolist(), s_balance.tolist(),
+                s_advance.tolist(), s_error.tolist()
+            ):
+                pred.points_awarded = pts
+                pred.score_details = {"exact": ex, "result": res, "balance": bal, "advance": adv, "error": err}
+        
+        return scored_arrays
+    
+    @staticmethod
+    def _aggregate_user_scores(scored: ScoredPredictions, points: Optional[np.ndarray] = None) -> Dict[int, Dict]:
+        """Sum scored prediction arrays per user (earliest submission for the tiebreak, points per stage)"""
+        if not len(scored.user_ids):
+            return {}
+        if points is None:
+            points = scored.points
+        
+        unique_ids, inverse = np.unique(scored.user_ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=points, minlength=len(unique_ids))
+        stage_count = len(RankingService.STAGE_COLUMNS)
+        stage_totals = np.bincount(
+            inverse * stage_count + scored.stage, weights=points, minlength=len(unique_ids) * stage_count
+        ).reshape(len(unique_ids), stage_count).astype(np.int64).tolist()
+        exact_counts = np.bincount(inverse, weights=scored.exact, minlength=len(unique_ids))
+        result_counts = np.bincount(inverse, weights=scored.result, minlength=len(unique_ids))
+        error_sums = np.bincount(inverse, weights=scored.error, minlength=len(unique_ids))
+        first_submitted = np.full(len(unique_ids), np.inf)
+        np.minimum.at(first_submitted, inverse, scored.submitted)
+        
+        return {
+            user_id: {
+                "total_points": int(totals[idx]),
+                "exact_matches": int(exact_counts[idx]),
+                "correct_results": int(result_counts[idx]),
+                "goal_error": int(error_sums[idx]),
+                "first_prediction_at": _from_epoch(first_submitted[idx]),
+                **dict(zip(RankingService.STAGE_COLUMNS, stage_totals[idx])),
             }
-        return None
+            for idx, user_id in enumerate(unique_ids.tolist())
+        }
     
     @staticmethod
-    def get_group_standings(db: Session, group_id: int) -> Optional[Dict]:
-        """Get cached group standings"""
-        scope = f"GROUP:{group_id}"
-        cache = db.query(StandingsCache).filter(StandingsCache.scope == scope).first()
-        if cache:
+    def _group_rules(db: Session, group_ids) -> Dict[int, ScoringRules]:
+        """Compiled scoring rules per group (groups on the standard system map to STANDARD_RULES)"""
+        group_ids = list(group_ids)
+        if not group_ids:
+            return {}
+        
+        rows = db.query(Group.id, Group.scoring_system, Group.scoring_rules).filter(Group.id.in_(group_ids)).all()
+        return {
+            group_id: ScoringRules.from_group_settings(scoring_system, scoring_rules)
+            for group_id, scoring_system, scoring_rules in rows
+        }
+    
+    @staticmethod
+    def _group_picks_filter(group_id: int, use_global_picks: bool = False):
+        """
+        Predictions counting in a group.
+        
+        The group's own predictions, plus - for groups on global picks -
+        its active members' global predictions on matches they did not
+        override with a group prediction.
+        """
+        own = Prediction.group_id == group_id
+        if not use_global_picks:
+            return own
+        
+        override = aliased(Prediction)
+        members = select(GroupMember.user_id).where(
+            GroupMember.group_id == group_id,
+            GroupMember.is_active == True,
+            GroupMember.pending_approval == False
+        )
+        return or_(own, and_(
+            Prediction.group_id.is_(None),
+            Prediction.user_id.in_(members),
+            ~exists().where(
+                override.group_id == group_id,
+                override.user_id == Prediction.user_id,
+                override.match_id == Prediction.match_id
+            )
+        ))
+    
+    @staticmethod
+    def _global_pick_members(db: Session, group_ids) -> Dict[int, np.ndarray]:
+        """Sorted active member ids of each group (among group_ids) on global picks"""
+        group_ids = list(group_ids)
+        if not group_ids:
+            return {}
+        
+        members = {
+            group_id: [] for (group_id,) in db.query(Group.id).filter(
+                Group.id.in_(group_ids),
+                Group.use_global_picks == True
+            )
+        }
+        if members:
+            for group_id, user_id in db.query(GroupMember.group_id, GroupMember.user_id).filter(
+                GroupMember.group_id.in_(list(members)),
+                GroupMember.is_active == True,
+                GroupMember.pending_approval == False
+            ):
+                members[group_id].append(user_id)
+        
+        return {group_id: np.unique(np.array(user_ids, dtype=np.int64)) for group_id, user_ids in members.items()}
+    
+    @staticmethod
+    def _global_pick_groups(db: Session, user_ids) -> Dict[int, List[int]]:
+        """Groups on global picks each user is an active member of"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        
+        rows = db.query(GroupMember.user_id, GroupMember.group_id).join(
+            Group, Group.id == GroupMember.group_id
+        ).filter(
+            GroupMember.user_id.in_(user_ids),
+            GroupMember.is_active == True,
+            GroupMember.pending_approval == False,
+            Group.use_global_picks == True
+        ).all()
+        
+        groups: Dict[int, List[int]] = {}
+        for user_id, group_id in rows:
+            groups.setdefault(user_id, []).append(group_id)
+        return groups
+    
+    @staticmethod
+    def _inherited_rows(user_col: np.ndarray, match_col: np.ndarray, global_end: int,
+                        members: np.ndarray, own_rows: np.ndarray) -> np.ndarray:
+        """
+        Scan positions of members' global predictions for a group.
+        
+        The global predictions are the first global_end rows of the scan,
+        ordered by user, so each member's rows are one contiguous range.
+        Matches the group has its own prediction for (own_rows) are dropped.
+        """
+        global_users = user_col[:global_end]
+        starts = np.searchsorted(global_users, members, side="left")
+        counts = np.searchsorted(global_users, members, side="right") - starts
+        total = int(counts.sum())
+        if not total:
+            return np.zeros(0, dtype=np.int64)
+        
+        # Concatenate the [start, start + count) ranges
+        rows = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        if len(own_rows):
+            stride = int(match_col.max()) + 1
+            overridden = np.isin(
+                user_col[rows] * stride + match_col[rows],
+                user_col[own_rows] * stride + match_col[own_rows]
+            )
+            rows = rows[~overridden]
+        return rows
+    
+    @staticmethod
+    def _load_profiles(db: Session, user_ids) -> Dict[int, Tuple[str, Optional[str]]]:
+        """Fetch (name, avatar_url) for many users in one query"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        
+        rows = db.query(User.id, User.name, User.avatar_url).filter(User.id.in_(user_ids)).all()
+        return {user_id: (name, avatar_url) for user_id, name, avatar_url in rows}
+    
+    @staticmethod
+    def _build_standings(user_scores: Dict[int, Dict], profiles: Dict[int, Tuple[str, Optional[str]]]) -> List[Dict]:
+        """Turn per-user aggregates into ranked standings rows"""
+        standings = []
+        for user_id, scores in user_scores.items():
+            profile = profiles.get(user_id)
+            if profile:
+                standings.append({
+                    "user_id": user_id,
+                    "name": profile[0],
+                    "avatar_url": profile[1],
+                    "exact_matches": scores["exact_matches"],
+                    "correct_results": scores["correct_results"],
+                    "total_points": scores["total_points"],
+                    "goal_error": scores["goal_error"],
+                    "first_prediction_at": scores["first_prediction_at"],
+                    **{column: scores.get(column, 0) for column in RankingService.STAGE_COLUMNS},
+                    "rank": 0,  # Will be assigned after sorting
+                })
+        
+        RankingService._rank_standings(standings)
+        return standings
+    
+    @staticmethod
+    def _save_standings(db: Session, scope: str, group_id: Optional[int], standings: List[Dict],
+                        version: Optional[int] = None, commit: bool = True, changed_user_ids=None,
+                        as_of_match: Optional[int] = None, base_version: int = 0) -> bool:
+        """
+        Store computed standings for a scope as a new version and publish it.
+        
+        The rows are written under `version` (from _allocate_versions,
+        claimed here if not given) and made visible by one swap of the
+        scope's published version, so readers see either the old or the
+        new table, never a mix. If a
+        newer version was published meanwhile this one is dropped and
+        False is returned. With changed_user_ids (relative to standings
+        base_version) only those users' leaderboard keys are updated when
+        the board holds base_version; otherwise the scope's leaderboard is
+        replaced. A snapshot is recorded for the current number of
+        finished matches (as_of_match, counted if not given).
+        """
+        if version is None:
+            version = RankingService._allocate_versions(db, {scope: group_id})[scope]
+        
+        RankingService._write_entries(
+            db, scope, group_id, standings, version, base_version if changed_user_ids is not None else 0
+        )
+        if not RankingService._publish_version(db, scope, version):
+            if commit:
+                db.commit()
+            return False
+        
+        if as_of_match is None:
+            as_of_match = db.query(Match).filter(Match.status == MatchStatus.FINISHED).count()
+        RankingService._write_snapshot(db, scope, standings, as_of_match)
+        
+        if commit:
+            db.commit()
+        
+        RankingService._publish_leaderboard(scope, standings, changed_user_ids, version, base_version)
+        return True
+    
+    @staticmethod
+    def _allocate_versions(db: Session, scopes: Dict[str, Optional[int]]) -> Dict[str, int]:
+        """
+        Claim a new standings version for each scope ({scope: group_id}).
+        
+        Claimed before the inputs are read, so a higher version always
+        holds data at least as new. Commits right away so concurrent
+        recomputes only serialize on this short counter update.
+        """
+        if not scopes:
+            return {}
+        
+        known = {scope for (scope,) in db.query(StandingsCache.scope).filter(StandingsCache.scope.in_(list(scopes)))}
+        for scope, group_id in scopes.items():
+            if scope not in known:
+                db.add(StandingsCache(scope=scope, group_id=group_id, version=0, next_version=0))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Header created by a concurrent recompute
+            db.rollback()
+        
+        db.execute(
+            update(StandingsCache)
+            .where(StandingsCache.scope.in_(list(scopes)))
+            .values(next_version=StandingsCache.next_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        versions = dict(db.query(StandingsCache.scope, StandingsCache.next_version).filter(
+            StandingsCache.scope.in_(list(scopes))
+        ).all())
+        db.commit()
+        return versions
+    
+    @staticmethod
+    def _publish_version(db: Session, scope: str, version: int) -> bool:
+        """
+        Swap a scope's published version to `version` unless a newer one is already live.
+        
+        The version it replaces is kept for readers still paging through
+        it; anything older is garbage-collected.
+        """
+        previous = db.query(StandingsCache.version).filter(StandingsCache.scope == scope).scalar() or 0
+        swapped = db.execute(
+            update(StandingsCache)
+            .where(StandingsCache.scope == scope, StandingsCache.version < version)
+            .values(version=version, change_seq=StandingsCache.change_seq + 1,
+                    computed_at=datetime.now(timezone.utc), standings_data=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        
+        if not swapped:
+            logger.info(f"Standings version {version} of {scope} superseded by a newer recompute")
+            db.execute(delete(StandingsEntry).where(
+                StandingsEntry.scope == scope,
+                StandingsEntry.version == version
+            ))
+            return False
+        
+        db.execute(delete(StandingsEntry).where(
+            StandingsEntry.scope == scope,
+            StandingsEntry.version < previous
+        ))
+        return True
+    
+    @staticmethod
+    def _published(scope: str):
+        """Filter for a scope's rows of its published version (one statement, one consistent read)"""
+        published_version = select(StandingsCache.version).where(StandingsCache.scope == scope).scalar_subquery()
+        return and_(StandingsEntry.scope == scope, StandingsEntry.version == published_version)
+    
+    @staticmethod
+    def _write_entries(db: Session, scope: str, group_id: Optional[int], standings: List[Dict], version: int,
+                       base_version: int = 0):
+        """
+        Bulk insert a scope's standings rows under `version` (not visible until published).
+        
+        Provisional points/ranks are computed along with the official ones.
+        With base_version (a patch of that version's standings) only rows
+        that differ from it are sent; the rest are copied inside the
+        database.
+        """
+        live_matches = db.query(Match.id).filter(Match.status == MatchStatus.LIVE).first() is not None
+        live = RankingService._live_points_by_user(db, group_id) if live_matches else {}
+        for s in standings:
+            s["live_points"] = live.get(s["user_id"], 0)
+        provisional_ranks = RankingService._provisional_ranks(
+            np.array([s["rank"] for s in standings], dtype=np.int64),
+            np.array([s["total_points"] + s["live_points"] for s in standings], dtype=np.int64)
+        ).tolist()
+        
+        inserts = []
+        for s, provisional_rank in zip(standings, provisional_ranks):
+            s["provisional_rank"] = provisional_rank
+            inserts.append({
+                "scope": scope,
+                "group_id": group_id,
+                "user_id": s["user_id"],
+                "version": version,
+                "rank": s["rank"],
+                "total_points": s["total_points"],
+                "exact_matches": s["exact_matches"],
+                "correct_results": s["correct_results"],
+                "goal_error": s.get("goal_error", 0),
+                "first_prediction_at": s.get("first_prediction_at"),
+                "sort_key": s["sort_key"],
+                "live_points": s["live_points"],
+                "provisional_rank": provisional_rank,
+                **{column: s.get(column, 0) for column in RankingService.STAGE_COLUMNS},
+            })
+        
+        if base_version:
+            columns = [getattr(StandingsEntry, column) for column in RankingService.ENTRY_COLUMNS]
+            base = {
+                user_id: tuple(values)
+                for user_id, *values in db.query(StandingsEntry.user_id, *columns).filter(
+                    StandingsEntry.scope == scope,
+                    StandingsEntry.version == base_version
+                )
+            }
+            # Only when every base row is carried over (a patch never drops users)
+            if set(base) <= {row["user_id"] for row in inserts}:
+                inserts = [
+                    row for row in inserts
+                    if base.get(row["user_id"]) != tuple(row[column] for column in RankingService.ENTRY_COLUMNS)
+                ]
+                RankingService._copy_entries(db, scope, base_version, version, {row["user_id"] for row in inserts})
+        
+        if inserts:
+            db.execute(insert(StandingsEntry), inserts)
+    
+    @staticmethod
+    def _copy_entries(db: Session, scope: str, base_version: int, version: int, skip_user_ids: Set[int]):
+        """Copy a scope's rows of base_version to version, except skip_user_ids (one INSERT ... SELECT)"""
+        columns = ["scope", "group_id", "user_id", *RankingService.ENTRY_COLUMNS]
+        source = select(
+            *(getattr(StandingsEntry, column) for column in columns), literal(version)
+        ).where(
+            StandingsEntry.scope == scope,
+            StandingsEntry.version == base_version
+        )
+        if skip_user_ids:
+            source = source.where(StandingsEntry.user_id.notin_(list(skip_user_ids)))
+        db.execute(insert(StandingsEntry).from_select([*columns, "version"], source))
+    
+    @staticmethod
+    def _write_snapshot(db: Session, scope: str, standings: List[Dict], as_of_match: int):
+        """
+        Record (rank, points) per user for a scope after as_of_match finished matches.
+        
+        Snapshots are append-only per finished-match count: earlier counts
+        are never touched, and a recompute at the same count (e.g. a
+        correction) only rewrites the rows whose rank or total changed.
+        """
+        if not as_of_match:
+            return
+        
+        new = {s["user_id"]: (s["rank"], s["total_points"]) for s in standings}
+        existing = {
+            user_id: (rank, total_points)
+            for user_id, rank, total_points in db.query(
+                StandingsSnapshot.user_id, StandingsSnapshot.rank, StandingsSnapshot.total_points
+            ).filter(
+                StandingsSnapshot.scope == scope,
+                StandingsSnapshot.as_of_match == as_of_match
+            )
+        }
+        changed = {user_id: row for user_id, row in new.items() if existing.get(user_id) != row}
+        stale = (set(existing) - set(new)) | (set(changed) & set(existing))
+        
+        if stale:
+            db.execute(delete(StandingsSnapshot).where(
+                StandingsSnapshot.scope == scope,
+                StandingsSnapshot.as_of_match == as_of_match,
+                StandingsSnapshot.user_id.in_(list(stale))
+            ))
+        if changed:
+            db.execute(insert(StandingsSnapshot), [
+                {
+                    "scope": scope,
+                    "as_of_match": as_of_match,
+                    "user_id": user_id,
+                    "rank": rank,
+                    "total_points": total_points,
+                }
+                for user_id, (rank, total_points) in changed.items()
+            ])
+    
+    @staticmethod
+    def _load_entries(db: Session, scope: str) -> List[Dict]:
+        """Load a scope's standings rows as plain dicts, in sort key order"""
+        stage_columns = [getattr(StandingsEntry, column) for column in RankingService.STAGE_COLUMNS]
+        rows = db.query(
+            StandingsEntry.user_id, StandingsEntry.rank, StandingsEntry.total_points,
+            StandingsEntry.exact_matches, StandingsEntry.correct_results,
+            StandingsEntry.goal_error, StandingsEntry.first_prediction_at, StandingsEntry.sort_key,
+            *stage_columns
+        ).filter(RankingService._published(scope)).order_by(StandingsEntry.sort_key, StandingsEntry.user_id).all()
+        
+        return [
+            {
+                "user_id": user_id,
+                "rank": rank,
+                "total_points": total_points,
+                "exact_matches": exact_matches,
+                "correct_results": correct_results,
+                "goal_error": goal_error,
+                "first_prediction_at": first_prediction_at,
+                "sort_key": sort_key,
+                **dict(zip(RankingService.STAGE_COLUMNS, stage_points)),
+            }
+            for user_id, rank, total_points, exact_matches, correct_results, goal_error, first_prediction_at, sort_key, *stage_points
+            in rows
+        ]
+    
+    @staticmethod
+    def _publish_leaderboard(scope: str, standings: List[Dict], changed_user_ids=None, version: int = 0,
+                             base_version: int = 0):
+        """
+        Mirror standings sort keys (of standings `version`) into the leaderboard backend (best effort).
+        
+        changed_user_ids are only applied on their own to a board that
+        holds base_version; a board that is behind is replaced.
+        """
+        try:
+            leaderboard = get_leaderboard()
+            if changed_user_ids is None or leaderboard.version(scope) != base_version:
+                leaderboard.replace(scope, {s["user_id"]: leaderboard_key(s) for s in standings}, version)
+            else:
+                changed = set(changed_user_ids)
+                for s in standings:
+                    if s["user_id"] in changed:
+                        leaderboard.set_key(scope, s["user_id"], leaderboard_key(s))
+                leaderboard.set_version(scope, version)
+        except Exception as e:
+            logger.warning(f"Error publishing {scope} to leaderboard: {e}")
+    
+    @staticmethod
+    def _rank_standings(standings: List[Dict]):
+        """
+        Sort standings in place by the tiebreaker sort key and assign ranks.
+        
+        Ranks follow standard competition ranking ("1, 2, 2, 4"): users
+        whose whole tiebreaker chain is equal share a rank.
+        """
+        for s in standings:
+            s["sort_key"] = ScoringService.tiebreaker_sort_key(
+                s["total_points"], s["exact_matches"], s["correct_results"],
+                s.get("goal_error", 0), s.get("first_prediction_at")
+            )
+        standings.sort(key=lambda x: (x["sort_key"], x["user_id"]))
+        
+        previous_key, rank = None, 0
+        for idx, s in enumerate(standings):
+            if s["sort_key"] != previous_key:
+                previous_key, rank = s["sort_key"], idx + 1
+            s["rank"] = rank
+    
+    @staticmethod
+    def get_user_rank(db: Session, scope: str, user_id: int) -> Optional[Dict]:
+        """
+        Get one user's rank in a scope from the leaderboard.
+        
+        The board is reloaded from the table when it is empty (e.g. after
+        a restart) or older than the published standings version - e.g.
+        when another process (a ranking worker, another web worker)
+        published into its own in-memory board.
+        """
+        try:
+            leaderboard = get_leaderboard()
+            
+            published = db.query(StandingsCache.version).filter(StandingsCache.scope == scope).scalar() or 0
+            if leaderboard.count(scope) == 0 or leaderboard.version(scope) < published:
+                standings = RankingService._load_entries(db, scope)
+                if not standings:
+                    return None
+                RankingService._publish_leaderboard(scope, standings, version=published)
+            
+            rank = leaderboard.rank(scope, user_id)
+            if rank is None:
+                return None
+            
+            return {
+                "scope": scope,
+                "user_id": user_id,
+                "rank": rank,
+                "total_points": points_from_key(leaderboard.key(scope, user_id)),
+                "total_users": leaderboard.count(scope),
+            }
+        
+        except Exception as e:
+            logger.warning(f"Leaderboard unavailable for {scope}, reading standings table: {e}")
+            entry = db.query(StandingsEntry).filter(
+                RankingService._published(scope),
+                StandingsEntry.user_id == user_id
+            ).first()
+            if not entry:
+                return None
+            
             return {
-                "scope": f"GROUP:{group_id}",
-                "standings": cache.standings_data,
-                "computed_at": cache.computed_at,
-                "match_count": db.query(Match).filter(Match.status == MatchStatus.FINISHED).count(),
+                "scope": scope,
+                "user_id": user_id,
+                "rank": entry.rank,
+                "total_points": entry.total_points,
+                "total_users": db.query(StandingsEntry).filter(RankingService._published(scope)).count(),
             }
-        return None
+    
+    @staticmethod
+    def get_global_standings(db: Session, limit: int = 100, cursor: Optional[str] = None,
+                             provisional: bool = False) -> Optional[Dict]:
+        """Get a page of global standings"""
+        return RankingService.get_standings_page(db, "GLOBAL", limit, cursor, provisional)
+    
+    @staticmethod
+    def get_group_standings(db: Session, group_id: int, limit: int = 100, cursor: Optional[str] = None,
+                            provisional: bool = False) -> Optional[Dict]:
+        """Get a page of group standings"""
+        return RankingService.get_standings_page(db, f"GROUP:{group_id}", limit, cursor, provisional)
+    
+    @staticmethod
+    def get_standings_page(db: Session, scope: str, limit: int = 100, cursor: Optional[str] = None,
+                           provisional: bool = False) -> Optional[Dict]:
+        """
+        Get standings rows in rank order with keyset pagination.
+        
+        cursor is the opaque next_cursor of the previous page; without it
+        the top `limit` rows are returned. With provisional=True rows are
+        ordered by provisional rank ("if the live matches ended now").
+        """
+        cache = db.query(StandingsCache).filter(StandingsCache.scope == scope).first()
+        if not cache or not cache.version:
+            return None
+        
+        rank_column = StandingsEntry.provisional_rank if provisional else StandingsEntry.rank
+        
+        # Pin the version read here so all queries of this page agree
+        query = db.query(StandingsEntry, User.name, User.avatar_url).join(
+            User, User.id == StandingsEntry.user_id
+        ).filter(StandingsEntry.scope == scope, StandingsEntry.version == cache.version)
+        
+        if cursor:
+            try:
+                after_rank, after_user_id = (int(part) for part in cursor.split(":"))
+            except ValueError:
+                after_rank, after_user_id = 0, 0
+            query = query.filter(or_(
+                rank_column > after_rank,
+                and_(rank_column == after_rank, StandingsEntry.user_id > after_user_id),
+            ))
+        
+        rows = query.order_by(rank_column, StandingsEntry.user_id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        last = rows[-1][0] if rows else None
+        return {
+            "scope": scope,
+            "provisional": provisional,
+            "standings": RankingService._with_movement(db, scope, [RankingService._entry_row(*row) for row in rows]),
+            "computed_at": cache.computed_at,
+            "match_count": db.query(Match).filter(Match.status == MatchStatus.FINISHED).count(),
+            "live_matches": db.query(Match).filter(Match.status == MatchStatus.LIVE).count(),
+            "total_users": db.query(StandingsEntry).filter(
+                StandingsEntry.scope == scope, StandingsEntry.version == cache.version
+            ).count(),
+            "next_cursor": f"{last.provisional_rank if provisional else last.rank}:{last.user_id}" if has_more else None,
+        }
+    
+    @staticmethod
+    def get_standings_around_user(db: Session, scope: str, user_id: int, window: int = 5) -> Optional[Dict]:
+        """Get the standings rows within `window` ranks of a user"""
+        me = db.query(StandingsEntry).filter(
+            RankingService._published(scope),
+            StandingsEntry.user_id == user_id
+        ).first()
+        if not me:
+            return None
+        
+        rows = db.query(StandingsEntry, User.name, User.avatar_url).join(
+            User, User.id == StandingsEntry.user_id
+        ).filter(
+            StandingsEntry.scope == scope,
+            StandingsEntry.version == me.version,
+            StandingsEntry.rank.between(max(1, me.rank - window), me.rank + window)
+        ).order_by(StandingsEntry.rank, StandingsEntry.user_id).all()
+        
+        return {
+            "scope": scope,
+            "user_id": user_id,
+            "rank": me.rank,
+            "standings": RankingService._with_movement(db, scope, [RankingService._entry_row(*row) for row in rows]),
+            "total_users": db.query(StandingsEntry).filter(
+                StandingsEntry.scope == scope, StandingsEntry.version == me.version
+            ).count(),
+        }
+    
+    @staticmethod
+    def get_stage_board(db: Session, scope: str, board: str, limit: int = 100) -> Optional[Dict]:
+        """
+        Rank a scope's published standings by the points of some stages only.
+        
+        Boards are STAGE_BOARDS keys (e.g. "group", "knockout"); the
+        subtotals are stored with each row, so this is one ordered query.
+        Equal board points share a board rank, listed in overall rank order.
+        """
+        cache = db.query(StandingsCache).filter(StandingsCache.scope == scope).first()
+        if not cache or not cache.version:
+            return None
+        
+        board_points = sum(getattr(StandingsEntry, column) for column in RankingService.STAGE_BOARDS[board])
+        rows = db.query(StandingsEntry, User.name, User.avatar_url, board_points).join(
+            User, User.id == StandingsEntry.user_id
+        ).filter(
+            StandingsEntry.scope == scope,
+            StandingsEntry.version == cache.version
+        ).order_by(board_points.desc(), StandingsEntry.rank, StandingsEntry.user_id).limit(limit).all()
+        
+        standings, previous = [], None
+        for position, (entry, name, avatar_url, points) in enumerate(rows, start=1):
+            row = RankingService._entry_row(entry, name, avatar_url)
+            row["board_points"] = int(points)
+            row["board_rank"] = standings[-1]["board_rank"] if points == previous else position
+            standings.append(row)
+            previous = points
+        
+        return {
+            "scope": scope,
+            "board": board,
+            "standings": standings,
+            "computed_at": cache.computed_at,
+        }
+    
+    @staticmethod
+    def get_rank_history(db: Session, scope: str, user_id: int) -> List[Dict]:
+        """Get a user's rank and points after each snapshotted finished match"""
+        rows = db.query(
+            StandingsSnapshot.as_of_match, StandingsSnapshot.rank, StandingsSnapshot.total_points
+        ).filter(
+            StandingsSnapshot.scope == scope,
+            StandingsSnapshot.user_id == user_id
+        ).order_by(StandingsSnapshot.as_of_match).all()
+        
+        return [
+            {"as_of_match": as_of_match, "rank": rank, "total_points": total_points}
+            for as_of_match, rank, total_points in rows
+        ]
+    
+    @staticmethod
+    def get_standings_as_of(db: Session, scope: str, as_of_match: int, limit: int = 100) -> Optional[Dict]:
+        """Get the top of the standings as they were after as_of_match finished matches"""
+        snapshot_at = db.query(func.max(StandingsSnapshot.as_of_match)).filter(
+            StandingsSnapshot.scope == scope,
+            StandingsSnapshot.as_of_match <= as_of_match
+        ).scalar()
+        if snapshot_at is None:
+            return None
+        
+        rows = db.query(StandingsSnapshot, User.name, User.avatar_url).join(
+            User, User.id == StandingsSnapshot.user_id
+        ).filter(
+            StandingsSnapshot.scope == scope,
+            StandingsSnapshot.as_of_match == snapshot_at
+        ).order_by(StandingsSnapshot.rank, StandingsSnapshot.user_id).limit(limit).all()
+        
+        return {
+            "scope": scope,
+            "as_of_match": snapshot_at,
+            "standings": [
+                {
+                    "user_id": snapshot.user_id,
+                    "name": name,
+                    "avatar_url": avatar_url,
+                    "total_points": snapshot.total_points,
+                    "rank": snapshot.rank,
+                }
+                for snapshot, name, avatar_url in rows
+            ],
+        }
+    
+    @staticmethod
+    def _with_movement(db: Session, scope: str, rows: List[Dict]) -> List[Dict]:
+        """
+        Add "movement" (places gained since the previous snapshot) to standings rows.
+        
+        Positive means moved up; None means no earlier snapshot for the user.
+        """
+        if not rows:
+            return rows
+        
+        latest = db.query(func.max(StandingsSnapshot.as_of_match)).filter(
+            StandingsSnapshot.scope == scope
+        ).scalar()
+        previous = db.query(func.max(StandingsSnapshot.as_of_match)).filter(
+            StandingsSnapshot.scope == scope,
+            StandingsSnapshot.as_of_match < latest
+        ).scalar() if latest is not None else None
+        
+        previous_ranks = {}
+        if previous is not None:
+            previous_ranks = dict(db.query(StandingsSnapshot.user_id, StandingsSnapshot.rank).filter(
+                StandingsSnapshot.scope == scope,
+                StandingsSnapshot.as_of_match == previous,
+                StandingsSnapshot.user_id.in_([row["user_id"] for row in rows])
+            ).all())
+        
+        for row in rows:
+            previous_rank = previous_ranks.get(row["user_id"])
+            row["movement"] = previous_rank - row["rank"] if previous_rank is not None else None
+        
+        return rows
+    
+    @staticmethod
+    def _entry_row(entry: StandingsEntry, name: str, avatar_url: Optional[str]) -> Dict:
+        """Serialize a standings row for the API"""
+        return {
+            "user_id": entry.user_id,
+            "name": name,
+            "avatar_url": avatar_url,
+            "exact_matches": entry.exact_matches,
+            "correct_results": entry.correct_results,
+            "goal_error": entry.goal_error,
+            "total_points": entry.total_points,
+            "rank": entry.rank,
+            "live_points": entry.live_points,
+            "provisional_points": entry.total_points + entry.live_points,
+            "provisional_rank": entry.provisional_rank,
+            **{column: getattr(entry, column) for column in RankingService.STAGE_COLUMNS},
+        }
+
+def _epoch(value: Optional[datetime]) -> float:
+    """Datetime as epoch seconds (naive values are UTC); inf when missing"""
+    if value is None:
+        return np.inf
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _from_epoch(value: float) -> Optional[datetime]:
+    """Inverse of _epoch"""
+    return datetime.fromtimestamp(value, timezone.utc) if np.isfinite(value) else None
+
+def _recalculate_group_shard(database_url: str, group_ids: List[int]) -> List[int]:
+    """Process-pool entry point: recalculate one shard of groups with its own engine and session; returns the groups done"""
+    engine = create_engine(database_url, poolclass=NullPool)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        if not RankingService._recalculate_scopes(db, group_ids, include_global=False):
+            return []
+        return group_ids
+    finally:
+        db.close()
+        engine.dispose()
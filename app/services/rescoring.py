@@ -0,0 +1,204 @@
+from sqlalchemy import select, update, or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Prediction, Group, RescoreJob
+from app.services.ranking import RankingService
+from datetime import datetime, timedelta, timezone
+import logging
+from typing import List, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class RescoreStatus:
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class RescoringService:
+    """Retroactive rescoring of predictions in committed, resumable chunks"""
+    
+    @staticmethod
+    def create_job(db: Session, match_ids: Optional[List[int]] = None, requested_by: Optional[int] = None) -> RescoreJob:
+        """Queue a rescoring job for some matches' predictions (all predictions without match_ids)"""
+        query = db.query(Prediction)
+        if match_ids:
+            query = query.filter(Prediction.match_id.in_(match_ids))
+        
+        job = RescoreJob(
+            status=RescoreStatus.PENDING,
+            match_ids=sorted(set(match_ids)) if match_ids else None,
+            requested_by=requested_by,
+            total=query.count(),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+    
+    @staticmethod
+    def submit(job_id: int):
+        """
+        Run a job in the background on the recompute queue's "rescore" lane.
+        
+        That lane has its own worker, so a long rescore never delays
+        result-driven ranking recomputes.
+        """
+        from app.jobs.queue import get_recompute_queue
+        
+        def task(session: Session, _) -> bool:
+            job = RescoringService.run(session, job_id)
+            # None: another worker holds the job
+            return job is None or job.status == RescoreStatus.DONE
+        
+        return get_recompute_queue().submit(f"rescore:{job_id}", task, lane="rescore")
+    
+    @staticmethod
+    def run(db: Session, job_id: int, chunk_size: Optional[int] = None) -> Optional[RescoreJob]:
+        """
+        Run (or resume) a rescoring job.
+        
+        Predictions are read in primary-key order, chunk_size at a time,
+        after the job's checkpoint. Each chunk is scored with the ranking
+        kernel, only changed rows are written, and the rows plus the new
+        checkpoint are committed together - so no transaction outlives a
+        chunk and a crash resumes where the last commit left off. When
+        done, the affected ranking scopes are marked dirty. Returns None
+        if the job is unknown or another worker holds it.
+        """
+        chunk_size = chunk_size or settings.RESCORE_CHUNK_SIZE
+        if not RescoringService._claim(db, job_id):
+            return None
+        
+        job = db.query(RescoreJob).filter(RescoreJob.id == job_id).first()
+        try:
+            matches_by_id = {m.id: m for m in RankingService._finished_match_rows(db)}
+            stmt = select(
+                Prediction.id, Prediction.user_id, Prediction.group_id, Prediction.match_id,
+                Prediction.home_pred, Prediction.away_pred, Prediction.advance_team, Prediction.created_at,
+                Prediction.points_awarded, Prediction.score_details
+            ).order_by(Prediction.id).limit(chunk_size)
+            if job.match_ids:
+                stmt = stmt.where(Prediction.match_id.in_(job.match_ids))
+            
+            while True:
+                rows = db.execute(stmt.where(Prediction.id > job.last_prediction_id)).all()
+                if not rows:
+                    break
+                
+                scored = RankingService._score_prediction_arrays(rows, matches_by_id)
+                job.changed += RankingService._write_back_batch(db, rows, scored, reset_unscored=True)
+                job.last_prediction_id = rows[-1].id
+                job.processed += len(rows)
+                job.heartbeat_at = datetime.now(timezone.utc)
+                db.commit()
+            
+            RescoringService._mark_rankings_dirty(db, job.match_ids)
+            job.status = RescoreStatus.DONE
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            
+            logger.info(f"Rescoring job {job.id} done: {job.processed} predictions, {job.changed} changed")
+        
+        except Exception as e:
+            logger.error(f"Error in rescoring job {job_id}: {e}")
+            db.rollback()
+            db.query(RescoreJob).filter(RescoreJob.id == job_id).update(
+                {"status": RescoreStatus.FAILED, "error": str(e)}, synchronize_session=False
+            )
+            db.commit()
+        
+        db.refresh(job)
+        return job
+    
+    @staticmethod
+    def resume_stalled(db: Session) -> List[int]:
+        """Run pending jobs and running jobs whose worker stopped (crash, deploy); returns their ids"""
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=settings.RESCORE_STALE_SECONDS)
+        job_ids = [job_id for (job_id,) in db.query(RescoreJob.id).filter(
+            or_(
+                RescoreJob.status == RescoreStatus.PENDING,
+                (RescoreJob.status == RescoreStatus.RUNNING) & (RescoreJob.heartbeat_at < stale_before),
+            )
+        ).order_by(RescoreJob.id)]
+        
+        for job_id in job_ids:
+            RescoringService.run(db, job_id)
+        return job_ids
+    
+    @staticmethod
+    def get_progress(db: Session, job_id: int) -> Optional[Dict]:
+        """Job state with progress, rate (predictions/s in the current run) and ETA"""
+        job = db.query(RescoreJob).filter(RescoreJob.id == job_id).first()
+        if not job:
+            return None
+        return RescoringService._progress(job)
+    
+    @staticmethod
+    def list_jobs(db: Session, limit: int = 20) -> List[Dict]:
+        """Most recent rescoring jobs first"""
+        jobs = db.query(RescoreJob).order_by(RescoreJob.id.desc()).limit(limit).all()
+        return [RescoringService._progress(job) for job in jobs]
+    
+    @staticmethod
+    def _claim(db: Session, job_id: int) -> bool:
+        """Mark a job running for this worker unless another live worker holds it"""
+        now = datetime.now(timezone.utc)
+        stale_before = now - timedelta(seconds=settings.RESCORE_STALE_SECONDS)
+        claimed = db.execute(
+            update(RescoreJob).where(
+                RescoreJob.id == job_id,
+                or_(
+                    RescoreJob.status.in_([RescoreStatus.PENDING, RescoreStatus.FAILED]),
+                    (RescoreJob.status == RescoreStatus.RUNNING) & (RescoreJob.heartbeat_at < stale_before),
+                )
+            ).values(
+                status=RescoreStatus.RUNNING,
+                error=None,
+                heartbeat_at=now,
+                run_started_at=now,
+                run_start_processed=RescoreJob.processed,
+            )
+        ).rowcount == 1
+        db.commit()
+        return claimed
+    
+    @staticmethod
+    def _mark_rankings_dirty(db: Session, match_ids: Optional[List[int]]):
+        """Queue the scopes whose points may have moved for the dirty ranking recompute"""
+        if match_ids:
+            for match_id in match_ids:
+                RankingService.mark_match_dirty(db, match_id, "rescore")
+            return
+        
+        scopes = {"GLOBAL": None}
+        scopes.update({f"GROUP:{group_id}": group_id for (group_id,) in db.query(Group.id).filter(Group.is_active == True)})
+        RankingService.mark_dirty(db, scopes, "rescore")
+    
+    @staticmethod
+    def _progress(job: RescoreJob) -> Dict:
+        rate = None
+        eta_seconds = None
+        if job.run_started_at and job.heartbeat_at and job.heartbeat_at > job.run_started_at:
+            elapsed = (job.heartbeat_at - job.run_started_at).total_seconds()
+            rate = (job.processed - job.run_start_processed) / elapsed
+            if job.status == RescoreStatus.RUNNING and rate > 0:
+                eta_seconds = max(0, job.total - job.processed) / rate
+        
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "match_ids": job.match_ids,
+            "total": job.total,
+            "processed": job.processed,
+            "changed": job.changed,
+            "percent": round(100.0 * job.processed / job.total, 1) if job.total else 100.0,
+            "checkpoint": job.last_prediction_id,
+            "rate_per_second": round(rate, 1) if rate is not None else None,
+            "eta_seconds": round(eta_seconds) if eta_seconds is not None else None,
+            "error": job.error,
+            "created_at": job.created_at,
+            "run_started_at": job.run_started_at,
+            "heartbeat_at": job.heartbeat_at,
+            "finished_at": job.finished_at,
+        }
@@ -0,0 +1,419 @@
+from sqlalchemy import insert, delete, func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Match, MatchStatus, Prediction, Group, User, StandingsEntry, SimulationCache, SimulationOdds
+from app.services.business import ScoringRules, ScoringService, STANDARD_RULES
+from app.services.ranking import RankingService
+from datetime import datetime, timezone
+import hashlib
+import logging
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SimulationService:
+    """Monte Carlo estimates of final standings probabilities"""
+    
+    # Poisson goal rate per team: the crowd's average pick, shrunk towards a prior
+    PRIOR_GOALS = 1.3
+    PRIOR_WEIGHT = 5  # prior counts as this many picks
+    
+    # Positions reported as probabilities (finish 1st, top 3, top 10)
+    TOP_POSITIONS = (1, 3, 10)
+    
+    # Max users x simulations cells held in memory at once
+    CELL_BUDGET = 4_000_000
+    
+    # Wall-clock minutes from kickoff to full time (90 played, half-time and stoppage)
+    MATCH_MINUTES = 110
+    
+    # Open matches: still to be simulated
+    OPEN_STATUSES = (MatchStatus.SCHEDULED, MatchStatus.LIVE, MatchStatus.POSTPONED)
+    
+    @staticmethod
+    def results_fingerprint(db: Session) -> str:
+        """
+        Hash of the simulation inputs - odds only change when this does.
+        
+        Covers every settled result and live score, plus the picks on open
+        matches (count, newest id and last edit, so a saved, edited or
+        deleted pick changes it).
+        """
+        rows = db.query(
+            Match.id, Match.status, Match.home_score, Match.away_score,
+            Match.home_score_et, Match.away_score_et, Match.home_score_pen, Match.away_score_pen
+        ).filter(
+            Match.status.in_([MatchStatus.FINISHED, MatchStatus.CANCELLED, MatchStatus.LIVE])
+        ).order_by(Match.id).all()
+        
+        open_picks = db.query(
+            func.count(Prediction.id), func.max(Prediction.id), func.max(Prediction.updated_at)
+        ).join(Match, Match.id == Prediction.match_id).filter(
+            Match.status.in_(SimulationService.OPEN_STATUSES)
+        ).one()
+        
+        digest = hashlib.sha256()
+        for match_id, status, *scores in rows:
+            digest.update(f"{match_id}:{status.value}:{':'.join(map(str, scores))};".encode())
+        digest.update(f"picks:{':'.join(map(str, open_picks))}".encode())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def cached(db: Session, scope: str) -> Tuple[Optional[SimulationCache], bool]:
+        """
+        A scope's stored simulation header and whether it is stale.
+        
+        Never simulates - a missing or stale scope is queued for a
+        background refresh and readers keep getting the last odds stored.
+        """
+        cache = db.query(SimulationCache).filter(SimulationCache.scope == scope).first()
+        stale = not cache or cache.runs != settings.SIMULATION_RUNS or \
+            cache.fingerprint != SimulationService.results_fingerprint(db)
+        if stale:
+            SimulationService.request_refresh(scope)
+        return cache, stale
+    
+    @staticmethod
+    def request_refresh(scope: str):
+        """Queue a re-simulation of a scope (concurrent requests share one run)"""
+        from app.jobs.queue import get_recompute_queue
+        
+        get_recompute_queue().submit(
+            f"odds:{scope}",
+            lambda session, _: SimulationService.refresh_if_stale(session, scope) is not None,
+            lane="odds"
+        )
+    
+    @staticmethod
+    def refresh_if_stale(db: Session, scope: str) -> Optional[SimulationCache]:
+        """Re-simulate a scope unless its stored odds already match the current results"""
+        fingerprint = SimulationService.results_fingerprint(db)
+        
+        cache = db.query(SimulationCache).filter(SimulationCache.scope == scope).first()
+        if cache and cache.fingerprint == fingerprint and cache.runs == settings.SIMULATION_RUNS:
+            return cache
+        
+        return SimulationService.refresh_scope(db, scope, fingerprint, cache)
+    
+    @staticmethod
+    def refresh_all(db: Session, active_only: bool = True, stale_scopes=()) -> int:
+        """
+        Re-run stale simulations for the global scope and every group; returns scopes recomputed.
+        
+        Scopes are stale when results changed since their last run, or when
+        listed in stale_scopes (e.g. their standings were recalculated).
+        """
+        fingerprint = SimulationService.results_fingerprint(db)
+        
+        groups_query = db.query(Group.id)
+        if active_only:
+            groups_query = groups_query.filter(Group.is_active == True)
+        scopes = ["GLOBAL"] + [f"GROUP:{group_id}" for (group_id,) in groups_query.all()]
+        
+        fresh = {
+            scope for (scope,) in db.query(SimulationCache.scope).filter(
+                SimulationCache.fingerprint == fingerprint,
+                SimulationCache.runs == settings.SIMULATION_RUNS
+            )
+        } - set(stale_scopes)
+        
+        refreshed = 0
+        for scope in scopes:
+            if scope in fresh:
+                continue
+            if SimulationService.refresh_scope(db, scope, fingerprint):
+                refreshed += 1
+        
+        logger.info(f"Simulations refreshed for {refreshed} of {len(scopes)} scopes")
+        return refreshed
+    
+    @staticmethod
+    def refresh_scope(db: Session, scope: str, fingerprint: str,
+                      cache: Optional[SimulationCache] = None) -> Optional[SimulationCache]:
+        """Simulate a scope and store its odds"""
+        try:
+            group_id = int(scope.split(":")[1]) if scope.startswith("GROUP:") else None
+            if group_id is not None and not db.query(Group.id).filter(Group.id == group_id).first():
+                return None
+            
+            runs = settings.SIMULATION_RUNS
+            # Same inputs -> same odds, so repeated recomputes don't jitter
+            rng = np.random.default_rng(int(fingerprint[:16], 16))
+            user_ids, counts, remaining = SimulationService.simulate_scope(db, scope, group_id, runs, rng)
+            
+            if cache is None:
+                cache = db.query(SimulationCache).filter(SimulationCache.scope == scope).first()
+            if not cache:
+                cache = SimulationCache(scope=scope, group_id=group_id)
+                db.add(cache)
+            
+            cache.fingerprint = fingerprint
+            cache.runs = runs
+            cache.remaining_matches = remaining
+            cache.computed_at = datetime.now(timezone.utc)
+            
+            db.execute(delete(SimulationOdds).where(SimulationOdds.scope == scope))
+            if user_ids:
+                probabilities = counts / runs
+                db.execute(insert(SimulationOdds), [
+                    {
+                        "scope": scope,
+                        "user_id": user_id,
+                        "win_probability": float(first),
+                        "top3_probability": float(top3),
+                        "top10_probability": float(top10),
+                    }
+                    for user_id, (first, top3, top10) in zip(user_ids, probabilities.tolist())
+                ])
+            
+            db.commit()
+            
+            logger.info(f"{scope} simulated: {runs} runs, {remaining} remaining matches, {len(user_ids)} users")
+            return cache
+        
+        except Exception as e:
+            logger.error(f"Error simulating {scope}: {e}")
+            db.rollback()
+            return None
+    
+    @staticmethod
+    def simulate_scope(db: Session, scope: str, group_id: Optional[int], runs: int,
+                       rng: np.random.Generator) -> Tuple[List[int], np.ndarray, int]:
+        """
+        Load a scope's current totals and open picks and run the simulation.
+        
+        Returns (user_ids, position counts [users x TOP_POSITIONS], remaining matches).
+        """
+        current = dict(db.query(StandingsEntry.user_id, StandingsEntry.total_points).filter(
+            RankingService._published(scope)
+        ).all())
+        
+        remaining = {
+            match.id: match
+            for match in db.query(Match).filter(Match.status.in_(SimulationService.OPEN_STATUSES))
+        }
+        remaining_ids = list(remaining)
+        
+        picks_query = db.query(
+            Prediction.match_id, Prediction.user_id, Prediction.home_pred, Prediction.away_pred, Prediction.advance_team
+        ).filter(Prediction.match_id.in_(remaining_ids))
+        rules = STANDARD_RULES
+        if group_id is not None:
+            group = db.query(Group.scoring_system, Group.scoring_rules, Group.use_global_picks).filter(
+                Group.id == group_id
+            ).first()
+            rules = ScoringRules.from_group_settings(group.scoring_system, group.scoring_rules)
+            picks_query = picks_query.filter(RankingService._group_picks_filter(group_id, group.use_global_picks))
+        picks = picks_query.order_by(Prediction.match_id).all()
+        
+        user_ids = sorted(set(current) | {pick.user_id for pick in picks})
+        if not user_ids:
+            return [], np.zeros((0, len(SimulationService.TOP_POSITIONS))), len(remaining_ids)
+        
+        index = {user_id: idx for idx, user_id in enumerate(user_ids)}
+        base_points = np.array([current.get(user_id, 0) for user_id in user_ids], dtype=np.int64)
+        
+        # Parallel pick columns, cut per match
+        match_col = np.array([pick.match_id for pick in picks], dtype=np.int64)
+        user_col = np.array([index[pick.user_id] for pick in picks], dtype=np.int64)
+        home_col = np.array([pick.home_pred for pick in picks], dtype=np.int64)
+        away_col = np.array([pick.away_pred for pick in picks], dtype=np.int64)
+        advance_col = [pick.advance_team for pick in picks]
+        
+        rates = SimulationService.goal_rates(db, remaining_ids)
+        now = datetime.now(timezone.utc)
+        match_picks, match_rates, starts, sides = [], [], [], []
+        boundaries = np.flatnonzero(np.diff(match_col)) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(match_col)]):
+            if start == end:
+                continue
+            match = remaining[int(match_col[start])]
+            home_pred, away_pred = home_col[start:end], away_col[start:end]
+            match_picks.append((user_col[start:end], home_pred, away_pred))
+            
+            # A live match plays out the rest of its time from the current score
+            home_rate, away_rate = rates[match.id]
+            score = (0, 0)
+            if match.status == MatchStatus.LIVE and match.home_score is not None and match.away_score is not None:
+                score = ScoringService.counted_score(match)
+                time_left = SimulationService._time_left(match, now)
+                home_rate, away_rate = home_rate * time_left, away_rate * time_left
+            match_rates.append((home_rate, away_rate))
+            starts.append(score)
+            
+            # Knockout picks also earn the advance bonus for the side they send through
+            sides.append(
+                ScoringService.predicted_sides(match, home_pred, away_pred, advance_col[start:end])
+                if ScoringService.is_knockout(match) else None
+            )
+        
+        counts = SimulationService.simulate(base_points, match_picks, match_rates, runs, rng, rules, starts, sides)
+        return user_ids, counts, len(remaining_ids)
+    
+    @staticmethod
+    def _time_left(match: Match, now: datetime) -> float:
+        """Share of a live match still to play, by wall-clock time since kickoff"""
+        kickoff = match.kickoff_at_utc
+        if kickoff.tzinfo is None:
+            kickoff = kickoff.replace(tzinfo=timezone.utc)
+        elapsed = (now - kickoff).total_seconds() / 60
+        return min(1.0, max(0.0, 1 - elapsed / SimulationService.MATCH_MINUTES))
+    
+    @staticmethod
+    def goal_rates(db: Session, match_ids: List[int]) -> Dict[int, Tuple[float, float]]:
+        """Poisson (home, away) goal rates per match from all picks on it (summed in SQL)"""
+        totals = {match_id: (0, 0, 0) for match_id in match_ids}
+        totals.update({
+            match_id: (int(home), int(away), count)
+            for match_id, home, away, count in db.query(
+                Prediction.match_id, func.sum(Prediction.home_pred), func.sum(Prediction.away_pred), func.count(Prediction.id)
+            ).filter(
+                Prediction.match_id.in_(match_ids)
+            ).group_by(Prediction.match_id)
+        })
+        
+        return {
+            match_id: (SimulationService.shrunk_rate(home, count), SimulationService.shrunk_rate(away, count))
+            for match_id, (home, away, count) in totals.items()
+        }
+    
+    @staticmethod
+    def shrunk_rate(goals: int, picks: int) -> float:
+        """Goal rate from the goals picked across `picks` predictions, shrunk towards PRIOR_GOALS"""
+        prior = SimulationService.PRIOR_GOALS * SimulationService.PRIOR_WEIGHT
+        return (goals + prior) / (picks + SimulationService.PRIOR_WEIGHT)
+    
+    @staticmethod
+    def simulate(base_points: np.ndarray, match_picks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                 rates: List[Tuple[float, float]], runs: int, rng: np.random.Generator,
+                 rules: ScoringRules = STANDARD_RULES, starts: Optional[List[Tuple[int, int]]] = None,
+                 sides: Optional[List[Optional[np.ndarray]]] = None) -> np.ndarray:
+        """
+        Run `runs` simulated tournaments and count finishing positions.
+        
+        match_picks holds (user_index, home_pred, away_pred) arrays per
+        remaining match and rates its Poisson goal rates, added to the
+        match's starts score (live matches). For knockout matches sides
+        holds the side each pick sends through: it earns the rules' advance
+        bonus when that side goes through (on a draw, either side at even odds).
+        Final totals are a users x simulations matrix built in chunks that
+        fit CELL_BUDGET; each match is scored once per distinct pick with
+        the rules' lookup table. Returns how often each user finished at or
+        above each of TOP_POSITIONS (tied users share the better position).
+        """
+        n_users = len(base_points)
+        counts = np.zeros((n_users, len(SimulationService.TOP_POSITIONS)), dtype=np.int64)
+        chunk = max(1, min(runs, SimulationService.CELL_BUDGET // max(n_users, 1)))
+        
+        starts = starts or [(0, 0)] * len(match_picks)
+        sides = sides or [None] * len(match_picks)
+        
+        # Distinct picks (and advancing sides) per match, scored against each sampled score
+        compiled = []
+        for (user_idx, home_pred, away_pred), pick_sides in zip(match_picks, sides):
+            columns = [home_pred, away_pred] if pick_sides is None else [home_pred, away_pred, pick_sides]
+            distinct, pick_idx = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+            compiled.append((user_idx, distinct, pick_idx.ravel(), len(np.unique(user_idx)) == len(user_idx)))
+        
+        for start in range(0, runs, chunk):
+            size = min(chunk, runs - start)
+            totals = np.repeat(base_points.astype(np.int32)[:, None], size, axis=1)
+            
+            for (user_idx, distinct, pick_idx, unique_users), (home_rate, away_rate), (home_start, away_start) in zip(
+                compiled, rates, starts
+            ):
+                home_score = home_start + rng.poisson(home_rate, size)
+                away_score = away_start + rng.poisson(away_rate, size)
+                table = rules.points(
+                    distinct[:, 0, None], distinct[:, 1, None], home_score[None, :], away_score[None, :]
+                ).astype(np.int32)
+                if distinct.shape[1] == 3:
+                    advancing = np.where(
+                        home_score > away_score, ScoringService.ADVANCE_HOME,
+                        np.where(home_score < away_score, ScoringService.ADVANCE_AWAY, rng.integers(0, 2, size))
+                    )
+                    table += (distinct[:, 2, None] == advancing[None, :]) * np.int32(rules.advance)
+                if unique_users:
+                    totals[user_idx] += table[pick_idx]
+                else:
+                    # Several picks per user (global scope sums group picks too)
+                    np.add.at(totals, user_idx, table[pick_idx])
+            
+            counts += SimulationService._finish_counts(totals)
+        
+        return counts
+    
+    @staticmethod
+    def _finish_counts(totals: np.ndarray) -> np.ndarray:
+        """
+        Count per user the simulations (columns) finished at or above each of TOP_POSITIONS.
+        
+        A user finishes at or above position k when their total reaches the
+        k-th highest total of that simulation, so tied users share the
+        better position and one partial sort replaces a full ranking.
+        """
+        n_users = totals.shape[0]
+        kth = [min(top, n_users) - 1 for top in SimulationService.TOP_POSITIONS]
+        descending = -np.partition(-totals, kth, axis=0)
+        return np.stack([(totals >= descending[k]).sum(axis=1) for k in kth], axis=1)
+    
+    @staticmethod
+    def get_odds_page(db: Session, scope: str, limit: int = 100) -> Optional[Dict]:
+        """Get the users most likely to win a scope"""
+        cache, stale = SimulationService.cached(db, scope)
+        if not cache:
+            return None
+        
+        rows = db.query(SimulationOdds, User.name, User.avatar_url).join(
+            User, User.id == SimulationOdds.user_id
+        ).filter(SimulationOdds.scope == scope).order_by(
+            SimulationOdds.win_probability.desc(),
+            SimulationOdds.top3_probability.desc(),
+            SimulationOdds.top10_probability.desc(),
+            SimulationOdds.user_id
+        ).limit(limit).all()
+        
+        return {
+            **SimulationService._header(cache, stale),
+            "odds": [
+                {"name": name, "avatar_url": avatar_url, **SimulationService._odds_row(odds)}
+                for odds, name, avatar_url in rows
+            ],
+        }
+    
+    @staticmethod
+    def get_user_odds(db: Session, scope: str, user_id: int) -> Optional[Dict]:
+        """Get one user's chance of winning / finishing top 3 / top 10 in a scope"""
+        cache, stale = SimulationService.cached(db, scope)
+        if not cache:
+            return None
+        
+        odds = db.query(SimulationOdds).filter(
+            SimulationOdds.scope == scope,
+            SimulationOdds.user_id == user_id
+        ).first()
+        if not odds:
+            return None
+        
+        return {**SimulationService._header(cache, stale), **SimulationService._odds_row(odds)}
+    
+    @staticmethod
+    def _header(cache: SimulationCache, stale: bool = False) -> Dict:
+        return {
+            "scope": cache.scope,
+            "runs": cache.runs,
+            "remaining_matches": cache.remaining_matches,
+            "computed_at": cache.computed_at,
+            # Results changed since computed_at - a refresh is queued
+            "stale": stale,
+        }
+    
+    @staticmethod
+    def _odds_row(odds: SimulationOdds) -> Dict:
+        return {
+            "user_id": odds.user_id,
+            "win_probability": odds.win_probability,
+            "top3_probability": odds.top3_probability,
+            "top10_probability": odds.top10_probability,
+        }
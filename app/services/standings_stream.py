@@ -0,0 +1,270 @@
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, aliased
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from app.config import settings
+from app.db import SessionLocal
+from app.models import StandingsCache, StandingsEntry, User
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Row fields a client table shows; a row is resent when any of them moves
+DIFF_FIELDS = ("rank", "total_points", "exact_matches", "correct_results", "goal_error", "live_points", "provisional_rank")
+
+class StandingsStreamService:
+    """
+    Standings diffs and snapshots for streaming clients.
+    
+    A client's position is the scope's change_seq, bumped by every
+    published version and by every in-place live update of the published
+    rows (which stamp their live_seq).
+    """
+    
+    @staticmethod
+    def diff(db: Session, scope: str, from_version: int, from_seq: int, to_version: int, to_seq: int) -> Optional[Dict]:
+        """
+        Rows of a scope that changed between two positions.
+        
+        Within one version these are the rows live-updated after from_seq.
+        Across versions both must still be stored (publishing keeps the
+        one it replaces): new rows, rows where a DIFF_FIELDS column moved
+        and rows live-updated in the old version after from_seq are
+        returned in full, dropped users as ids - all from two outer joins,
+        so unchanged rows never leave the database. None if from_version
+        is gone (the client needs a snapshot).
+        """
+        from app.services.ranking import RankingService
+        
+        if not db.query(StandingsEntry.id).filter(
+            StandingsEntry.scope == scope, StandingsEntry.version == from_version
+        ).first():
+            return None
+        
+        old = aliased(StandingsEntry)
+        new = aliased(StandingsEntry)
+        if from_version == to_version:
+            moved = new.live_seq > from_seq
+        else:
+            moved = or_(
+                old.id.is_(None), old.live_seq > from_seq,
+                *[getattr(new, field).is_distinct_from(getattr(old, field)) for field in DIFF_FIELDS]
+            )
+        rows = db.query(new, User.name, User.avatar_url).join(
+            User, User.id == new.user_id
+        ).outerjoin(
+            old, and_(old.scope == scope, old.version == from_version, old.user_id == new.user_id)
+        ).filter(
+            new.scope == scope, new.version == to_version, moved
+        ).order_by(new.rank, new.user_id).all()
+        
+        removed = [] if from_version == to_version else db.execute(select(old.user_id).outerjoin(
+            new, and_(new.scope == scope, new.version == to_version, new.user_id == old.user_id)
+        ).where(
+            old.scope == scope, old.version == from_version, new.id.is_(None)
+        ).order_by(old.user_id)).scalars().all()
+        
+        return {
+            "scope": scope,
+            "from_version": from_version,
+            "from_seq": from_seq,
+            "version": to_version,
+            "seq": to_seq,
+            "changed": [RankingService._entry_row(*row) for row in rows],
+            "removed": list(removed),
+            "total_users": db.query(StandingsEntry).filter(
+                StandingsEntry.scope == scope, StandingsEntry.version == to_version
+            ).count(),
+        }
+    
+    @staticmethod
+    def snapshot(db: Session, scope: str) -> Optional[Dict]:
+        """A scope's whole published standings table with its version and seq (for (re)syncing clients)"""
+        from app.services.ranking import RankingService
+        
+        cache = db.query(StandingsCache).filter(StandingsCache.scope == scope).first()
+        if not cache or not cache.version:
+            return None
+        
+        rows = db.query(StandingsEntry, User.name, User.avatar_url).join(
+            User, User.id == StandingsEntry.user_id
+        ).filter(
+            StandingsEntry.scope == scope,
+            StandingsEntry.version == cache.version
+        ).order_by(StandingsEntry.rank, StandingsEntry.user_id).all()
+        
+        return {
+            "scope": scope,
+            "version": cache.version,
+            "seq": cache.change_seq,
+            "computed_at": cache.computed_at,
+            "standings": [RankingService._entry_row(*row) for row in rows],
+            "total_users": len(rows),
+        }
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> str:
+    """One server-sent event frame"""
+    frame = f"id: {event_id}\n" if event_id is not None else ""
+    return frame + f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), separators=(',', ':'))}\n\n"
+
+class ScopeFeed:
+    """The latest position (published version and change seq) of one scope plus its recent diffs"""
+    
+    def __init__(self, scope: str, backlog: int):
+        self.scope = scope
+        self.version = 0
+        self.seq = 0
+        self.diffs = deque(maxlen=backlog)
+        self.snapshot: Optional[Dict] = None
+        self.polled_at = 0.0
+        self.lock = asyncio.Lock()
+    
+    def refresh(self, db: Session):
+        """Pick up a new version or live update, diffing it against the last position seen"""
+        version, seq = db.query(StandingsCache.version, StandingsCache.change_seq).filter(
+            StandingsCache.scope == self.scope
+        ).first() or (0, 0)
+        if seq == self.seq:
+            return
+        
+        diff = None
+        if self.seq and version:
+            diff = StandingsStreamService.diff(db, self.scope, self.version, self.seq, version, seq)
+        if diff is None:
+            # The chain is broken (first position seen, or the last version is gone)
+            self.diffs.clear()
+        else:
+            self.diffs.append(diff)
+        self.version = version
+        self.seq = seq
+        self.snapshot = None
+    
+    def diffs_since(self, seq: int) -> Optional[List[Dict]]:
+        """Diffs taking a client from `seq` to the current position, or None if they're not all kept"""
+        chain = [diff for diff in self.diffs if diff["seq"] > seq]
+        if not chain or chain[0]["from_seq"] != seq:
+            return None
+        return chain
+
+class StandingsBroadcaster:
+    """
+    Per-process fan-out of standings changes to streaming clients.
+    
+    Each scope is polled at most once per poll_seconds however many
+    clients follow it (one tiny position query). A new version or live
+    update is diffed once and the same diff is sent to every client;
+    clients that fell behind replay the kept diffs, and only those further
+    behind (or reconnecting with an unknown position) get a snapshot -
+    itself built once per position.
+    """
+    
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal, poll_seconds: Optional[float] = None,
+                 backlog: Optional[int] = None, keepalive_seconds: Optional[float] = None):
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds if poll_seconds is not None else settings.STANDINGS_STREAM_POLL_SECONDS
+        self.backlog = backlog if backlog is not None else settings.STANDINGS_STREAM_BACKLOG
+        self.keepalive_seconds = keepalive_seconds if keepalive_seconds is not None else settings.STANDINGS_STREAM_KEEPALIVE_SECONDS
+        self._feeds: Dict[str, ScopeFeed] = {}
+    
+    def feed(self, scope: str) -> ScopeFeed:
+        if scope not in self._feeds:
+            self._feeds[scope] = ScopeFeed(scope, self.backlog)
+        return self._feeds[scope]
+    
+    async def poll(self, scope: str) -> ScopeFeed:
+        """Refresh a scope's feed unless another client did so within poll_seconds"""
+        feed = self.feed(scope)
+        async with feed.lock:
+            if time.monotonic() - feed.polled_at >= self.poll_seconds:
+                await asyncio.to_thread(self._with_session, feed.refresh)
+                feed.polled_at = time.monotonic()
+        return feed
+    
+    async def catch_up(self, scope: str, seq: int) -> Tuple[int, List[str]]:
+        """(new seq, events) bringing a client at `seq` to the scope's current position"""
+        feed = await self.poll(scope)
+        if feed.seq == seq or not feed.version:
+            return seq, []
+        
+        diffs = feed.diffs_since(seq) if seq else None
+        if diffs is not None:
+            return diffs[-1]["seq"], [format_event("diff", diff, diff["seq"]) for diff in diffs]
+        
+        async with feed.lock:
+            if feed.snapshot is None or feed.snapshot["seq"] != feed.seq:
+                feed.snapshot = await asyncio.to_thread(self._with_session, lambda db: StandingsStreamService.snapshot(db, scope))
+            snapshot = feed.snapshot
+        if snapshot is None:
+            return seq, []
+        return snapshot["seq"], [format_event("snapshot", snapshot, snapshot["seq"])]
+    
+    async def subscribe(self, scope: str, last_seq: int = 0,
+                        is_disconnected: Optional[Callable] = None) -> AsyncIterator[str]:
+        """
+        Server-sent events for one client of a scope.
+        
+        Starts with a snapshot (or the diffs since last_seq when the
+        client reconnects with one that's still covered), then sends a
+        diff per published version or live update; a comment line keeps
+        idle connections open.
+        """
+        seq = last_seq
+        idle_since = time.monotonic()
+        while not (is_disconnected and await is_disconnected()):
+            try:
+                seq, events = await self.catch_up(scope, seq)
+            except Exception as e:
+                logger.error(f"Error streaming {scope} standings: {e}")
+                events = []
+            
+            for event in events:
+                yield event
+            if events:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= self.keepalive_seconds:
+                yield ": keepalive\n\n"
+                idle_since = time.monotonic()
+            
+            await asyncio.sleep(self.poll_seconds)
+    
+    def _with_session(self, work: Callable[[Session], object]):
+        db = self.session_factory()
+        try:
+            return work(db)
+        finally:
+            db.close()
+
+_broadcaster: Optional[StandingsBroadcaster] = None
+
+def get_standings_broadcaster() -> StandingsBroadcaster:
+    """Get the process-wide standings broadcaster"""
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = StandingsBroadcaster()
+    return _broadcaster
+
+def standings_event_response(request: Request, scope: str, last_seq: Optional[int] = None) -> StreamingResponse:
+    """
+    text/event-stream response following a scope's standings.
+    
+    A reconnecting EventSource sends its last event id (the seq it
+    holds) as Last-Event-ID; last_seq does the same for clients that
+    restore a cached table.
+    """
+    if last_seq is None:
+        try:
+            last_seq = int(request.headers.get("last-event-id", 0))
+        except ValueError:
+            last_seq = 0
+    
+    return StreamingResponse(
+        get_standings_broadcaster().subscribe(scope, last_seq, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
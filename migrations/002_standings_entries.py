@@ -0,0 +1,98 @@
+"""Normalized standings rows
+
+Revision ID: 002_standings_entries
+Revises: 001_initial
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+revision = '002_standings_entries'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Create standings_entries table (one row per scope and user)
+    op.create_table('standings_entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(50), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('total_points', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('exact_matches', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('correct_results', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('scope', 'user_id', name='uq_standings_entry_scope_user'),
+        sa.Index('idx_standings_entries_scope_rank', 'scope', 'rank', 'user_id'),
+    )
+    
+    # Copy the cached JSON standings into rows, so reads don't come up empty until the next recalculation
+    bind = op.get_bind()
+    user_ids = {user_id for (user_id,) in bind.execute(sa.text("SELECT id FROM users"))}
+    rows = []
+    for scope, group_id, data in bind.execute(sa.text("SELECT scope, group_id, standings_data FROM standings_cache")):
+        if isinstance(data, str):
+            data = json.loads(data)
+        seen = set()
+        for entry in data or []:
+            user_id = entry.get("user_id")
+            if user_id not in user_ids or user_id in seen:
+                continue
+            seen.add(user_id)
+            rows.append({
+                "scope": scope,
+                "group_id": group_id,
+                "user_id": user_id,
+                "rank": entry.get("rank") or 0,
+                "total_points": entry.get("total_points", entry.get("points", 0)),
+                "exact_matches": entry.get("exact_matches", 0),
+                "correct_results": entry.get("correct_results", 0),
+            })
+    if rows:
+        op.bulk_insert(_entries_table(), rows)
+    
+    # The JSON blob is no longer written
+    op.alter_column('standings_cache', 'standings_data', nullable=True)
+
+def downgrade() -> None:
+    # Rebuild the blobs from the rows
+    bind = op.get_bind()
+    blobs = {}
+    for scope, user_id, name, rank, total_points, exact_matches, correct_results in bind.execute(sa.text(
+        "SELECT e.scope, e.user_id, u.name, e.rank, e.total_points, e.exact_matches, e.correct_results "
+        "FROM standings_entries e JOIN users u ON u.id = e.user_id ORDER BY e.scope, e.rank, e.user_id"
+    )):
+        blobs.setdefault(scope, []).append({
+            "user_id": user_id,
+            "name": name,
+            "total_points": total_points,
+            "exact_matches": exact_matches,
+            "correct_results": correct_results,
+            "rank": rank,
+        })
+    for scope, standings in blobs.items():
+        bind.execute(
+            sa.text("UPDATE standings_cache SET standings_data = :data WHERE scope = :scope"),
+            {"data": json.dumps(standings), "scope": scope}
+        )
+    
+    op.execute("UPDATE standings_cache SET standings_data = '[]' WHERE standings_data IS NULL")
+    op.alter_column('standings_cache', 'standings_data', nullable=False)
+    op.drop_table('standings_entries')
+
+def _entries_table():
+    return sa.table('standings_entries',
+        sa.column('scope', sa.String),
+        sa.column('group_id', sa.Integer),
+        sa.column('user_id', sa.Integer),
+        sa.column('rank', sa.Integer),
+        sa.column('total_points', sa.Integer),
+        sa.column('exact_matches', sa.Integer),
+        sa.column('correct_results', sa.Integer),
+    )
@@ -0,0 +1,34 @@
+"""Standings snapshots per finished match
+
+Revision ID: 003_standings_snapshots
+Revises: 002_standings_entries
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '003_standings_snapshots'
+down_revision = '002_standings_entries'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Create standings_snapshots table (append-only rank history)
+    op.create_table('standings_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(50), nullable=False),
+        sa.Column('as_of_match', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.Integer(), nullable=False),
+        sa.Column('total_points', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('scope', 'as_of_match', 'user_id', name='uq_standings_snapshot'),
+        sa.Index('idx_standings_snapshots_user', 'scope', 'user_id', 'as_of_match'),
+        sa.Index('idx_standings_snapshots_rank', 'scope', 'as_of_match', 'rank'),
+    )
+
+def downgrade() -> None:
+    op.drop_table('standings_snapshots')
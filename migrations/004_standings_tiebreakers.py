@@ -0,0 +1,27 @@
+"""Full tiebreaker chain on standings rows
+
+Revision ID: 004_standings_tiebreakers
+Revises: 003_standings_snapshots
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '004_standings_tiebreakers'
+down_revision = '003_standings_snapshots'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Tiebreak inputs and the precomputed composite sort key
+    op.add_column('standings_entries', sa.Column('goal_error', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('standings_entries', sa.Column('first_prediction_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('standings_entries', sa.Column('sort_key', sa.String(40), nullable=False, server_default=''))
+    op.create_index('idx_standings_entries_scope_sort_key', 'standings_entries', ['scope', 'sort_key'])
+
+def downgrade() -> None:
+    op.drop_index('idx_standings_entries_scope_sort_key', table_name='standings_entries')
+    op.drop_column('standings_entries', 'sort_key')
+    op.drop_column('standings_entries', 'first_prediction_at')
+    op.drop_column('standings_entries', 'goal_error')
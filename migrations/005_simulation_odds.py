@@ -0,0 +1,47 @@
+"""Monte Carlo standings odds
+
+Revision ID: 005_simulation_odds
+Revises: 004_standings_tiebreakers
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '005_simulation_odds'
+down_revision = '004_standings_tiebreakers'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Create simulation_cache table (one header per scope)
+    op.create_table('simulation_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(50), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('fingerprint', sa.String(64), nullable=False),
+        sa.Column('runs', sa.Integer(), nullable=False),
+        sa.Column('remaining_matches', sa.Integer(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('scope'),
+    )
+    
+    # Create simulation_odds table (one row per scope and user)
+    op.create_table('simulation_odds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(50), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('win_probability', sa.Float(), nullable=False),
+        sa.Column('top3_probability', sa.Float(), nullable=False),
+        sa.Column('top10_probability', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('scope', 'user_id', name='uq_simulation_odds_scope_user'),
+        sa.Index('idx_simulation_odds_scope_win', 'scope', 'win_probability'),
+    )
+
+def downgrade() -> None:
+    op.drop_table('simulation_odds')
+    op.drop_table('simulation_cache')
@@ -0,0 +1,29 @@
+"""Live provisional standings
+
+Revision ID: 006_provisional_standings
+Revises: 005_simulation_odds
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '006_provisional_standings'
+down_revision = '005_simulation_odds'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Provisional points per prediction (against the live score)
+    op.add_column('predictions', sa.Column('live_points', sa.Integer(), nullable=False, server_default='0'))
+    
+    # Provisional totals and ranks next to the official ones
+    op.add_column('standings_entries', sa.Column('live_points', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('standings_entries', sa.Column('provisional_rank', sa.Integer(), nullable=True))
+    op.create_index('idx_standings_entries_scope_provisional', 'standings_entries', ['scope', 'provisional_rank', 'user_id'])
+
+def downgrade() -> None:
+    op.drop_index('idx_standings_entries_scope_provisional', table_name='standings_entries')
+    op.drop_column('standings_entries', 'provisional_rank')
+    op.drop_column('standings_entries', 'live_points')
+    op.drop_column('predictions', 'live_points')
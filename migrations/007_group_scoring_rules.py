@@ -0,0 +1,21 @@
+"""Per-group scoring rules
+
+Revision ID: 007_group_scoring_rules
+Revises: 006_provisional_standings
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '007_group_scoring_rules'
+down_revision = '006_provisional_standings'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Point values for groups on the custom scoring system
+    op.add_column('groups', sa.Column('scoring_rules', sa.JSON(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('groups', 'scoring_rules')
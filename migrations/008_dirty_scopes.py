@@ -0,0 +1,32 @@
+"""Dirty ranking scopes
+
+Revision ID: 008_dirty_scopes
+Revises: 007_group_scoring_rules
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '008_dirty_scopes'
+down_revision = '007_group_scoring_rules'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Create ranking_dirty_scopes table (scopes waiting for the recompute job)
+    op.create_table('ranking_dirty_scopes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('scope', sa.String(50), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=True),
+        sa.Column('reason', sa.String(50), nullable=False),
+        sa.Column('marked_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('scope'),
+    )
+    op.create_index('ix_ranking_dirty_scopes_marked_at', 'ranking_dirty_scopes', ['marked_at'])
+
+def downgrade() -> None:
+    op.drop_index('ix_ranking_dirty_scopes_marked_at', table_name='ranking_dirty_scopes')
+    op.drop_table('ranking_dirty_scopes')
@@ -0,0 +1,65 @@
+"""Versioned standings entries
+
+Revision ID: 009_versioned_standings
+Revises: 008_dirty_scopes
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '009_versioned_standings'
+down_revision = '008_dirty_scopes'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Published version per scope and its allocator
+    op.add_column('standings_cache', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('standings_cache', sa.Column('next_version', sa.Integer(), nullable=False, server_default='0'))
+    
+    # Existing rows become version 1 of their scope; scopes without rows stay unpublished
+    op.add_column('standings_entries', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.execute(
+        "UPDATE standings_cache SET version = 1, next_version = 1 "
+        "WHERE scope IN (SELECT DISTINCT scope FROM standings_entries)"
+    )
+    
+    # Queue every cached scope so the first dirty run publishes it with the full tiebreakers
+    op.execute(
+        "INSERT INTO ranking_dirty_scopes (scope, group_id, reason, marked_at) "
+        "SELECT scope, group_id, 'migration', CURRENT_TIMESTAMP FROM standings_cache "
+        "WHERE scope NOT IN (SELECT scope FROM ranking_dirty_scopes)"
+    )
+    
+    op.drop_constraint('uq_standings_entry_scope_user', 'standings_entries', type_='unique')
+    op.create_unique_constraint('uq_standings_entry_scope_version_user', 'standings_entries', ['scope', 'version', 'user_id'])
+    
+    for name, columns in (
+        ('idx_standings_entries_scope_rank', ['scope', 'version', 'rank', 'user_id']),
+        ('idx_standings_entries_scope_sort_key', ['scope', 'version', 'sort_key']),
+        ('idx_standings_entries_scope_provisional', ['scope', 'version', 'provisional_rank', 'user_id']),
+    ):
+        op.drop_index(name, table_name='standings_entries')
+        op.create_index(name, 'standings_entries', columns)
+
+def downgrade() -> None:
+    # Keep only the published version of each scope
+    op.execute(
+        "DELETE FROM standings_entries WHERE version <> "
+        "(SELECT version FROM standings_cache WHERE standings_cache.scope = standings_entries.scope)"
+    )
+    
+    for name, columns in (
+        ('idx_standings_entries_scope_rank', ['scope', 'rank', 'user_id']),
+        ('idx_standings_entries_scope_sort_key', ['scope', 'sort_key']),
+        ('idx_standings_entries_scope_provisional', ['scope', 'provisional_rank', 'user_id']),
+    ):
+        op.drop_index(name, table_name='standings_entries')
+        op.create_index(name, 'standings_entries', columns)
+    
+    op.drop_constraint('uq_standings_entry_scope_version_user', 'standings_entries', type_='unique')
+    op.create_unique_constraint('uq_standings_entry_scope_user', 'standings_entries', ['scope', 'user_id'])
+    op.drop_column('standings_entries', 'version')
+    op.drop_column('standings_cache', 'next_version')
+    op.drop_column('standings_cache', 'version')
@@ -0,0 +1,21 @@
+"""Groups ranked on members' global picks
+
+Revision ID: 010_group_global_picks
+Revises: 009_versioned_standings
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '010_group_global_picks'
+down_revision = '009_versioned_standings'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Existing groups keep ranking their own predictions only
+    op.add_column('groups', sa.Column('use_global_picks', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+def downgrade() -> None:
+    op.drop_column('groups', 'use_global_picks')
@@ -0,0 +1,25 @@
+"""Per-stage points on standings entries
+
+Revision ID: 011_standings_stage_points
+Revises: 010_group_global_picks
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '011_standings_stage_points'
+down_revision = '010_group_global_picks'
+branch_labels = None
+depends_on = None
+
+STAGE_COLUMNS = ('points_group', 'points_r32', 'points_r16', 'points_qf', 'points_sf', 'points_final')
+
+def upgrade() -> None:
+    # Filled by the next ranking recalculation
+    for column in STAGE_COLUMNS:
+        op.add_column('standings_entries', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade() -> None:
+    for column in reversed(STAGE_COLUMNS):
+        op.drop_column('standings_entries', column)
@@ -0,0 +1,39 @@
+"""Pairwise head-to-head records per group
+
+Revision ID: 012_head_to_head
+Revises: 011_standings_stage_points
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '012_head_to_head'
+down_revision = '011_standings_stage_points'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Filled by the next group ranking recalculation
+    op.create_table('head_to_head',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('opponent_id', sa.Integer(), nullable=False),
+        sa.Column('wins', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('losses', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('draws', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['opponent_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('group_id', 'user_id', 'opponent_id', name='uq_head_to_head_pair'),
+    )
+    op.create_index('ix_head_to_head_id', 'head_to_head', ['id'])
+    op.create_index('idx_head_to_head_group_opponent', 'head_to_head', ['group_id', 'opponent_id'])
+
+def downgrade() -> None:
+    op.drop_index('idx_head_to_head_group_opponent', table_name='head_to_head')
+    op.drop_index('ix_head_to_head_id', table_name='head_to_head')
+    op.drop_table('head_to_head')
@@ -0,0 +1,41 @@
+"""Resumable rescoring jobs
+
+Revision ID: 013_rescore_jobs
+Revises: 012_head_to_head
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '013_rescore_jobs'
+down_revision = '012_head_to_head'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table('rescore_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('match_ids', sa.JSON(), nullable=True),
+        sa.Column('requested_by', sa.Integer(), nullable=True),
+        sa.Column('last_prediction_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('changed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('run_started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('run_start_processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['requested_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_rescore_jobs_id', 'rescore_jobs', ['id'])
+    op.create_index('ix_rescore_jobs_status', 'rescore_jobs', ['status'])
+
+def downgrade() -> None:
+    op.drop_index('ix_rescore_jobs_status', table_name='rescore_jobs')
+    op.drop_index('ix_rescore_jobs_id', table_name='rescore_jobs')
+    op.drop_table('rescore_jobs')
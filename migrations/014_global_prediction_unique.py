@@ -0,0 +1,28 @@
+"""Unique global predictions
+
+Revision ID: 014_global_prediction_unique
+Revises: 013_rescore_jobs
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '014_global_prediction_unique'
+down_revision = '013_rescore_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # uq_user_match_group_pred treats NULL group_ids as distinct: drop duplicate global picks, keeping the newest
+    op.execute(
+        "DELETE FROM predictions WHERE group_id IS NULL AND id NOT IN ("
+        "SELECT MAX(id) FROM predictions WHERE group_id IS NULL GROUP BY user_id, match_id)"
+    )
+    op.create_index(
+        'uq_user_match_global_pred', 'predictions', ['user_id', 'match_id'], unique=True,
+        postgresql_where=sa.text('group_id IS NULL'), sqlite_where=sa.text('group_id IS NULL')
+    )
+
+def downgrade() -> None:
+    op.drop_index('uq_user_match_global_pred', table_name='predictions')
@@ -0,0 +1,21 @@
+"""Live score details per prediction
+
+Revision ID: 015_prediction_live_details
+Revises: 014_global_prediction_unique
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '015_prediction_live_details'
+down_revision = '014_global_prediction_unique'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Outcome flags against the live score - each scope derives its own live points from them
+    op.add_column('predictions', sa.Column('live_details', sa.JSON(), nullable=True))
+
+def downgrade() -> None:
+    op.drop_column('predictions', 'live_details')
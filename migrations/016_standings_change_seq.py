@@ -0,0 +1,26 @@
+"""Standings change sequence for streaming live updates
+
+Revision ID: 016_standings_change_seq
+Revises: 015_prediction_live_details
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '016_standings_change_seq'
+down_revision = '015_prediction_live_details'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Bumped on every publish and in-place live update; starts at the published version
+    op.add_column('standings_cache', sa.Column('change_seq', sa.Integer(), nullable=False, server_default='0'))
+    op.execute("UPDATE standings_cache SET change_seq = version")
+    
+    # Rows changed in place by live updates carry the change_seq that touched them
+    op.add_column('standings_entries', sa.Column('live_seq', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade() -> None:
+    op.drop_column('standings_entries', 'live_seq')
+    op.drop_column('standings_cache', 'change_seq')
@@ -168,6 +168,1799 @@ def test_scoring_no_points():
     
     assert points == 0
 
+def test_scoring_batch_matches_scalar():
+    """Test vectorized scoring is identical to calculate_points"""
+    import itertools
+    
+    grid = list(itertools.product(range(6), repeat=2))
+    home_pred = [h for h, _ in grid]
+    away_pred = [a for _, a in grid]
+    
+    for home_score, away_score in grid:
+        match = Match(id=1, home_score=home_score, away_score=away_score, status=MatchStatus.FINISHED)
+        points, exact, result, balance = ScoringService.calculate_points_batch(
+            home_pred, away_pred, home_score, away_score
+        )
+        
+        for idx, (h, a) in enumerate(grid):
+            expected_points, details = ScoringService.calculate_points(
+                Prediction(user_id=1, match_id=1, home_pred=h, away_pred=a), match
+            )
+            assert points[idx] == expected_points
+            assert exact[idx] == details["exact"]
+            assert result[idx] == details["result"]
+            assert balance[idx] == details["balance"]
+
+def test_knockout_scoring(monkeypatch):
+    """Test knockout scoring (extra time, penalties, advancing team) across scalar, batch and ranking paths"""
+    import itertools
+    from app.config import settings
+    from app.services.ranking import RankingService
+    
+    # 1-1 after extra time, home side through on penalties
+    shootout_result = dict(stage=MatchStage.ROUND_16, home_team="Team A", away_team="Team B",
+                           home_team_code="TMA", away_team_code="TMB", home_score=1, away_score=1,
+                           home_score_et=1, away_score_et=1, home_score_pen=4, away_score_pen=3,
+                           status=MatchStatus.FINISHED)
+    shootout = Match(id=1, **shootout_result)
+    cases = [((1, 1, "Team A"), 7), ((1, 1, None), 5), ((2, 1, None), 2), ((0, 1, "TMA"), 2), ((0, 1, None), 0)]
+    for (h, a, team), expected in cases:
+        pred = Prediction(user_id=1, match_id=1, home_pred=h, away_pred=a, advance_team=team)
+        assert ScoringService.calculate_points(pred, shootout)[0] == expected
+    
+    # 1-1 after 90 minutes, 2-1 after extra time
+    extra_time_result = dict(stage=MatchStage.QUARTER_FINAL, home_team="Team A", away_team="Team B",
+                             home_score=1, away_score=1, home_score_et=2, away_score_et=1,
+                             status=MatchStatus.FINISHED)
+    extra_time = Match(id=2, **extra_time_result)
+    grid = list(itertools.product(range(4), range(4), [None, "Team A", "Team B"]))
+    for match in (shootout, extra_time):
+        points, exact, result, balance, advance, _ = ScoringService.score_match_batch(
+            match, [g[0] for g in grid], [g[1] for g in grid], [g[2] for g in grid]
+        )
+        for idx, (h, a, team) in enumerate(grid):
+            expected, details = ScoringService.calculate_points(
+                Prediction(user_id=1, match_id=match.id, home_pred=h, away_pred=a, advance_team=team), match
+            )
+            assert points[idx] == expected
+            assert advance[idx] == details["advance"]
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"KO {i}", email=f"ko{i}@example.com", provider="email") for i in range(3)]
+    db.add_all(users)
+    matches = [
+        Match(fifa_match_code=f"KO00{i}", match_order=i, kickoff_at_utc=datetime.now(timezone.utc), **result)
+        for i, result in enumerate([shootout_result, extra_time_result])
+    ]
+    db.add_all(matches)
+    db.commit()
+    picks = [(1, 1, "Team A"), (2, 1, None), (1, 1, "Team B")]
+    for user, (h, a, team) in zip(users, picks):
+        for match in matches:
+            db.add(Prediction(user_id=user.id, match_id=match.id, home_pred=h, away_pred=a, advance_team=team))
+    db.commit()
+    
+    def totals():
+        db.expire_all()
+        return [e["total_points"] for e in sorted(RankingService._load_entries(db, "GLOBAL"), key=lambda e: e["user_id"])]
+    
+    RankingService.recalculate_global_ranking(db)
+    python_totals = totals()
+    for match in matches:
+        RankingService.apply_match_result(db, match.id)
+    incremental = totals()
+    monkeypatch.setattr(settings, "RANKING_MODE", "sql")
+    RankingService.recalculate_global_ranking(db)
+    sql_totals = totals()
+    db.close()
+    
+    # 7 + 2 (right side through), 2 + 7, 5 + 0
+    assert python_totals == incremental == sql_totals == [9, 9, 5]
+
+def _seed_two_matches(db):
+    """Three users picking both of two matches: the first finished 1-0, the second still to play"""
+    users = [
+        User(name=f"User {i}", email=f"user{i}@example.com", provider="email")
+        for i in range(3)
+    ]
+    db.add_all(users)
+    matches = [
+        Match(
+            fifa_match_code=f"INC00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+            status=MatchStatus.FINISHED if i == 0 else MatchStatus.SCHEDULED,
+            home_score=1 if i == 0 else None,
+            away_score=0 if i == 0 else None,
+        )
+        for i in range(2)
+    ]
+    db.add_all(matches)
+    db.commit()
+    
+    picks = [(2, 1), (1, 0), (0, 0)]
+    for user, (home, away) in zip(users, picks):
+        for match in matches:
+            db.add(Prediction(user_id=user.id, match_id=match.id, home_pred=home, away_pred=away))
+    db.commit()
+    return users, matches
+
+def _finish_match(db, match, home_score, away_score):
+    """Set a match's final score and apply it incrementally"""
+    from app.services.ranking import RankingService
+    
+    match.status = MatchStatus.FINISHED
+    match.home_score = home_score
+    match.away_score = away_score
+    db.commit()
+    assert RankingService.apply_match_result(db, match.id)
+
+def test_apply_match_result_incremental():
+    """Test incremental ranking update matches a full recalculation"""
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users, matches = _seed_two_matches(db)
+    RankingService.recalculate_global_ranking(db)
+    
+    # Second match finishes, then gets corrected
+    _finish_match(db, matches[1], 0, 0)
+    _finish_match(db, matches[1], 2, 1)
+    db.expire_all()
+    incremental = RankingService._load_entries(db, "GLOBAL")
+    
+    RankingService.recalculate_global_ranking(db)
+    db.expire_all()
+    full = RankingService._load_entries(db, "GLOBAL")
+    leader_id = users[0].id
+    rank = RankingService.get_user_rank(db, "GLOBAL", leader_id)
+    db.close()
+    
+    assert incremental == full
+    assert incremental[0]["user_id"] == leader_id
+    assert incremental[0]["total_points"] == ScoringService.POINTS_EXACT + ScoringService.POINTS_RESULT_BALANCE
+    assert rank["rank"] == 1
+    assert rank["total_points"] == incremental[0]["total_points"]
+
+def test_rank_history_snapshots():
+    """Test a snapshot is recorded per finished match and a correction replaces the one of its count"""
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users, matches = _seed_two_matches(db)
+    RankingService.recalculate_global_ranking(db)
+    _finish_match(db, matches[1], 0, 0)
+    _finish_match(db, matches[1], 2, 1)
+    history = RankingService.get_rank_history(db, "GLOBAL", users[0].id)
+    db.close()
+    
+    # 2nd after the first match, 1st after the (corrected) second
+    assert [(h["as_of_match"], h["rank"]) for h in history] == [(1, 2), (2, 1)]
+    assert history[-1]["total_points"] == ScoringService.POINTS_EXACT + ScoringService.POINTS_RESULT_BALANCE
+
+def test_standings_as_of_match():
+    """Test standings as of a match count are read from the latest snapshot at or before it"""
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users, matches = _seed_two_matches(db)
+    RankingService.recalculate_global_ranking(db)
+    _finish_match(db, matches[1], 2, 1)
+    
+    before_any = RankingService.get_standings_as_of(db, "GLOBAL", 0)
+    first = RankingService.get_standings_as_of(db, "GLOBAL", 1)
+    beyond = RankingService.get_standings_as_of(db, "GLOBAL", 10)
+    first_leader, second_leader = users[1].id, users[0].id
+    db.close()
+    
+    assert before_any is None
+    assert first["as_of_match"] == 1 and first["standings"][0]["user_id"] == first_leader
+    assert beyond["as_of_match"] == 2 and beyond["standings"][0]["user_id"] == second_leader
+    # Level on points and exact hits: the two leaders share first place
+    assert [row["rank"] for row in beyond["standings"]] == [1, 1, 3]
+
+def test_rank_movement():
+    """Test standings rows carry the places moved since the previous snapshot"""
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users, matches = _seed_two_matches(db)
+    RankingService.recalculate_global_ranking(db)
+    _finish_match(db, matches[1], 2, 1)
+    standings = RankingService.get_global_standings(db, limit=10)["standings"]
+    riser, leader, last = (user.id for user in users)
+    db.close()
+    
+    # The riser climbs from 2nd to a shared 1st; the leader keeps 1st
+    movement = {row["user_id"]: row["movement"] for row in standings}
+    assert movement == {riser: 1, leader: 0, last: 0}
+
+def test_snapshot_correction_rewrites_changed_rows():
+    """Test a correction at the same match count only rewrites the snapshot rows that changed"""
+    from sqlalchemy import event
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users, matches = _seed_two_matches(db)
+    RankingService.recalculate_global_ranking(db)
+    _finish_match(db, matches[1], 2, 1)
+    before = {row["user_id"]: (row["rank"], row["total_points"])
+              for row in RankingService.get_standings_as_of(db, "GLOBAL", 2)["standings"]}
+    first_snapshot = RankingService.get_standings_as_of(db, "GLOBAL", 1)
+    
+    inserted = []
+    def count_snapshot_rows(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO standings_snapshots"):
+            inserted.append(len(parameters) if executemany else 1)
+    event.listen(engine, "before_cursor_execute", count_snapshot_rows)
+    try:
+        _finish_match(db, matches[1], 3, 2)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_snapshot_rows)
+    
+    after = {row["user_id"]: (row["rank"], row["total_points"])
+             for row in RankingService.get_standings_as_of(db, "GLOBAL", 2)["standings"]}
+    first_after = RankingService.get_standings_as_of(db, "GLOBAL", 1)
+    unchanged = users[2].id
+    db.close()
+    
+    changed = {user_id for user_id in after if before.get(user_id) != after[user_id]}
+    assert unchanged not in changed and changed
+    assert sum(inserted) == len(changed)
+    assert first_after == first_snapshot
+
+def test_apply_match_result_writes_changed_rows():
+    """Test a patched version only sends the changed rows and copies the rest in the database"""
+    from sqlalchemy import event
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Copy {i}", email=f"copy{i}@example.com", provider="email") for i in range(4)]
+    db.add_all(users)
+    matches = [
+        Match(
+            fifa_match_code=f"COPY00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+            status=MatchStatus.FINISHED if i == 0 else MatchStatus.SCHEDULED,
+            home_score=1 if i == 0 else None,
+            away_score=0 if i == 0 else None,
+        )
+        for i in range(2)
+    ]
+    db.add_all(matches)
+    db.commit()
+    for user, (home, away) in zip(users, [(1, 0), (2, 0), (0, 0), (0, 1)]):
+        db.add(Prediction(user_id=user.id, match_id=matches[0].id, home_pred=home, away_pred=away))
+    # Only the leader picked the second match
+    db.add(Prediction(user_id=users[0].id, match_id=matches[1].id, home_pred=2, away_pred=2))
+    db.commit()
+    RankingService.recalculate_global_ranking(db)
+    
+    matches[1].status = MatchStatus.FINISHED
+    matches[1].home_score = 1
+    matches[1].away_score = 1
+    db.commit()
+    
+    sent = []
+    def count_entry_rows(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO standings_entries") and "SELECT" not in statement:
+            sent.append(len(parameters) if executemany else 1)
+    event.listen(engine, "before_cursor_execute", count_entry_rows)
+    try:
+        assert RankingService.apply_match_result(db, matches[1].id)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_entry_rows)
+    
+    db.expire_all()
+    incremental = RankingService._load_entries(db, "GLOBAL")
+    RankingService.recalculate_global_ranking(db)
+    db.expire_all()
+    full = RankingService._load_entries(db, "GLOBAL")
+    db.close()
+    
+    assert sum(sent) == 1
+    assert incremental == full
+
+def test_sql_ranking_matches_python(monkeypatch):
+    """Test set-based SQL scoring produces the same standings as Python scoring"""
+    from app.config import settings
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users = [
+        User(name=f"User {i}", email=f"sql{i}@example.com", provider="email")
+        for i in range(4)
+    ]
+    db.add_all(users)
+    matches = [
+        Match(
+            fifa_match_code=f"SQL00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+            status=MatchStatus.FINISHED if i < 2 else MatchStatus.SCHEDULED,
+            home_score=score[0],
+            away_score=score[1],
+        )
+        for i, score in enumerate([(2, 1), (1, 1), (None, None)])
+    ]
+    db.add_all(matches)
+    db.commit()
+    
+    picks = [(2, 1), (3, 2), (0, 0), (0, 2)]
+    for user, (home, away) in zip(users, picks):
+        for match in matches:
+            db.add(Prediction(user_id=user.id, match_id=match.id, home_pred=home, away_pred=away))
+    db.commit()
+    
+    monkeypatch.setattr(settings, "RANKING_MODE", "python")
+    RankingService.recalculate_global_ranking(db)
+    db.expire_all()
+    python_standings = RankingService._load_entries(db, "GLOBAL")
+    python_points = sorted((p.id, p.points_awarded, p.score_details) for p in db.query(Prediction).filter(Prediction.match_id != matches[2].id))
+    
+    monkeypatch.setattr(settings, "RANKING_MODE", "sql")
+    db.query(Prediction).update({"points_awarded": 0, "score_details": None})
+    db.commit()
+    RankingService.recalculate_global_ranking(db)
+    db.expire_all()
+    sql_standings = RankingService._load_entries(db, "GLOBAL")
+    sql_points = sorted((p.id, p.points_awarded, p.score_details) for p in db.query(Prediction).filter(Prediction.match_id != matches[2].id))
+    db.close()
+    
+    assert sql_standings == python_standings
+    assert sql_points == python_points
+
+def _seed_ranking_scopes(db):
+    """Four users with global picks and group picks in two groups, on three finished matches"""
+    from app.models import Group
+    
+    users = [
+        User(name=f"User {i}", email=f"pass{i}@example.com", provider="email")
+        for i in range(4)
+    ]
+    db.add_all(users)
+    db.commit()
+    groups = [
+        Group(name=f"Group {i}", slug=f"group-{i}", owner_id=users[0].id)
+        for i in range(2)
+    ]
+    db.add_all(groups)
+    matches = [
+        Match(
+            fifa_match_code=f"PASS00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+            status=MatchStatus.FINISHED,
+            home_score=i,
+            away_score=1,
+        )
+        for i in range(3)
+    ]
+    db.add_all(matches)
+    db.commit()
+    
+    for u_idx, user in enumerate(users):
+        for match in matches:
+            db.add(Prediction(user_id=user.id, match_id=match.id, home_pred=u_idx, away_pred=1))
+            db.add(Prediction(user_id=user.id, match_id=match.id, group_id=groups[u_idx % 2].id,
+                              home_pred=match.home_score, away_pred=u_idx))
+    db.commit()
+    return users, groups
+
+def _published_standings(db):
+    """Published entries of every scope"""
+    from app.services.ranking import RankingService
+    from app.models import StandingsCache
+    
+    db.expire_all()
+    return {c.scope: RankingService._load_entries(db, c.scope) for c in db.query(StandingsCache).all()}
+
+def _clear_standings(db):
+    from app.models import StandingsCache, StandingsEntry
+    
+    db.query(StandingsEntry).delete()
+    db.query(StandingsCache).delete()
+    db.commit()
+
+def test_single_pass_rankings_match_per_scope():
+    """Test the single-pass pipeline matches per-scope recalculation"""
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users, groups = _seed_ranking_scopes(db)
+    
+    RankingService.recalculate_global_ranking(db)
+    for group in groups:
+        RankingService.recalculate_group_ranking(db, group.id)
+    per_scope = _published_standings(db)
+    
+    _clear_standings(db)
+    assert RankingService.recalculate_all_rankings(db) == 2
+    single_pass = _published_standings(db)
+    expected_scopes = {"GLOBAL"} | {f"GROUP:{group.id}" for group in groups}
+    db.close()
+    
+    assert set(single_pass) == expected_scopes
+    assert single_pass == per_scope
+
+def test_streaming_rankings_match_per_scope(monkeypatch):
+    """Test streaming mode with batches that cut across groups matches per-scope recalculation"""
+    from app.config import settings
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users, groups = _seed_ranking_scopes(db)
+    
+    RankingService.recalculate_global_ranking(db)
+    for group in groups:
+        RankingService.recalculate_group_ranking(db, group.id)
+    per_scope = _published_standings(db)
+    
+    _clear_standings(db)
+    monkeypatch.setattr(settings, "RANKING_MODE", "stream")
+    monkeypatch.setattr(settings, "RANKING_STREAM_BATCH_SIZE", 5)
+    assert RankingService.recalculate_all_rankings(db, workers=1) == 2
+    streamed = _published_standings(db)
+    db.close()
+    
+    assert streamed == per_scope
+
+def test_streaming_writes_back_points_per_batch(monkeypatch):
+    """Test streaming mode scores and writes back predictions one bounded batch at a time"""
+    from app.config import settings
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    _seed_ranking_scopes(db)
+    
+    batches = []
+    write_back_batch = RankingService._write_back_batch
+    def recording_write_back(db, batch, scored):
+        batches.append(len(batch))
+        return write_back_batch(db, batch, scored)
+    monkeypatch.setattr(RankingService, "_write_back_batch", staticmethod(recording_write_back))
+    monkeypatch.setattr(settings, "RANKING_MODE", "stream")
+    monkeypatch.setattr(settings, "RANKING_STREAM_BATCH_SIZE", 5)
+    
+    assert RankingService.recalculate_global_ranking(db)
+    db.expire_all()
+    awarded = sum(points for (points,) in db.query(Prediction.points_awarded))
+    unscored = db.query(Prediction).filter(Prediction.score_details.is_(None)).count()
+    total = sum(e["total_points"] for e in RankingService._load_entries(db, "GLOBAL"))
+    predictions = db.query(Prediction).count()
+    db.close()
+    
+    assert sum(batches) == predictions and max(batches) <= 5
+    assert unscored == 0
+    assert awarded == total
+
+def test_sharded_rankings_match_single_pass(monkeypatch):
+    """Test group shards recalculated in spawned worker processes match the single pass"""
+    from app.config import settings
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    _seed_ranking_scopes(db)
+    
+    assert RankingService.recalculate_all_rankings(db) == 2
+    single_pass = _published_standings(db)
+    
+    _clear_standings(db)
+    monkeypatch.setattr(settings, "RANKING_WORKERS", 2)
+    assert RankingService.recalculate_all_rankings(db, workers=2) == 2
+    sharded = _published_standings(db)
+    db.close()
+    
+    assert sharded == single_pass
+
+def test_in_memory_leaderboard():
+    """Test in-memory leaderboard ranks, updates and ranges"""
+    from app.services.leaderboard import InMemoryLeaderboard, points_from_key
+    
+    key = lambda points, goal_error=0: ScoringService.tiebreaker_sort_key(points, 0, 0, goal_error)
+    board = InMemoryLeaderboard()
+    board.replace("GLOBAL", {1: key(10), 2: key(30), 3: key(20)})
+    
+    assert board.rank("GLOBAL", 2) == 1
+    assert board.rank("GLOBAL", 1) == 3
+    assert board.rank("GLOBAL", 4) is None
+    
+    board.set_key("GLOBAL", 1, key(35))
+    board.set_key("GLOBAL", 4, key(20, goal_error=3))
+    
+    assert board.rank("GLOBAL", 1) == 1
+    assert board.range("GLOBAL", 1, 2) == [(2, key(30)), (3, key(20))]
+    assert board.count("GLOBAL") == 4
+    assert points_from_key(board.key("GLOBAL", 4)) == 20
+    
+    board.remove("GLOBAL", 2)
+    assert board.rank("GLOBAL", 3) == 2
+    assert board.count("OTHER") == 0
+
+def test_standings_pagination_and_around_me():
+    """Test keyset-paginated and around-me standings reads"""
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users = [
+        User(name=f"User {i}", email=f"page{i}@example.com", provider="email")
+        for i in range(7)
+    ]
+    db.add_all(users)
+    db.commit()
+    
+    standings = [
+        {"user_id": user.id, "total_points": 10 * i, "exact_matches": 0, "correct_results": 0, "rank": 0}
+        for i, user in enumerate(users)
+    ]
+    RankingService._rank_standings(standings)
+    RankingService._save_standings(db, "GLOBAL", None, standings)
+    
+    pages, cursor = [], None
+    while True:
+        page = RankingService.get_global_standings(db, limit=3, cursor=cursor)
+        pages.append([row["rank"] for row in page["standings"]])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    
+    around = RankingService.get_standings_around_user(db, "GLOBAL", users[3].id, window=1)
+    db.close()
+    
+    assert pages == [[1, 2, 3], [4, 5, 6], [7]]
+    assert page["total_users"] == 7
+    assert around["rank"] == 4
+    assert [row["rank"] for row in around["standings"]] == [3, 4, 5]
+
+def test_leaderboard_reloads_newer_standings(monkeypatch):
+    """Test ranks read from the leaderboard follow standings published by another process"""
+    from app.services import ranking
+    from app.services.leaderboard import InMemoryLeaderboard
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Board {i}", email=f"board{i}@example.com", provider="email") for i in range(3)]
+    db.add_all(users)
+    db.commit()
+    user_ids = [user.id for user in users]
+    
+    def publish(points):
+        standings = [
+            {"user_id": user_id, "total_points": p, "exact_matches": 0, "correct_results": 0, "rank": 0}
+            for user_id, p in zip(user_ids, points)
+        ]
+        RankingService._rank_standings(standings)
+        RankingService._save_standings(db, "GLOBAL", None, standings)
+    
+    board = InMemoryLeaderboard()
+    monkeypatch.setattr(ranking, "get_leaderboard", lambda: board)
+    publish([10, 20, 30])
+    before = RankingService.get_user_rank(db, "GLOBAL", user_ids[0])
+    
+    # A ranking worker publishes into its own in-memory board
+    monkeypatch.setattr(ranking, "get_leaderboard", lambda: InMemoryLeaderboard())
+    publish([40, 20, 30])
+    monkeypatch.setattr(ranking, "get_leaderboard", lambda: board)
+    after = RankingService.get_user_rank(db, "GLOBAL", user_ids[0])
+    db.close()
+    
+    assert (before["rank"], before["total_points"]) == (3, 10)
+    assert (after["rank"], after["total_points"]) == (1, 40)
+
+def test_tiebreaker_chain_and_shared_ranks():
+    """Test full tiebreaker chain and competition ranking"""
+    from app.services.ranking import RankingService
+    from app.services.leaderboard import InMemoryLeaderboard, leaderboard_key
+    
+    early = datetime(2026, 6, 1, tzinfo=timezone.utc)
+    late = early + timedelta(hours=1)
+    standings = [
+        {"user_id": 1, "total_points": 10, "exact_matches": 1, "correct_results": 3, "goal_error": 4, "first_prediction_at": late},
+        {"user_id": 2, "total_points": 10, "exact_matches": 1, "correct_results": 3, "goal_error": 2, "first_prediction_at": late},
+        {"user_id": 3, "total_points": 10, "exact_matches": 1, "correct_results": 3, "goal_error": 4, "first_prediction_at": early},
+        {"user_id": 4, "total_points": 10, "exact_matches": 1, "correct_results": 3, "goal_error": 4, "first_prediction_at": late},
+        {"user_id": 5, "total_points": 12, "exact_matches": 0, "correct_results": 6, "goal_error": 9, "first_prediction_at": late},
+        {"user_id": 6, "total_points": 10, "exact_matches": 2, "correct_results": 0, "goal_error": 9, "first_prediction_at": late},
+    ]
+    
+    assert ScoringService.get_tiebreaker_order(standings) == [5, 6, 2, 3, 1, 4]
+    
+    RankingService._rank_standings(standings)
+    assert [(s["user_id"], s["rank"]) for s in standings] == [(5, 1), (6, 2), (2, 3), (3, 4), (1, 5), (4, 5)]
+    
+    # The leaderboard breaks ties down to the first prediction time, like the table
+    board = InMemoryLeaderboard()
+    board.replace("GLOBAL", {s["user_id"]: leaderboard_key(s) for s in standings})
+    assert [(s["user_id"], board.rank("GLOBAL", s["user_id"])) for s in standings] == [(s["user_id"], s["rank"]) for s in standings]
+
+def test_simulation_odds(monkeypatch):
+    """Test Monte Carlo odds: shared positions, cached reads and background refresh on result change"""
+    import numpy as np
+    from app.config import settings
+    from app.services.ranking import RankingService
+    from app.services.simulation import SimulationService
+    
+    # Columns are simulations: ties share the better position
+    finish = SimulationService._finish_counts(np.array([[3, 1], [3, 2], [1, 2]]))
+    assert finish.tolist() == [[1, 2, 2], [2, 2, 2], [1, 2, 2]]
+    
+    monkeypatch.setattr(settings, "SIMULATION_RUNS", 500)
+    
+    db = TestingSessionLocal()
+    users = [
+        User(name=f"Sim {i}", email=f"sim{i}@example.com", provider="email")
+        for i in range(3)
+    ]
+    db.add_all(users)
+    matches = [
+        Match(
+            fifa_match_code=f"SIM00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) + timedelta(hours=i - 1),
+            status=MatchStatus.FINISHED if i == 0 else MatchStatus.SCHEDULED,
+            home_score=2 if i == 0 else None,
+            away_score=2 if i == 0 else None,
+        )
+        for i in range(2)
+    ]
+    db.add_all(matches)
+    db.commit()
+    
+    # Leader is 5 points clear with one match left: the others can only tie
+    first_picks = [(2, 2), (0, 1), (0, 1)]
+    second_picks = [(0, 0), (1, 0), (1, 0)]
+    for user, first, second in zip(users, first_picks, second_picks):
+        db.add(Prediction(user_id=user.id, match_id=matches[0].id, home_pred=first[0], away_pred=first[1]))
+        db.add(Prediction(user_id=user.id, match_id=matches[1].id, home_pred=second[0], away_pred=second[1]))
+    db.commit()
+    RankingService.recalculate_global_ranking(db)
+    
+    # Reads never simulate: they queue a refresh and serve what is stored
+    queued = []
+    monkeypatch.setattr(SimulationService, "request_refresh", staticmethod(queued.append))
+    missing = SimulationService.get_odds_page(db, "GLOBAL", limit=10)
+    SimulationService.refresh_if_stale(db, "GLOBAL")
+    
+    leader, chaser, twin = (SimulationService.get_user_odds(db, "GLOBAL", user.id) for user in users)
+    computed_at = leader["computed_at"]
+    cached = SimulationService.get_odds_page(db, "GLOBAL", limit=10)
+    queued_while_fresh = len(queued)
+    
+    matches[0].away_score = 1
+    db.commit()
+    stale = SimulationService.get_odds_page(db, "GLOBAL", limit=10)
+    SimulationService.refresh_if_stale(db, "GLOBAL")
+    refreshed = SimulationService.get_odds_page(db, "GLOBAL", limit=10)
+    db.close()
+    
+    assert missing is None and queued_while_fresh == 1
+    assert leader["runs"] == 500 and leader["remaining_matches"] == 1
+    assert leader["win_probability"] == 1.0 and not leader["stale"]
+    assert 0 < chaser["win_probability"] < 1
+    assert chaser["win_probability"] == twin["win_probability"]
+    assert chaser["top3_probability"] == 1.0
+    assert cached["computed_at"] == computed_at
+    assert cached["odds"][0]["user_id"] == leader["user_id"]
+    assert stale["stale"] and stale["computed_at"] == computed_at
+    assert queued == ["GLOBAL", "GLOBAL"]
+    assert not refreshed["stale"] and refreshed["computed_at"] > computed_at
+
+def test_simulation_fingerprint_follows_picks():
+    """Test a pick saved on an open match makes the stored odds stale"""
+    from app.services.simulation import SimulationService
+    
+    db = TestingSessionLocal()
+    user = User(name="Sim pick", email="simpick@example.com", provider="email")
+    db.add(user)
+    match = Match(
+        fifa_match_code="SIMPICK1",
+        stage=MatchStage.GROUP,
+        match_order=1,
+        home_team="Team A",
+        away_team="Team B",
+        kickoff_at_utc=datetime.now(timezone.utc) + timedelta(hours=1),
+        status=MatchStatus.SCHEDULED,
+    )
+    db.add(match)
+    db.commit()
+    
+    before = SimulationService.results_fingerprint(db)
+    db.add(Prediction(user_id=user.id, match_id=match.id, home_pred=1, away_pred=0))
+    db.commit()
+    after = SimulationService.results_fingerprint(db)
+    db.close()
+    
+    assert before != after
+
+def test_simulation_advance_bonus():
+    """Test simulated knockout matches award the advance bonus to the side that goes through"""
+    import numpy as np
+    from app.services.simulation import SimulationService
+    
+    # Same score pick, opposite sides through; every match ends 0-0 and goes to a coin flip
+    picks = [(np.array([0, 1]), np.array([1, 1]), np.array([1, 1]))]
+    sides = [np.array([ScoringService.ADVANCE_HOME, ScoringService.ADVANCE_AWAY])]
+    counts = SimulationService.simulate(
+        np.zeros(2, dtype=np.int64), picks, [(0.0, 0.0)], 1000, np.random.default_rng(3), sides=sides
+    )
+    
+    # Without the bonus both would always share first place
+    assert counts[0, 0] + counts[1, 0] == 1000
+    assert 0 < counts[0, 0] < 1000
+
+def test_simulation_live_match_starts_from_score():
+    """Test a live match is simulated from its current score for the time left"""
+    import numpy as np
+    from app.services.simulation import SimulationService
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Sim live {i}", email=f"simlive{i}@example.com", provider="email") for i in range(2)]
+    db.add_all(users)
+    # Kicked off long ago: nothing left to play but the score stands
+    match = Match(
+        fifa_match_code="SIMLIVE1",
+        stage=MatchStage.GROUP,
+        match_order=1,
+        home_team="Team A",
+        away_team="Team B",
+        kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+        status=MatchStatus.LIVE,
+        home_score=2,
+        away_score=0,
+    )
+    db.add(match)
+    db.commit()
+    db.add(Prediction(user_id=users[0].id, match_id=match.id, home_pred=2, away_pred=0))
+    db.add(Prediction(user_id=users[1].id, match_id=match.id, home_pred=0, away_pred=0))
+    db.commit()
+    
+    user_ids, counts, remaining = SimulationService.simulate_scope(db, "GLOBAL", None, 200, np.random.default_rng(5))
+    exact_user, wrong_user = (user_ids.index(user.id) for user in users)
+    db.close()
+    
+    assert remaining == 1
+    assert counts[exact_user, 0] == 200
+    assert counts[wrong_user, 0] == 0
+
+def test_live_provisional_standings():
+    """Test provisional standings follow live goals incrementally, per scope's rules, and step aside at full time"""
+    from app.services.ranking import RankingService
+    from app.models import Group, GroupMember
+    
+    db = TestingSessionLocal()
+    users = [
+        User(name=f"Live {i}", email=f"live{i}@example.com", provider="email")
+        for i in range(3)
+    ]
+    db.add_all(users)
+    matches = [
+        Match(
+            fifa_match_code=f"LIVE00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3 - i),
+            status=MatchStatus.FINISHED if i == 0 else MatchStatus.LIVE,
+            home_score=1 if i == 0 else 0,
+            away_score=0,
+        )
+        for i in range(2)
+    ]
+    db.add_all(matches)
+    db.commit()
+    
+    first_picks = [(1, 0), (2, 0), (0, 1)]
+    live_picks = [(0, 2), (1, 1), (1, 0)]
+    for user, first, live in zip(users, first_picks, live_picks):
+        db.add(Prediction(user_id=user.id, match_id=matches[0].id, home_pred=first[0], away_pred=first[1]))
+        db.add(Prediction(user_id=user.id, match_id=matches[1].id, home_pred=live[0], away_pred=live[1]))
+    # Members' global picks count here under custom rules, live points included
+    group = Group(name="Live custom", slug="live-custom", owner_id=users[0].id, use_global_picks=True,
+                  scoring_system="custom", scoring_rules={"exact": 10, "result_balance": 4, "result": 1})
+    db.add(group)
+    db.commit()
+    db.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in users])
+    db.commit()
+    RankingService.recalculate_global_ranking(db)
+    RankingService.recalculate_group_ranking(db, group.id)
+    user_ids = [user.id for user in users]
+    group_id = group.id
+    
+    def table(scope_group_id=None):
+        db.expire_all()
+        page = RankingService.get_group_standings(db, scope_group_id, limit=10) if scope_group_id \
+            else RankingService.get_global_standings(db, limit=10)
+        return {
+            row["user_id"]: (row["rank"], row["total_points"], row["live_points"], row["provisional_rank"])
+            for row in page["standings"]
+        }
+    
+    # Goal: 1-0, then the equaliser: 1-1
+    matches[1].home_score = 1
+    db.commit()
+    RankingService.apply_live_score(db, matches[1].id)
+    one_nil = table()
+    group_one_nil = table(group_id)
+    
+    matches[1].away_score = 1
+    db.commit()
+    RankingService.apply_live_score(db, matches[1].id)
+    incremental = table()
+    group_incremental = table(group_id)
+    provisional_page = RankingService.get_global_standings(db, limit=10, provisional=True)
+    RankingService.recalculate_global_ranking(db)
+    RankingService.recalculate_group_ranking(db, group_id)
+    full = table()
+    group_full = table(group_id)
+    
+    # Full time
+    matches[1].status = MatchStatus.FINISHED
+    db.commit()
+    RankingService.apply_live_score(db, matches[1].id)
+    RankingService.apply_match_result(db, matches[1].id)
+    final = table()
+    db.close()
+    
+    leader, runner_up, third = user_ids
+    # Provisional tie on 5 points keeps the official order
+    assert one_nil[leader] == (1, 5, 0, 1)
+    assert one_nil[third] == (3, 0, 5, 2)
+    assert incremental == full
+    assert incremental[runner_up] == (2, 2, 5, 1)
+    assert [row["user_id"] for row in provisional_page["standings"]] == [runner_up, leader, third]
+    assert provisional_page["live_matches"] == 1
+    # The group scores the same live picks with its own rules
+    assert group_one_nil[third] == (3, 0, 10, 2)
+    assert group_incremental == group_full
+    assert group_incremental[runner_up] == (2, 1, 10, 1)
+    assert group_incremental[leader] == (1, 10, 0, 2)
+    assert final[runner_up] == (1, 7, 0, 1)
+    assert all(live == 0 for _, _, live, _ in final.values())
+
+def test_recompute_queue_coalesces():
+    """Test repeated recompute submissions collapse into one debounced run, failures and lanes"""
+    import threading
+    from app.jobs.queue import RecomputeQueue, JobStatus
+    
+    runs = []
+    queue = RecomputeQueue(session_factory=TestingSessionLocal, debounce_seconds=0.2)
+    
+    jobs = [queue.submit("match_results", lambda db, payload: runs.append(set(payload)), {match_id}) for match_id in (1, 2, 1)]
+    other = queue.submit("all_rankings", lambda db, payload: runs.append("all"))
+    
+    assert jobs[0].status == JobStatus.PENDING
+    assert jobs[0].wait(5) and other.wait(5)
+    assert len({job.id for job in jobs}) == 1
+    assert jobs[0].status == JobStatus.DONE
+    assert jobs[0].submissions == 3
+    assert len(runs) == 2 and {1, 2} in runs and "all" in runs
+    
+    failing = queue.submit("broken", lambda db, payload: 1 / 0)
+    assert failing.wait(5)
+    assert failing.status == JobStatus.FAILED
+    assert queue.get(failing.id).to_dict()["error"]
+    
+    # Services catch their own errors and report them by returning False
+    reported = queue.submit("reported", lambda db, payload: False)
+    assert reported.wait(5) and reported.status == JobStatus.FAILED
+    
+    # A long job on its own lane doesn't hold up the default one
+    release = threading.Event()
+    slow = queue.submit("rescore:1", lambda db, payload: release.wait(5), lane="rescore")
+    quick = queue.submit("group_ranking:1", lambda db, payload: True)
+    assert quick.wait(5) and not slow.wait(0)
+    release.set()
+    assert slow.wait(5) and slow.status == JobStatus.DONE
+    
+    # Submitting again after a run starts a new job
+    assert queue.submit("match_results", lambda db, payload: None, {3}).id != jobs[0].id
+
+def test_custom_group_scoring_rules(monkeypatch):
+    """Test compiled scoring tables match the kernel, custom group rules across ranking paths and partial rule updates"""
+    import numpy as np
+    from app.config import settings
+    from app.schemas import GroupScoringUpdate
+    from app.services.business import GroupService, ScoringRules, STANDARD_RULES
+    from app.services.ranking import RankingService
+    from app.models import Group
+    
+    rng = np.random.default_rng(7)
+    picks = rng.integers(0, 25, size=(4, 2000))
+    assert np.array_equal(STANDARD_RULES.points(*picks), ScoringService.calculate_points_batch(*picks)[0])
+    with pytest.raises(ValueError):
+        ScoringRules(exact=101)
+    
+    db = TestingSessionLocal()
+    users = [
+        User(name=f"Rules {i}", email=f"rules{i}@example.com", provider="email")
+        for i in range(3)
+    ]
+    db.add_all(users)
+    db.commit()
+    group = Group(name="Custom", slug="custom", owner_id=users[0].id,
+                  scoring_system="custom", scoring_rules={"exact": 10, "result_balance": 4, "result": 1})
+    db.add(group)
+    matches = [
+        Match(
+            fifa_match_code=f"RULE00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+            status=MatchStatus.FINISHED if i == 0 else MatchStatus.SCHEDULED,
+        )
+        for i in range(2)
+    ]
+    matches[0].home_score, matches[0].away_score = 2, 1
+    db.add_all(matches)
+    db.commit()
+    
+    # exact (10), result + balance (4), result only (1)
+    for user, pick in zip(users, [(2, 1), (1, 0), (3, 0)]):
+        for match in matches:
+            db.add(Prediction(user_id=user.id, match_id=match.id, group_id=group.id,
+                              home_pred=pick[0], away_pred=pick[1]))
+    db.commit()
+    scope = f"GROUP:{group.id}"
+    
+    def points():
+        db.expire_all()
+        return {e["user_id"]: e["total_points"] for e in RankingService._load_entries(db, scope)}
+    
+    RankingService.recalculate_group_ranking(db, group.id)
+    per_scope = points()
+    RankingService.recalculate_all_rankings(db)
+    single_pass = points()
+    
+    matches[1].status = MatchStatus.FINISHED
+    matches[1].home_score, matches[1].away_score = 1, 0
+    db.commit()
+    RankingService.apply_match_result(db, matches[1].id)
+    incremental = points()
+    monkeypatch.setattr(settings, "RANKING_MODE", "sql")
+    RankingService.recalculate_group_ranking(db, group.id)
+    sql = points()
+    global_points = {e["user_id"]: e["total_points"] for e in RankingService._load_entries(db, "GLOBAL")}
+    exact_user, balance_user, result_user = [user.id for user in users]
+    
+    # Updates only change the fields sent
+    GroupService.set_scoring_rules(db, group, GroupScoringUpdate(use_global_picks=True))
+    picks_only = (group.scoring_system, group.scoring_rules, group.use_global_picks)
+    GroupService.set_scoring_rules(db, group, GroupScoringUpdate(exact=12))
+    one_value = dict(group.scoring_rules)
+    with pytest.raises(ValueError):
+        GroupService.set_scoring_rules(db, group, GroupScoringUpdate(scoring_system="standard"))
+        GroupService.set_scoring_rules(db, group, GroupScoringUpdate(result=2))
+    db.close()
+    
+    # Values missing from older stored rules default to the standard ones
+    assert picks_only == ("custom", {"exact": 10, "result_balance": 4, "result": 1, "advance": 2}, True)
+    assert one_value == {"exact": 12, "result_balance": 4, "result": 1, "advance": 2}
+    
+    assert per_scope == single_pass == {exact_user: 10, balance_user: 4, result_user: 1}
+    # Second result 1-0: 2-1 earns result + balance, 1-0 is exact, 3-0 result only
+    assert incremental == sql == {exact_user: 14, balance_user: 14, result_user: 2}
+    # Global standings stay on the standard system
+    assert global_points == {exact_user: 8, balance_user: 8, result_user: 4}
+
+def test_custom_advance_bonus(monkeypatch):
+    """Test a group's own advance bonus is used by every ranking path"""
+    from app.config import settings
+    from app.services.business import ScoringRules
+    from app.services.ranking import RankingService
+    from app.models import Group
+    
+    db = TestingSessionLocal()
+    user = User(name="Advance", email="advance@example.com", provider="email")
+    db.add(user)
+    db.commit()
+    group = Group(name="Advance", slug="advance", owner_id=user.id, scoring_system="custom",
+                  scoring_rules={"exact": 10, "result_balance": 4, "result": 1, "advance": 5})
+    db.add(group)
+    match = Match(
+        fifa_match_code="ADV001",
+        stage=MatchStage.QUARTER_FINAL,
+        match_order=1,
+        home_team="Team A",
+        away_team="Team B",
+        kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+        status=MatchStatus.FINISHED,
+        home_score=1,
+        away_score=1,
+        home_score_pen=4,
+        away_score_pen=3,
+    )
+    db.add(match)
+    db.commit()
+    db.add(Prediction(user_id=user.id, match_id=match.id, group_id=group.id, home_pred=1, away_pred=1,
+                      advance_team="Team A"))
+    db.commit()
+    scope = f"GROUP:{group.id}"
+    
+    def points():
+        db.expire_all()
+        return [e["total_points"] for e in RankingService._load_entries(db, scope)]
+    
+    RankingService.recalculate_all_rankings(db)
+    single_pass = points()
+    monkeypatch.setattr(settings, "RANKING_MODE", "sql")
+    RankingService.recalculate_group_ranking(db, group.id)
+    sql = points()
+    db.close()
+    
+    assert single_pass == sql == [15]
+    assert ScoringRules(advance=5).points_for_details({"exact": True, "advance": True}) == ScoringService.POINTS_EXACT + 5
+    with pytest.raises(ValueError):
+        ScoringRules(advance=-1)
+
+def test_group_standings_from_global_picks(monkeypatch):
+    """Test groups on global picks rank members' global predictions with per-group overrides"""
+    from app.config import settings
+    from app.services.ranking import RankingService
+    from app.models import Group, GroupMember
+    
+    db = TestingSessionLocal()
+    users = [
+        User(name=f"Global {i}", email=f"global{i}@example.com", provider="email")
+        for i in range(3)
+    ]
+    db.add_all(users)
+    db.commit()
+    group = Group(name="Shared", slug="shared", owner_id=users[0].id, use_global_picks=True,
+                  scoring_system="custom", scoring_rules={"exact": 10, "result_balance": 4, "result": 1})
+    db.add(group)
+    db.commit()
+    # users[2] is not a member - their global picks stay out of the group
+    db.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in users[:2]])
+    matches = [
+        Match(
+            fifa_match_code=f"GLOB00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+            status=MatchStatus.FINISHED if i == 0 else MatchStatus.SCHEDULED,
+        )
+        for i in range(2)
+    ]
+    matches[0].home_score, matches[0].away_score = 2, 1
+    db.add_all(matches)
+    db.commit()
+    
+    for user, pick in zip(users, [(2, 1), (0, 1), (2, 1)]):
+        for match in matches:
+            db.add(Prediction(user_id=user.id, match_id=match.id, home_pred=pick[0], away_pred=pick[1]))
+    # users[1] overrides the first match in the group
+    db.add(Prediction(user_id=users[1].id, match_id=matches[0].id, group_id=group.id, home_pred=2, away_pred=1))
+    db.commit()
+    scope = f"GROUP:{group.id}"
+    
+    def points():
+        db.expire_all()
+        return {e["user_id"]: e["total_points"] for e in RankingService._load_entries(db, scope)}
+    
+    RankingService.recalculate_group_ranking(db, group.id)
+    per_scope = points()
+    RankingService.recalculate_all_rankings(db)
+    single_pass = points()
+    monkeypatch.setattr(settings, "RANKING_MODE", "stream")
+    RankingService.recalculate_group_ranking(db, group.id)
+    stream = points()
+    monkeypatch.setattr(settings, "RANKING_MODE", "sql")
+    RankingService.recalculate_group_ranking(db, group.id)
+    sql = points()
+    monkeypatch.setattr(settings, "RANKING_MODE", "python")
+    
+    matches[1].status = MatchStatus.FINISHED
+    matches[1].home_score, matches[1].away_score = 1, 0
+    db.commit()
+    RankingService.apply_match_result(db, matches[1].id)
+    incremental = points()
+    RankingService.recalculate_group_ranking(db, group.id)
+    rebuilt = points()
+    own_user, override_user, _ = [user.id for user in users]
+    db.close()
+    
+    assert per_scope == single_pass == stream == sql == {own_user: 10, override_user: 10}
+    # Second result 1-0 comes from the global picks: 2-1 earns result + balance, 0-1 nothing
+    assert incremental == rebuilt == {own_user: 14, override_user: 10}
+
+def test_stage_points_breakdown(monkeypatch):
+    """Test per-stage subtotals agree across ranking paths and feed the stage boards"""
+    from app.config import settings
+    from app.services.ranking import RankingService
+    
+    db = TestingSessionLocal()
+    users = [
+        User(name=f"Stage {i}", email=f"stage{i}@example.com", provider="email")
+        for i in range(2)
+    ]
+    db.add_all(users)
+    stages = [MatchStage.GROUP, MatchStage.QUARTER_FINAL, MatchStage.THIRD_PLACE]
+    matches = [
+        Match(
+            fifa_match_code=f"STAGE00{i}",
+            stage=stage,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+            status=MatchStatus.FINISHED if i < 2 else MatchStatus.SCHEDULED,
+            home_score=2 if i < 2 else None,
+            away_score=1 if i < 2 else None,
+        )
+        for i, stage in enumerate(stages)
+    ]
+    db.add_all(matches)
+    db.commit()
+    
+    # users[0] nails the group match, users[1] the knockout ones
+    picks = {users[0].id: [(2, 1), (0, 1), (0, 0)], users[1].id: [(0, 1), (2, 1), (1, 0)]}
+    for user_id, user_picks in picks.items():
+        for match, pick in zip(matches, user_picks):
+            db.add(Prediction(user_id=user_id, match_id=match.id, home_pred=pick[0], away_pred=pick[1]))
+    db.commit()
+    
+    def stage_points():
+        db.expire_all()
+        return {
+            e["user_id"]: tuple(e[column] for column in RankingService.STAGE_COLUMNS)
+            for e in RankingService._load_entries(db, "GLOBAL")
+        }
+    
+    RankingService.recalculate_global_ranking(db)
+    python = stage_points()
+    monkeypatch.setattr(settings, "RANKING_MODE", "sql")
+    RankingService.recalculate_global_ranking(db)
+    sql = stage_points()
+    monkeypatch.setattr(settings, "RANKING_MODE", "python")
+    
+    matches[2].status = MatchStatus.FINISHED
+    matches[2].home_score, matches[2].away_score = 1, 0
+    db.commit()
+    RankingService.apply_match_result(db, matches[2].id)
+    incremental = stage_points()
+    knockout = RankingService.get_stage_board(db, "GLOBAL", "knockout")
+    group_board = RankingService.get_stage_board(db, "GLOBAL", "group")
+    group_user, knockout_user = [user.id for user in users]
+    db.close()
+    
+    # Exact 5 + advance bonus 2 in the quarter-final
+    assert python == sql == {group_user: (5, 0, 0, 0, 0, 0), knockout_user: (0, 0, 0, 7, 0, 0)}
+    # Third-place match counts in the final round
+    assert incremental == {group_user: (5, 0, 0, 0, 0, 0), knockout_user: (0, 0, 0, 7, 0, 7)}
+    assert [(r["user_id"], r["board_points"], r["board_rank"]) for r in knockout["standings"]] == [
+        (knockout_user, 14, 1), (group_user, 0, 2)
+    ]
+    assert group_board["standings"][0]["user_id"] == group_user
+
+def test_expected_points_pick_optimizer():
+    """Test the vectorized expectation against brute force and crowd-based suggestions"""
+    import numpy as np
+    from sqlalchemy import event
+    from app.services.business import ScoringRules
+    from app.services.optimizer import PickOptimizer
+    from app.services.simulation import SimulationService
+    
+    rng = np.random.default_rng(3)
+    probs = rng.random((6, 6))
+    probs /= probs.sum()
+    rules = ScoringRules(exact=10, result_balance=4, result=1)
+    expected = PickOptimizer.expected_points(probs, rules)
+    for home_pred, away_pred in [(0, 0), (2, 1), (1, 4)]:
+        brute = sum(
+            probs[h, a] * rules.points(home_pred, away_pred, h, a)
+            for h in range(6) for a in range(6)
+        )
+        assert expected[home_pred, away_pred] == pytest.approx(brute)
+    best = PickOptimizer.best_pick(probs, rules)
+    assert expected[best["home_pred"], best["away_pred"]] == expected.max()
+    with pytest.raises(ValueError):
+        PickOptimizer.expected_points(np.zeros((3, 3)))
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Crowd {i}", email=f"crowd{i}@example.com", provider="email") for i in range(8)]
+    db.add_all(users)
+    match = Match(
+        fifa_match_code="CROWD001",
+        stage=MatchStage.GROUP,
+        match_order=1,
+        home_team="Team A",
+        away_team="Team B",
+        kickoff_at_utc=datetime.now(timezone.utc) + timedelta(days=1),
+        status=MatchStatus.SCHEDULED,
+    )
+    db.add(match)
+    db.commit()
+    db.add_all([Prediction(user_id=user.id, match_id=match.id, home_pred=3, away_pred=0) for user in users])
+    db.commit()
+    
+    suggestions = PickOptimizer.suggest_upcoming(db)
+    # One grouped query: the Poisson rates come from the same aggregated counts
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    crowd = PickOptimizer.crowd_probabilities(db, [match.id])[match.id]
+    event.remove(engine, "before_cursor_execute", listener)
+    rates = SimulationService.goal_rates(db, [match.id])[match.id]
+    db.close()
+    
+    assert len(statements) == 1
+    assert rates == pytest.approx((SimulationService.shrunk_rate(24, 8), SimulationService.shrunk_rate(0, 8)))
+    assert crowd.sum() == pytest.approx(1.0) and crowd[3, 0] == crowd.max()
+    assert len(suggestions) == 1
+    assert (suggestions[0]["home_pred"], suggestions[0]["away_pred"]) == (3, 0)
+
+def test_head_to_head_records(monkeypatch):
+    """Test pairwise head-to-head records match brute force through full and incremental updates"""
+    import numpy as np
+    from sqlalchemy import event
+    from app.config import settings
+    from app.services.head_to_head import HeadToHeadService
+    from app.services.ranking import RankingService
+    from app.models import Group, HeadToHead
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Rival {i}", email=f"rival{i}@example.com", provider="email") for i in range(5)]
+    db.add_all(users)
+    db.commit()
+    group = Group(name="Rivals", slug="rivals", owner_id=users[0].id)
+    db.add(group)
+    matches = [
+        Match(
+            fifa_match_code=f"RIVAL{i:03d}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3 + i),
+            status=MatchStatus.FINISHED if i < 3 else MatchStatus.SCHEDULED,
+        )
+        for i in range(4)
+    ]
+    results = [(2, 1), (0, 0), (1, 3), (1, 0)]
+    for match, (home, away) in zip(matches[:3], results):
+        match.home_score, match.away_score = home, away
+    db.add_all(matches)
+    db.commit()
+    
+    rng = np.random.default_rng(11)
+    for user in users:
+        for match in matches:
+            # Some players skip some matches
+            if rng.random() < 0.8:
+                db.add(Prediction(user_id=user.id, match_id=match.id, group_id=group.id,
+                                  home_pred=int(rng.integers(0, 4)), away_pred=int(rng.integers(0, 4))))
+    db.commit()
+    
+    def records():
+        db.expire_all()
+        return {
+            (r.user_id, r.opponent_id): (r.wins, r.losses, r.draws)
+            for r in db.query(HeadToHead).filter(HeadToHead.group_id == group.id)
+        }
+    
+    def brute_force(finished):
+        points = {}
+        for pred in db.query(Prediction).filter(Prediction.group_id == group.id):
+            if pred.match_id in finished:
+                home, away = finished[pred.match_id]
+                points[(pred.user_id, pred.match_id)] = int(ScoringService.calculate_points_batch(
+                    pred.home_pred, pred.away_pred, home, away
+                )[0])
+        players = sorted({user_id for user_id, _ in points})
+        expected = {}
+        for i, a in enumerate(players):
+            for b in players[i + 1:]:
+                record = [0, 0, 0]
+                for match_id in finished:
+                    if (a, match_id) not in points and (b, match_id) not in points:
+                        continue
+                    pa, pb = points.get((a, match_id), 0), points.get((b, match_id), 0)
+                    record[0 if pa > pb else 1 if pa < pb else 2] += 1
+                expected[(a, b)] = tuple(record)
+        return expected
+    
+    finished = {match.id: result for match, result in zip(matches[:3], results)}
+    RankingService.recalculate_all_rankings(db)
+    single_pass = records()
+    monkeypatch.setattr(settings, "RANKING_MODE", "sql")
+    RankingService.recalculate_group_ranking(db, group.id)
+    sql = records()
+    monkeypatch.setattr(settings, "RANKING_MODE", "stream")
+    RankingService.recalculate_group_ranking(db, group.id)
+    stream = records()
+    monkeypatch.setattr(settings, "RANKING_MODE", "python")
+    assert single_pass == sql == stream == brute_force(finished)
+    
+    matches[3].status = MatchStatus.FINISHED
+    matches[3].home_score, matches[3].away_score = results[3]
+    db.commit()
+    RankingService.apply_match_result(db, matches[3].id)
+    finished[matches[3].id] = results[3]
+    incremental = records()
+    assert incremental == brute_force(finished)
+    
+    # A later full recompute finds nothing to rewrite
+    writes = []
+    def count_writes(conn, cursor, statement, parameters, context, executemany):
+        if statement.split()[0] in ("INSERT", "UPDATE", "DELETE") and "head_to_head" in statement.split()[:3]:
+            writes.append(statement)
+    event.listen(engine, "before_cursor_execute", count_writes)
+    try:
+        RankingService.recalculate_group_ranking(db, group.id)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_writes)
+    assert records() == incremental
+    assert writes == []
+    
+    a, b = sorted(incremental)[0]
+    comparison = HeadToHeadService.get_head_to_head(db, group.id, b, a)
+    db.close()
+    
+    wins, losses, draws = incremental[(a, b)]
+    assert (comparison["wins"], comparison["losses"], comparison["draws"]) == (losses, wins, draws)
+    assert comparison["matches"][-1]["difference"] == comparison["points"] - comparison["opponent_points"]
+
+def test_chunked_resumable_rescoring(monkeypatch):
+    """Test rescoring commits per chunk, resumes from its checkpoint and marks rankings dirty"""
+    from app.services.ranking import RankingService
+    from app.services.rescoring import RescoringService, RescoreStatus
+    from app.models import DirtyScope, RescoreJob
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Rescore {i}", email=f"rescore{i}@example.com", provider="email") for i in range(5)]
+    db.add_all(users)
+    match = Match(
+        fifa_match_code="RESC001",
+        stage=MatchStage.GROUP,
+        match_order=1,
+        home_team="Team A",
+        away_team="Team B",
+        kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+        status=MatchStatus.FINISHED,
+        home_score=2,
+        away_score=1,
+    )
+    db.add(match)
+    db.commit()
+    # Points from a wrong result that has since been corrected
+    db.add_all([
+        Prediction(user_id=user.id, match_id=match.id, home_pred=2, away_pred=i % 3,
+                   points_awarded=9, score_details={"exact": True})
+        for i, user in enumerate(users)
+    ])
+    db.commit()
+    
+    job = RescoringService.create_job(db, [match.id])
+    
+    # Crash while writing the second chunk
+    write_back = RankingService._write_back_batch
+    calls = []
+    def flaky_write_back(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("worker killed")
+        return write_back(*args, **kwargs)
+    monkeypatch.setattr(RankingService, "_write_back_batch", flaky_write_back)
+    failed = RescoringService.run(db, job.id, chunk_size=2)
+    assert (failed.status, failed.processed) == (RescoreStatus.FAILED, 2)
+    assert failed.error == "worker killed"
+    
+    monkeypatch.setattr(RankingService, "_write_back_batch", write_back)
+    done_status = RescoringService.run(db, job.id, chunk_size=2).status
+    progress = RescoringService.get_progress(db, job.id)
+    
+    db.expire_all()
+    points = sorted(p.points_awarded for p in db.query(Prediction).filter(Prediction.match_id == match.id))
+    dirty = {mark.scope for mark in db.query(DirtyScope)}
+    # A finished job can't be claimed again
+    assert RescoringService.run(db, job.id) is None
+    
+    # Background runs go to the queue's own rescore lane
+    from app.jobs import queue
+    monkeypatch.setattr(queue, "_queue", queue.RecomputeQueue(session_factory=TestingSessionLocal, debounce_seconds=0))
+    queued = RescoringService.submit(RescoringService.create_job(db, [match.id]).id)
+    assert queued.wait(5)
+    db.close()
+    
+    assert (queued.lane, queued.status) == ("rescore", queue.JobStatus.DONE)
+    
+    assert done_status == RescoreStatus.DONE
+    assert (progress["processed"], progress["total"], progress["percent"]) == (5, 5, 100.0)
+    # 2-0 (x2): result only, 2-1 (x2): exact, 2-2: nothing
+    assert points == [0, 2, 2, 5, 5]
+    assert "GLOBAL" in dirty
+
+def test_standings_stream_diffs():
+    """Test streamed standings send a snapshot, then only changed rows (live updates included), and resync stale clients"""
+    import asyncio
+    import json
+    from app.services.ranking import RankingService
+    from app.services.standings_stream import StandingsBroadcaster
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Stream {i}", email=f"stream{i}@example.com", provider="email") for i in range(3)]
+    db.add_all(users)
+    matches = [
+        Match(
+            fifa_match_code=f"STRM00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3 - i),
+            status=MatchStatus.FINISHED if i == 0 else MatchStatus.SCHEDULED,
+            home_score=1 if i == 0 else None,
+            away_score=0 if i == 0 else None,
+        )
+        for i in range(3)
+    ]
+    db.add_all(matches)
+    db.commit()
+    leader, runner_up, third = [user.id for user in users]
+    for user_id, (home_pred, away_pred) in zip([leader, runner_up, third], [(1, 0), (2, 0), (0, 1)]):
+        db.add(Prediction(user_id=user_id, match_id=matches[0].id, home_pred=home_pred, away_pred=away_pred))
+    db.add(Prediction(user_id=runner_up, match_id=matches[1].id, home_pred=2, away_pred=2))
+    db.add(Prediction(user_id=third, match_id=matches[2].id, home_pred=1, away_pred=0))
+    db.commit()
+    RankingService.recalculate_global_ranking(db)
+    
+    broadcaster = StandingsBroadcaster(session_factory=TestingSessionLocal, poll_seconds=0)
+    def catch_up(seq):
+        seq, events = asyncio.run(broadcaster.catch_up("GLOBAL", seq))
+        parsed = []
+        for event in events:
+            fields = dict(line.split(": ", 1) for line in event.strip().split("\n"))
+            parsed.append((fields["event"], int(fields["id"]), json.loads(fields["data"])))
+        return seq, parsed
+    
+    first_seq, first_events = catch_up(0)
+    
+    # Only the runner-up scores (3 points, level with the leader but behind on exact hits)
+    matches[1].status = MatchStatus.FINISHED
+    matches[1].home_score = 0
+    matches[1].away_score = 0
+    db.commit()
+    RankingService.recalculate_global_ranking(db)
+    second_seq, second_events = catch_up(first_seq)
+    
+    # A client two versions behind replays the kept diffs
+    RankingService.recalculate_global_ranking(db)
+    asyncio.run(broadcaster.poll("GLOBAL"))
+    replay_seq, replay_events = catch_up(first_seq)
+    _, stale_events = catch_up(first_seq - 1)
+    
+    # A live goal updates the published rows in place - streamed without a new version
+    matches[2].status = MatchStatus.LIVE
+    matches[2].home_score = 1
+    matches[2].away_score = 0
+    db.commit()
+    RankingService.apply_live_score(db, matches[2].id)
+    live_seq, live_events = catch_up(replay_seq)
+    db.close()
+    
+    assert [(event, data["seq"]) for event, _, data in first_events] == [("snapshot", first_seq)]
+    assert [row["user_id"] for row in first_events[0][2]["standings"]] == [leader, runner_up, third]
+    
+    assert len(second_events) == 1
+    event, event_id, diff = second_events[0]
+    assert (event, event_id, diff["from_seq"], diff["seq"]) == ("diff", second_seq, first_seq, second_seq)
+    assert diff["version"] > diff["from_version"]
+    assert [(row["user_id"], row["rank"], row["total_points"]) for row in diff["changed"]] == [(runner_up, 2, 5)]
+    assert diff["removed"] == [] and diff["total_users"] == 3
+    
+    assert replay_seq > second_seq
+    assert [(event, data["from_seq"]) for event, _, data in replay_events] == [("diff", first_seq), ("diff", second_seq)]
+    assert replay_events[-1][2]["changed"] == []
+    assert [event for event, _, _ in stale_events] == ["snapshot"]
+    
+    assert live_seq > replay_seq and len(live_events) == 1
+    _, _, live = live_events[0]
+    assert live["version"] == live["from_version"] == replay_events[-1][2]["version"]
+    assert [(row["user_id"], row["live_points"], row["provisional_rank"]) for row in live["changed"]] == [(third, 5, 3)]
+
+def test_bulk_prediction_submission():
+    """Test bulk picks are upserted in one statement with the lock check in SQL and saved in one transaction"""
+    from sqlalchemy import event
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from app.models import Group, GroupMember
+    from app.schemas import PredictionCreate
+    from app.services.business import PredictionService
+    
+    db = TestingSessionLocal()
+    user = User(name="Bulk", email="bulk@example.com", provider="email")
+    db.add(user)
+    matches = [
+        Match(
+            fifa_match_code=f"BULK00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            # The last match kicks off in 5 minutes (locked)
+            kickoff_at_utc=datetime.now(timezone.utc) + (timedelta(days=i + 1) if i < 3 else timedelta(minutes=5)),
+            status=MatchStatus.SCHEDULED,
+        )
+        for i in range(5)
+    ]
+    db.add_all(matches)
+    db.commit()
+    own, other = [Group(name=f"Bulk {i}", slug=f"bulk-{i}", owner_id=user.id) for i in range(2)]
+    db.add_all([own, other])
+    db.commit()
+    db.add(GroupMember(group_id=own.id, user_id=user.id))
+    db.add(Prediction(user_id=user.id, match_id=matches[0].id, home_pred=0, away_pred=0))
+    # Open match, but the pick itself is locked
+    db.add(Prediction(user_id=user.id, match_id=matches[4].id, home_pred=0, away_pred=0, is_locked=True))
+    db.commit()
+    
+    picks = [
+        PredictionCreate(match_id=matches[0].id, home_pred=2, away_pred=1),
+        PredictionCreate(match_id=matches[1].id, home_pred=1, away_pred=1),
+        PredictionCreate(match_id=matches[2].id, home_pred=0, away_pred=3),
+        PredictionCreate(match_id=matches[1].id, home_pred=4, away_pred=0),
+        PredictionCreate(match_id=matches[3].id, home_pred=1, away_pred=0),
+        PredictionCreate(match_id=99999, home_pred=1, away_pred=0),
+        PredictionCreate(match_id=matches[4].id, home_pred=1, away_pred=0),
+        PredictionCreate(match_id=matches[1].id, group_id=own.id, home_pred=3, away_pred=3),
+        PredictionCreate(match_id=matches[1].id, group_id=other.id, home_pred=3, away_pred=3),
+    ]
+    user_id = user.id
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    results = PredictionService.create_predictions_bulk(db, user_id, picks)
+    event.remove(engine, "before_cursor_execute", listener)
+    
+    db.expire_all()
+    saved = {
+        p.match_id: (p.home_pred, p.away_pred)
+        for p in db.query(Prediction).filter(Prediction.user_id == user_id, Prediction.group_id.is_(None))
+    }
+    group_saved = db.query(Prediction).filter(Prediction.user_id == user_id, Prediction.group_id.isnot(None)).count()
+    match_ids = [m.id for m in matches]
+    db.close()
+    
+    assert [(r["status"], r["error"]) for r in results] == [
+        ("updated", None), ("created", None), ("created", None),
+        ("rejected", "Duplicate pick in request"), ("rejected", "Match locked"), ("rejected", "Match not found"),
+        ("rejected", "Prediction locked"), ("created", None), ("rejected", "Not a member of this group"),
+    ]
+    assert all(r["prediction_id"] for r in results[:3])
+    assert saved == {match_ids[0]: (2, 1), match_ids[1]: (1, 1), match_ids[2]: (0, 3), match_ids[4]: (0, 0)}
+    assert group_saved == 1
+    # Membership lookup, one upsert per conflict target (lock checked in SQL), one lookup to explain the rejections
+    queries = [sql for sql in statements if not sql.startswith(("BEGIN", "COMMIT", "SAVEPOINT", "RELEASE"))]
+    assert len(queries) == 4 and all("ON CONFLICT" in sql for sql in queries[1:3])
+    
+    # PostgreSQL types an all-NULL UNION column as text: nullable values are cast explicitly
+    global_picks = [PredictionCreate(match_id=match_id, home_pred=1, away_pred=0) for match_id in match_ids[:2]]
+    compiled = str(PredictionService._upsert_statement(pg_insert, user_id, global_picks, ["a", "b"]).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert "UNION ALL" in compiled
+    assert compiled.count("AS INTEGER)") == 2 and compiled.count("AS VARCHAR(100))") == 2
+
+def test_prediction_upsert_single_statement():
+    """Test a pick is upserted in one statement that also checks the kickoff lock, with one global pick per match"""
+    from sqlalchemy import event
+    from sqlalchemy.exc import IntegrityError
+    from app.models import Group, GroupMember
+    from app.schemas import PredictionCreate
+    from app.services.business import PredictionService
+    
+    db = TestingSessionLocal()
+    user = User(name="Upsert", email="upsert@example.com", provider="email")
+    db.add(user)
+    db.commit()
+    group = Group(name="Upsert group", slug="upsert-group", owner_id=user.id, join_code="UPSERT01")
+    open_match, closing_match = [
+        Match(
+            fifa_match_code=f"UPS00{i}",
+            stage=MatchStage.GROUP,
+            match_order=i,
+            home_team="Team A",
+            away_team="Team B",
+            kickoff_at_utc=datetime.now(timezone.utc) + (timedelta(days=1) if i == 0 else timedelta(minutes=5)),
+            status=MatchStatus.SCHEDULED,
+        )
+        for i in range(2)
+    ]
+    db.add_all([group, open_match, closing_match])
+    db.commit()
+    user_id, group_id, open_id, closing_id = user.id, group.id, open_match.id, closing_match.id
+    outsider = User(name="Outsider", email="outsider@example.com", provider="email")
+    db.add_all([GroupMember(group_id=group_id, user_id=user_id), outsider])
+    db.commit()
+    outsider_id = outsider.id
+    
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    created = PredictionService.create_prediction(db, user_id, PredictionCreate(match_id=open_id, home_pred=1, away_pred=0))
+    event.remove(engine, "before_cursor_execute", listener)
+    updated = PredictionService.create_prediction(db, user_id, PredictionCreate(match_id=open_id, home_pred=2, away_pred=2))
+    in_group = PredictionService.create_prediction(db, user_id, PredictionCreate(match_id=open_id, group_id=group_id, home_pred=0, away_pred=1))
+    too_late = PredictionService.create_prediction(db, user_id, PredictionCreate(match_id=closing_id, home_pred=1, away_pred=0))
+    not_member = PredictionService.create_prediction(db, outsider_id, PredictionCreate(match_id=open_id, group_id=group_id, home_pred=0, away_pred=1))
+    
+    db.query(Prediction).filter(Prediction.id == created.id).update({"is_locked": True})
+    db.commit()
+    locked = PredictionService.create_prediction(db, user_id, PredictionCreate(match_id=open_id, home_pred=5, away_pred=0))
+    
+    # The partial unique index rejects a second global pick
+    db.add(Prediction(user_id=user_id, match_id=open_id, home_pred=3, away_pred=3))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+    
+    picks = sorted((p.group_id or 0, p.home_pred, p.away_pred) for p in db.query(Prediction).filter(Prediction.user_id == user_id))
+    db.close()
+    
+    assert len([sql for sql in statements if sql.startswith("INSERT")]) == 1
+    assert not [sql for sql in statements if sql.startswith("SELECT")]
+    assert updated.id == created.id and (updated.home_pred, updated.away_pred) == (2, 2)
+    assert in_group.id != created.id and in_group.group_id == group_id
+    assert not_member is None
+    assert too_late is None and locked is None
+    assert picks == [(0, 2, 2), (group_id, 0, 1)]
+
+def test_dirty_scope_tracking(monkeypatch):
+    """Test the scheduled recompute only touches scopes dirtied since its last run"""
+    from app.services.business import GroupService
+    from app.services.ranking import RankingService
+    from app.models import Group, DirtyScope
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Dirty {i}", email=f"dirty{i}@example.com", provider="email") for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    groups = [Group(name=f"Dirty {i}", slug=f"dirty-{i}", owner_id=users[0].id) for i in range(2)]
+    db.add_all(groups)
+    match = Match(
+        fifa_match_code="DIRTY001",
+        stage=MatchStage.GROUP,
+        match_order=1,
+        home_team="Team A",
+        away_team="Team B",
+        kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+        status=MatchStatus.FINISHED,
+        home_score=1,
+        away_score=0,
+    )
+    db.add(match)
+    db.commit()
+    db.add(Prediction(user_id=users[0].id, match_id=match.id, group_id=groups[0].id, home_pred=1, away_pred=0))
+    db.add(Prediction(user_id=users[1].id, match_id=match.id, home_pred=0, away_pred=0))
+    db.commit()
+    first_scope, second_scope = [f"GROUP:{group.id}" for group in groups]
+    
+    # Cold start computes everything, then there is nothing left to do
+    assert RankingService.recalculate_dirty_rankings(db) == sorted(["GLOBAL", first_scope, second_scope])
+    assert RankingService.recalculate_dirty_rankings(db) == []
+    
+    # A result change only dirties scopes with picks on the match
+    match.home_score = 2
+    RankingService.mark_match_dirty(db, match.id)
+    db.commit()
+    
+    # A failed recompute keeps its marks for the next run
+    recalculate_scopes = RankingService._recalculate_scopes
+    monkeypatch.setattr(RankingService, "_recalculate_scopes", lambda *args, **kwargs: False)
+    assert RankingService.recalculate_dirty_rankings(db) == []
+    assert sorted(scope for (scope,) in db.query(DirtyScope.scope)) == sorted(["GLOBAL", first_scope])
+    monkeypatch.setattr(RankingService, "_recalculate_scopes", recalculate_scopes)
+    
+    assert RankingService.recalculate_dirty_rankings(db) == sorted(["GLOBAL", first_scope])
+    assert RankingService.get_global_standings(db, limit=10)["standings"][0]["total_points"] == 2
+    
+    # Membership changes dirty the group
+    GroupService.add_member_to_group(db, groups[1].id, users[1].id)
+    assert RankingService.recalculate_dirty_rankings(db) == [second_scope]
+    assert db.query(DirtyScope).count() == 0
+    db.close()
+
+def test_match_patch_clears_result_marks():
+    """Test a successful incremental result patch clears its result marks but not other reasons"""
+    from app.services.business import GroupService
+    from app.services.ranking import RankingService
+    from app.models import Group, DirtyScope
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Patch {i}", email=f"patch{i}@example.com", provider="email") for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    group = Group(name="Patch", slug="patch", owner_id=users[0].id)
+    db.add(group)
+    match = Match(
+        fifa_match_code="PATCH001",
+        stage=MatchStage.GROUP,
+        match_order=1,
+        home_team="Team A",
+        away_team="Team B",
+        kickoff_at_utc=datetime.now(timezone.utc) - timedelta(hours=3),
+        status=MatchStatus.FINISHED,
+        home_score=1,
+        away_score=0,
+    )
+    db.add(match)
+    db.commit()
+    db.add(Prediction(user_id=users[0].id, match_id=match.id, group_id=group.id, home_pred=1, away_pred=0))
+    db.commit()
+    group_scope = f"GROUP:{group.id}"
+    RankingService.recalculate_dirty_rankings(db)
+    
+    # The group also waits for a membership recompute, which the patch doesn't cover
+    GroupService.add_member_to_group(db, group.id, users[1].id)
+    match.home_score = 2
+    RankingService.mark_match_dirty(db, match.id)
+    db.commit()
+    
+    assert RankingService.apply_match_results(db, {match.id})
+    assert dict(db.query(DirtyScope.scope, DirtyScope.reason)) == {group_scope: "membership"}
+    db.close()
+
+def test_versioned_standings_swap():
+    """Test standings versions publish atomically, newer builds win and old versions are collected"""
+    from app.services.ranking import RankingService
+    from app.models import StandingsCache, StandingsEntry
+    
+    db = TestingSessionLocal()
+    users = [User(name=f"Version {i}", email=f"version{i}@example.com", provider="email") for i in range(3)]
+    db.add_all(users)
+    db.commit()
+    
+    def build(points):
+        standings = [
+            {"user_id": user.id, "total_points": p, "exact_matches": 0, "correct_results": 0, "rank": 0}
+            for user, p in zip(users, points)
+        ]
+        RankingService._rank_standings(standings)
+        return standings
+    
+    def published():
+        db.expire_all()
+        return [row["total_points"] for row in RankingService.get_global_standings(db, limit=10)["standings"]]
+    
+    assert RankingService.get_global_standings(db) is None
+    
+    # Two concurrent recomputes: the later-started one wins even if it finishes first
+    older = RankingService._allocate_versions(db, {"GLOBAL": None})["GLOBAL"]
+    newer = RankingService._allocate_versions(db, {"GLOBAL": None})["GLOBAL"]
+    assert RankingService._save_standings(db, "GLOBAL", None, build([9, 6, 3]), newer)
+    assert not RankingService._save_standings(db, "GLOBAL", None, build([1, 2, 3]), older)
+    assert published() == [9, 6, 3]
+    
+    # The replaced version stays for in-flight readers, older ones are collected
+    RankingService._save_standings(db, "GLOBAL", None, build([10, 6, 3]))
+    RankingService._save_standings(db, "GLOBAL", None, build([11, 6, 3]))
+    versions = {v for (v,) in db.query(StandingsEntry.version).filter(StandingsEntry.scope == "GLOBAL").distinct()}
+    current = db.query(StandingsCache.version).filter(StandingsCache.scope == "GLOBAL").scalar()
+    assert published() == [11, 6, 3]
+    assert versions == {current - 1, current}
+    db.close()
+
 def test_register_user():
     """Test user registration"""
     response = client.post(